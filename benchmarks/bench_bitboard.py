@@ -0,0 +1,80 @@
+"""Compara a verificação de vitória/empate em lista de listas com o bitboard.
+
+Para cada tamanho, sorteia posições de meio de partida sem vencedor (o pior
+caso: todas as linhas precisam ser examinadas) e mede o tempo de
+verificar_vencedor + verificar_empate. Do lado do bitboard é medida a
+verificação completa com máscaras (procurar_vencedor), não o vencedor que
+TabuleiroBits mantém jogada a jogada (ver bench_tabuleiro_grande.py). No 3x3 a
+referência são as funções originais de logica.py; no 15x15 (5 em linha,
+estilo gomoku) é a mesma varredura generalizada para N×N.
+
+Uso: python benchmarks/bench_bitboard.py [posicoes]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bitboard import TabuleiroBits
+from logica import verificar_vencedor, verificar_empate
+
+
+def vencedor_varredura(tabuleiro, k):
+    """Varredura direta de linhas, colunas e diagonais em lista de listas."""
+    n = len(tabuleiro)
+    for i in range(n):
+        for j in range(n):
+            simbolo = tabuleiro[i][j]
+            if simbolo == ' ':
+                continue
+            for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                fim_i, fim_j = i + di * (k - 1), j + dj * (k - 1)
+                if 0 <= fim_i < n and 0 <= fim_j < n and all(
+                        tabuleiro[i + di * p][j + dj * p] == simbolo for p in range(1, k)):
+                    return simbolo
+    return None
+
+
+def empate_varredura(tabuleiro, k):
+    return all(' ' not in linha for linha in tabuleiro) and vencedor_varredura(tabuleiro, k) is None
+
+
+def posicoes_sem_vencedor(n, k, quantidade, aleatorio):
+    posicoes = []
+    while len(posicoes) < quantidade:
+        bits = TabuleiroBits(n, k)
+        celulas = list(range(n * n))
+        aleatorio.shuffle(celulas)
+        for jogada, indice in enumerate(celulas[:n * n // 2]):
+            simbolo = 'XO'[jogada % 2]
+            bits.jogar(indice, simbolo)
+            if bits.vencedor():
+                bits.desfazer(indice)  # queremos posições sem vencedor
+        posicoes.append((bits.para_lista(), bits))
+    return posicoes
+
+
+def medir(funcao, posicoes, repeticoes):
+    tempo = min(timeit.repeat(lambda: [funcao(p) for p in posicoes], number=repeticoes, repeat=3))
+    return tempo / (repeticoes * len(posicoes)) * 1e6
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    aleatorio = random.Random(1)
+    for n, k, repeticoes in ((3, 3, 200), (15, 5, 5)):
+        posicoes = posicoes_sem_vencedor(n, k, quantidade, aleatorio)
+        listas = [lista for lista, _ in posicoes]
+        bits = [b for _, b in posicoes]
+        if n == 3:
+            def referencia(t):
+                return verificar_vencedor(t), verificar_empate(t)
+        else:
+            def referencia(t):
+                return vencedor_varredura(t, k), empate_varredura(t, k)
+        antes = medir(referencia, listas, repeticoes)
+        depois = medir(lambda t: (t.procurar_vencedor(), t.cheio()), bits, repeticoes)
+        print(f"{n}x{n}, {k} em linha: listas {antes:8.2f} µs | bitboard {depois:8.2f} µs"
+              f" | {antes / depois:5.1f}x ({len(bits[0].geo.mascaras)} máscaras)")
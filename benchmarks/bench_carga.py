@@ -0,0 +1,435 @@
+"""Gerador de carga: N clientes simulados jogando contra hosts ou contra o servidor dedicado.
+
+Tudo roda em loopback e sem janela. Cada lado de cada partida é um Jogador que
+dirige uma rede.ConexaoJogo de verdade (o mesmo código dos modos
+hospedar/conectar da interface) e responde com jogadas aleatórias válidas,
+aplicadas com logica.fazer_jogada. Ao fim de cada partida o cliente se
+desconecta e começa outra; com --revanche, os dois lados pedem a revanche e a
+próxima partida começa na mesma conexão.
+
+Alvos:
+- host: N hosts P2P (modo "Hospedar"), num processo à parte, cada um numa porta,
+  e N clientes (modo "Conectar") no processo principal;
+- servidor: `servidor.py` num subprocesso e 2N clientes pareados por ele.
+
+Relata jogadas e partidas por segundo, a latência de ida e volta de cada jogada
+(do envio até o JOGADA_OK do outro lado; p50 e p99) e as falhas: erros de
+conexão, desconexões no meio da partida, partidas travadas (sem progresso por
+--timeout segundos), ressincronizações e erros de envio e recepção. No UDP,
+--perda/--atraso/--variacao injetam falhas de rede nos dois lados
+(udp_confiavel.SimuladorRede). --saida grava o resultado em JSON, para comparar
+versões.
+
+Uso: python benchmarks/bench_carga.py [--alvo host|servidor] [--protocolo tcp|udp]
+         [--clientes N] [--segundos S] [--ritmo S] [--perda P] [--atraso S] [--variacao S]
+         [--revanche] [--timeout S] [--saida resultado.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+import metricas
+import protocolo as proto
+import rede
+import udp_confiavel
+from logica import criar_tabuleiro, fazer_jogada, verificar_vencedor, verificar_empate
+
+PERMANENCIA = 0.1  # segundos que um lado espera, no fim da partida, antes de fechar
+PAUSA_RECONEXAO = 0.3
+ESPERA_CONFIRMACAO = 1.0  # UDP: quanto o último a jogar espera o ACK da jogada final
+AQUECIMENTO = 2.0
+FALHAS = ('conexao', 'desconexao', 'travada', 'resync')
+
+
+def porta_livre(tipo=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, tipo) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Jogador:
+    """Um lado simulado de uma partida, jogando partidas seguidas numa porta."""
+
+    def __init__(self, modo, protocolo, porta, simbolo, avisos, ritmo, timeout, simulador, semente,
+                 revanche=False):
+        self.modo = modo
+        self.protocolo = protocolo
+        self.porta = porta
+        self.simbolo_inicial = simbolo  # None: o servidor dedicado informa na PARTIDA
+        self.avisos = avisos
+        self.ritmo = ritmo
+        self.timeout = timeout
+        self.simulador = simulador
+        self.revanche = revanche
+        self.aleatorio = random.Random(semente)
+        self.metricas = metricas.Metricas()  # uma por jogador: só a sua thread de rede a altera
+        self.falhas = dict.fromkeys(FALHAS, 0)
+        self.jogadas = 0
+        self.partidas = 0
+        self.conexao = None
+        self.estado = None
+        self.prazo = None          # quando agir sem esperar evento (jogar, fechar, reconectar)
+        self.ultimo_progresso = 0.0
+
+    # --- Ciclo das partidas ---
+    def conectar(self):
+        tipo = socket.SOCK_STREAM if self.protocolo == 'tcp' else socket.SOCK_DGRAM
+        sock = socket.socket(socket.AF_INET, tipo)
+        if self.modo == 'h':
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.conexao = rede.ConexaoJogo(self.protocolo, self.modo, sock, ('127.0.0.1', self.porta),
+                                        ao_notificar=lambda: self.avisos.put(self),
+                                        simulador=self.simulador, metricas=self.metricas)
+        self.tabuleiro, self.turno, self.seq = criar_tabuleiro(), 'X', 0
+        self.partida, self.revanche_pedida, self.revanche_oponente, self.adiadas = 1, False, False, []
+        self.simbolo = self.simbolo_inicial
+        self.estado, self.prazo = 'conectando', None
+        self.ultimo_progresso = time.monotonic()
+        self.conexao.iniciar()
+
+    def encerrar(self, falha=None):
+        """Fecha a conexão (depois da permanência, se a partida acabou bem) e agenda a próxima."""
+        if falha:
+            self.falhas[falha] += 1
+            self._reiniciar()
+        else:
+            self.partidas += 1
+            if self.revanche:
+                self._pedir_revanche()
+            else:
+                self.estado, self.prazo = 'encerrando', time.monotonic() + PERMANENCIA
+
+    def _reiniciar(self):
+        self.conexao.fechar()
+        if self.modo == 'h':
+            self.conectar()  # o host volta a escutar na mesma porta imediatamente
+        else:
+            self.estado, self.prazo = 'pausa', time.monotonic() + PAUSA_RECONEXAO
+
+    def fechar(self):
+        if self.conexao:
+            self.conexao.fechar()
+
+    # --- Revanche (mesma conexão) ---
+    def _pedir_revanche(self):
+        self.estado = 'revanche'
+        self.revanche_pedida = True
+        self.conexao.enviar({'msg': 'REVANCHE', 'partida': self.partida + 1})
+        if self.revanche_oponente:
+            self._proxima_partida()
+
+    def _proxima_partida(self):
+        self.partida += 1
+        self.tabuleiro, self.turno = criar_tabuleiro(), proto.quem_comeca(self.partida)
+        self.revanche_pedida = self.revanche_oponente = False
+        self.estado, self.ultimo_progresso = 'jogando', time.monotonic()
+        adiadas, self.adiadas = self.adiadas, []
+        for dados in adiadas:
+            self._mensagem(dados)
+        self._talvez_jogar()
+
+    # --- Reações (thread do condutor) ---
+    def processar(self):
+        while True:
+            try:
+                tipo, conteudo = self.conexao.eventos.get_nowait()
+            except queue.Empty:
+                return
+            if self.estado not in ('conectando', 'jogando', 'revanche'):
+                continue
+            if tipo == 'conectado':
+                self.estado = 'jogando'
+                self._talvez_jogar()
+            elif tipo == 'mensagem':
+                self._mensagem(conteudo)
+            elif tipo == 'desconexao':
+                self.encerrar('desconexao')
+            elif tipo == 'erro':
+                self.encerrar('conexao')
+
+    def _mensagem(self, dados):
+        if dados.get('msg') == 'PARTIDA':
+            self.simbolo = dados['jogador']
+        elif dados.get('msg') == 'RESYNC':
+            self.conexao.enviar({'tabuleiro': self.tabuleiro, 'turno': self.turno, 'seq': self.seq})
+            return
+        elif dados.get('msg') == 'REVANCHE':
+            if dados['partida'] == self.partida + 1:
+                if self.revanche_pedida:
+                    self._proxima_partida()
+                else:
+                    self.revanche_oponente = True
+            return
+        elif 'jogada' in dados:
+            if dados['seq'] <= self.seq:
+                return
+            if self._terminou():
+                self.adiadas.append(dados)  # da próxima partida, chegou antes da REVANCHE
+                return
+            linha, coluna = divmod(dados['jogada'], 3)
+            if (dados['seq'] != self.seq + 1 or dados['jogador'] != self.turno
+                    or not fazer_jogada(self.tabuleiro, linha, coluna, dados['jogador'])):
+                self.conexao.enviar({'msg': 'RESYNC', 'seq': self.seq})
+                return
+            self._aplicada(dados['seq'])
+        elif 'tabuleiro' in dados:
+            self.falhas['resync'] += 1
+            self.tabuleiro, self.turno, self.seq = dados['tabuleiro'], dados['turno'], dados['seq']
+        self._talvez_jogar()
+
+    def _aplicada(self, seq):
+        self.seq = seq
+        self.turno = 'O' if self.turno == 'X' else 'X'
+        self.jogadas += 1
+        self.ultimo_progresso = time.monotonic()
+
+    def _terminou(self):
+        return verificar_vencedor(self.tabuleiro) or verificar_empate(self.tabuleiro)
+
+    def _talvez_jogar(self):
+        if self._terminou():
+            if self.estado == 'jogando':
+                self.encerrar()
+        elif self.simbolo == self.turno and self.prazo is None:
+            self.prazo = time.monotonic() + self.ritmo
+
+    def jogar(self):
+        livres = [(i, j) for i in range(3) for j in range(3) if self.tabuleiro[i][j] == ' ']
+        linha, coluna = self.aleatorio.choice(livres)
+        fazer_jogada(self.tabuleiro, linha, coluna, self.simbolo)
+        self._aplicada(self.seq + 1)
+        self.conexao.enviar({'jogada': linha * 3 + coluna, 'jogador': self.simbolo, 'seq': self.seq})
+        if self._terminou():
+            self.encerrar()
+
+    def verificar_prazos(self, agora):
+        """Executa o que estiver vencido; retorna o próximo prazo (ou None)."""
+        if self.prazo is not None and agora >= self.prazo:
+            self.prazo = None
+            if self.estado == 'jogando':
+                self.jogar()
+            elif self.estado == 'encerrando':
+                canal = self.conexao.canal
+                if canal and canal.pendentes and agora < self.ultimo_progresso + ESPERA_CONFIRMACAO:
+                    self.prazo = agora + PERMANENCIA  # UDP: a última jogada ainda não foi confirmada
+                else:
+                    self.conexao.enviar({'msg': 'DESCONEXAO'})  # saída de propósito, não uma queda
+                    self._reiniciar()
+            elif self.estado == 'pausa':
+                self.conectar()
+        if self.estado in ('jogando', 'revanche') and agora - self.ultimo_progresso > self.timeout:
+            self.encerrar('travada')
+        return self.prazo
+
+
+def conduzir(jogadores, avisos, parar):
+    """Thread única que reage aos eventos de todos os jogadores do processo."""
+    while not parar.is_set():
+        agora = time.monotonic()
+        prazos = [p for p in (j.verificar_prazos(agora) for j in jogadores) if p is not None]
+        espera = min([0.1] + [max(0.0, p - agora) for p in prazos])
+        try:
+            jogador = avisos.get(timeout=espera)
+        except queue.Empty:
+            continue
+        jogador.processar()
+        while True:
+            try:
+                avisos.get_nowait().processar()
+            except queue.Empty:
+                break
+
+
+def criar_simulador(args, semente):
+    if args.protocolo != 'udp' or not (args.perda or args.atraso or args.variacao):
+        return None
+    return udp_confiavel.SimuladorRede(args.perda, args.atraso, args.variacao, semente=semente)
+
+
+def instantaneo(jogadores):
+    """Soma contadores, falhas e métricas de rede de uma lista de jogadores."""
+    falhas = dict.fromkeys(FALHAS, 0)
+    for jogador in jogadores:
+        for nome, valor in jogador.falhas.items():
+            falhas[nome] += valor
+    return {'jogadas': sum(j.jogadas for j in jogadores),
+            'partidas': sum(j.partidas for j in jogadores),
+            'falhas': falhas,
+            'metricas': metricas.agregar([j.metricas.instantaneo() for j in jogadores])}
+
+
+def diferenca(depois, antes):
+    """Instantâneo do que aconteceu entre `antes` e `depois` (a janela medida)."""
+    historicos = {}
+    for nome, h in depois['metricas']['histogramas'].items():
+        anterior = antes['metricas']['histogramas'].get(nome)
+        if anterior:
+            h = dict(h, contagens=[a - b for a, b in zip(h['contagens'], anterior['contagens'])],
+                     soma=h['soma'] - anterior['soma'], total=h['total'] - anterior['total'])
+        historicos[nome] = h
+    contadores = {chave: valor - antes['metricas']['contadores'].get(chave, 0)
+                  for chave, valor in depois['metricas']['contadores'].items()}
+    return {'jogadas': depois['jogadas'] - antes['jogadas'],
+            'partidas': depois['partidas'] - antes['partidas'],
+            'falhas': {nome: depois['falhas'][nome] - antes['falhas'][nome] for nome in FALHAS},
+            'metricas': {'contadores': contadores, 'histogramas': historicos}}
+
+
+def rodar_jogadores(jogadores, avisos, parar):
+    for jogador in jogadores:
+        jogador.conectar()
+    condutor = threading.Thread(target=conduzir, args=(jogadores, avisos, parar), daemon=True)
+    condutor.start()
+    return condutor
+
+
+def processo_hosts(args, portas, parar, resultado):
+    """Processo dos hosts P2P: um Jogador em modo 'h' por porta."""
+    avisos = queue.Queue()
+    hosts = [Jogador('h', args.protocolo, porta, 'X', avisos, args.ritmo, args.timeout,
+                     criar_simulador(args, 1000 + i), 1000 + i, args.revanche)
+             for i, porta in enumerate(portas)]
+    parar_local = threading.Event()
+    condutor = rodar_jogadores(hosts, avisos, parar_local)
+    parar.wait()
+    parar_local.set()
+    condutor.join()
+    resultado.put(instantaneo(hosts))
+    for host in hosts:
+        host.fechar()
+
+
+def medir(args):
+    tipo = socket.SOCK_STREAM if args.protocolo == 'tcp' else socket.SOCK_DGRAM
+    avisos, parar = queue.Queue(), threading.Event()
+    auxiliar, parar_auxiliar, resultado_hosts = None, None, None
+    if args.alvo == 'host':
+        portas = [porta_livre(tipo) for _ in range(args.clientes)]
+        parar_auxiliar, resultado_hosts = multiprocessing.Event(), multiprocessing.Queue()
+        auxiliar = multiprocessing.Process(target=processo_hosts,
+                                           args=(args, portas, parar_auxiliar, resultado_hosts))
+        auxiliar.start()
+        clientes = [Jogador('c', args.protocolo, porta, 'O', avisos, args.ritmo, args.timeout,
+                            criar_simulador(args, i), i, args.revanche)
+                    for i, porta in enumerate(portas)]
+    else:
+        porta = porta_livre()
+        comando = [sys.executable, os.path.join(RAIZ, 'servidor.py'), '--host', '127.0.0.1',
+                   '--porta', str(porta)]
+        if criar_simulador(args, 0):
+            comando += ['--simular-rede', f"perda={args.perda},atraso={args.atraso},variacao={args.variacao}"]
+        auxiliar = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+        clientes = [Jogador('c', args.protocolo, porta, None, avisos, args.ritmo, args.timeout,
+                            criar_simulador(args, i), i, args.revanche)
+                    for i in range(2 * args.clientes)]
+    time.sleep(1.0)  # hosts escutando / servidor no ar
+
+    condutor = rodar_jogadores(clientes, avisos, parar)
+    try:
+        time.sleep(AQUECIMENTO)
+        antes, inicio = instantaneo(clientes), time.perf_counter()
+        time.sleep(args.segundos)
+        depois, duracao = instantaneo(clientes), time.perf_counter() - inicio
+    finally:
+        parar.set()
+        condutor.join()
+        hosts = None
+        if args.alvo == 'host':
+            # Os hosts contam as falhas antes que o fechamento dos clientes vire desconexão
+            parar_auxiliar.set()
+            try:
+                hosts = resultado_hosts.get(timeout=30)
+            except queue.Empty:
+                pass
+        for cliente in clientes:
+            cliente.fechar()
+        if args.alvo == 'host':
+            auxiliar.join(timeout=10)
+        else:
+            auxiliar.terminate()
+            auxiliar.wait()
+    janela = diferenca(depois, antes)
+    if args.alvo == 'servidor':
+        janela['jogadas'] //= 2  # cada jogada é aplicada pelos dois clientes da partida
+        janela['partidas'] //= 2
+    return janela, duracao, hosts
+
+
+def resumo(args, janela, duracao, hosts):
+    rtt = janela['metricas']['histogramas'].get('rtt_jogada_segundos')
+    contadores = janela['metricas']['contadores']
+    resultado = {
+        'alvo': args.alvo, 'protocolo': args.protocolo, 'clientes': args.clientes,
+        'ritmo': args.ritmo, 'perda': args.perda, 'atraso': args.atraso, 'variacao': args.variacao,
+        'revanche': args.revanche,
+        'segundos': duracao,
+        'jogadas_por_segundo': janela['jogadas'] / duracao,
+        'partidas_por_segundo': janela['partidas'] / duracao,
+        'rtt_p50_ms': metricas.quantil(rtt, 0.5) * 1000 if rtt else None,
+        'rtt_p99_ms': metricas.quantil(rtt, 0.99) * 1000 if rtt else None,
+        'amostras_rtt': rtt['total'] if rtt else 0,
+        'falhas': dict(janela['falhas'],
+                       erros_envio=sum(v for (n, _), v in contadores.items() if n == 'erros_envio'),
+                       erros_recepcao=sum(v for (n, _), v in contadores.items() if n == 'erros_recepcao')),
+    }
+    if hosts:
+        resultado['falhas_hosts'] = hosts['falhas']
+    return resultado
+
+
+def imprimir(resultado):
+    rede_simulada = ''
+    if resultado['perda'] or resultado['atraso'] or resultado['variacao']:
+        rede_simulada = (f", perda {resultado['perda']:.0%}, atraso {resultado['atraso'] * 1000:.0f}"
+                         f"+{resultado['variacao'] * 1000:.0f} ms")
+    sessao = "revanche na mesma conexão" if resultado['revanche'] else "reconexão a cada partida"
+    print(f"alvo {resultado['alvo']}, {resultado['protocolo'].upper()}, {resultado['clientes']} partidas"
+          f" simultâneas, ritmo {resultado['ritmo'] * 1000:.0f} ms{rede_simulada}, {sessao}")
+    print(f"jogadas/s: {resultado['jogadas_por_segundo']:9.1f} | partidas/s: {resultado['partidas_por_segundo']:7.1f}")
+    if resultado['amostras_rtt']:
+        print(f"ida e volta da jogada: p50 {resultado['rtt_p50_ms']:.2f} ms | p99 {resultado['rtt_p99_ms']:.2f} ms"
+              f" ({resultado['amostras_rtt']} amostras)")
+    print("falhas: " + ', '.join(f"{nome} {valor}" for nome, valor in resultado['falhas'].items()))
+    if 'falhas_hosts' in resultado:
+        print("falhas nos hosts: " + ', '.join(f"{nome} {valor}" for nome, valor in resultado['falhas_hosts'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga do Jogo da Velha em Rede (loopback)")
+    parser.add_argument('--alvo', choices=('host', 'servidor'), default='host')
+    parser.add_argument('--protocolo', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--clientes', type=int, default=20, help="partidas simultâneas")
+    parser.add_argument('--segundos', type=float, default=5, help="duração da janela medida")
+    parser.add_argument('--ritmo', type=float, default=0.0, help="espera antes de cada jogada, em segundos")
+    parser.add_argument('--perda', type=float, default=0.0, help="UDP: probabilidade de perder cada datagrama")
+    parser.add_argument('--atraso', type=float, default=0.0, help="UDP: atraso fixo por datagrama, em segundos")
+    parser.add_argument('--variacao', type=float, default=0.0, help="UDP: atraso extra aleatório, em segundos")
+    parser.add_argument('--revanche', action='store_true',
+                        help="emenda as partidas na mesma conexão em vez de reconectar")
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help="segundos sem progresso até considerar a partida travada")
+    parser.add_argument('--saida', help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+    if args.protocolo == 'tcp' and (args.perda or args.atraso or args.variacao):
+        parser.error("--perda/--atraso/--variacao só se aplicam ao UDP")
+
+    resultado = resumo(args, *medir(args))
+    imprimir(resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Mede o uso de CPU com a interface ociosa: menu, em jogo (aguardando oponente) e fim de jogo.
+
+Uso: python benchmarks/bench_cpu_ocioso.py [segundos_por_estado]
+Roda sem janela (driver de vídeo "dummy" do SDL), tudo em loopback. O driver
+"dummy" não tem espera nativa de eventos: o SDL faz polling a cada 1 ms dentro de
+pygame.event.wait, então os números aqui são um teto; em X11/Wayland/Windows o
+processo realmente dorme.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame
+import jogo
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def medir_ate_sair(funcao, segundos, atraso=0.5):
+    """Executa funcao() na thread principal e mede a CPU do processo numa janela de `segundos`."""
+    resultado = {}
+
+    def cronometro():
+        time.sleep(atraso)
+        cpu, parede = time.process_time(), time.perf_counter()
+        time.sleep(segundos)
+        resultado['cpu'] = (time.process_time() - cpu) / (time.perf_counter() - parede) * 100
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=cronometro, daemon=True).start()
+    try:
+        funcao()
+    except SystemExit:
+        pass
+    return resultado['cpu']
+
+
+def loop_polling(segundos):
+    """Referência: o loop antigo do menu (event.get + redesenho completo + tick(30))."""
+    cpu, fim = time.process_time(), time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        pygame.event.get()
+        jogo.desenhar_gradiente(jogo.TELA, jogo.FUNDO_ESCURO, jogo.CINZA_FUNDO)
+        pygame.display.flip()
+        jogo.CLOCK.tick(30)
+    return (time.process_time() - cpu) / segundos * 100
+
+
+def loop_sem_tick(segundos):
+    """Referência: o loop antigo de fim de jogo (event.get + flip, sem tick)."""
+    cpu, fim = time.process_time(), time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        pygame.event.get()
+        pygame.display.flip()
+    return (time.process_time() - cpu) / segundos * 100
+
+
+def cliente_que_perde(porta):
+    """Conecta ao host e envia um tabuleiro com vitória de 'O', levando-o ao fim de jogo."""
+    time.sleep(0.3)
+    with socket.create_connection(('127.0.0.1', porta)) as conn:
+        tabuleiro = [['O', 'O', 'O'], ['X', 'X', ' '], [' ', ' ', ' ']]
+        conn.sendall(json.dumps({'tabuleiro': tabuleiro}).encode('utf-8'))
+        time.sleep(60)
+
+
+if __name__ == "__main__":
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    jogo.inicializar_interface()
+    resultados = [("referência: polling a 30 FPS", loop_polling(segundos)),
+                  ("referência: fim de jogo antigo", loop_sem_tick(segundos))]
+
+    porta = porta_livre()
+    resultados.append(("em jogo (aguardando oponente)",
+                       medir_ate_sair(lambda: jogo.jogo('h', 'tcp', '127.0.0.1', porta), segundos)))
+
+    porta = porta_livre()
+    threading.Thread(target=cliente_que_perde, args=(porta,), daemon=True).start()
+    resultados.append(("fim de jogo",
+                       medir_ate_sair(lambda: jogo.jogo('h', 'tcp', '127.0.0.1', porta), segundos, atraso=1.0)))
+
+    resultados.append(("menu", medir_ate_sair(jogo.main_menu, segundos)))
+
+    for nome, cpu in resultados:
+        print(f"{nome:32s} {cpu:6.1f}% de um núcleo")
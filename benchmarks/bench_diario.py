@@ -0,0 +1,120 @@
+"""Mede a gravação e a leitura do diário de partidas (diario.py).
+
+Gravação: M partidas aleatórias (sorteadas antes de medir), sempre S delas em
+andamento ao mesmo tempo, com os registros intercalados como no servidor
+dedicado. Relata partidas e registros por segundo, MB/s e quantas partidas por
+dia isso daria, com o fsync periódico ligado (--sem-fsync desliga).
+
+Leitura: abre o diário com mmap e lê R partidas sorteadas pelo número (p50/p99
+de cada leitura, que inclui refazer o tabuleiro), e depois percorre o diário
+inteiro numa passada só.
+
+Uso: python benchmarks/bench_diario.py [--partidas M] [--simultaneas S] [--tamanho N]
+         [--leituras R] [--arquivo CAMINHO] [--sem-fsync]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import diario
+from bitboard import TabuleiroBits
+
+MODELOS = 1000  # partidas diferentes sorteadas; as M gravadas repetem estas
+
+
+def sortear_partida(tamanho, sequencia, rng):
+    """Jogadas (índice, jogador) de uma partida aleatória até o fim, e o vencedor."""
+    tabuleiro = TabuleiroBits(tamanho, sequencia)
+    livres = list(range(tamanho * tamanho))
+    rng.shuffle(livres)
+    jogadas, jogador = [], 'X'
+    while not tabuleiro.terminou():
+        indice = livres.pop()
+        tabuleiro.jogar(indice, jogador)
+        jogadas.append((indice, jogador))
+        jogador = 'O' if jogador == 'X' else 'X'
+    return jogadas, tabuleiro.vencedor()
+
+
+def gravar(caminho, partidas, simultaneas, tamanho, sequencia, modelos, intervalo_fsync):
+    registro = diario.DiarioPartidas(caminho, intervalo_fsync=intervalo_fsync)
+    andamento = []  # [número no diário, modelo, próxima jogada]
+    iniciadas = 0
+    inicio = time.perf_counter()
+    while iniciadas < partidas or andamento:
+        while iniciadas < partidas and len(andamento) < simultaneas:
+            andamento.append([registro.iniciar(tamanho, sequencia), modelos[iniciadas % len(modelos)], 0])
+            iniciadas += 1
+        # Uma jogada de cada partida em andamento por rodada: registros intercalados
+        for partida in andamento:
+            numero, (jogadas, vencedor), proxima = partida
+            indice, jogador = jogadas[proxima]
+            registro.jogada(numero, indice, jogador, proxima + 1)
+            partida[2] = proxima + 1
+            if partida[2] == len(jogadas):
+                registro.terminar(numero, vencedor)
+        andamento = [p for p in andamento if p[2] < len(p[1][0])]
+    registro.fechar()
+    return time.perf_counter() - inicio, registro.registros
+
+
+def percentil(valores, q):
+    return valores[min(len(valores) - 1, int(q * len(valores)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--partidas', type=int, default=200000)
+    parser.add_argument('--simultaneas', type=int, default=1000, help="partidas em andamento ao mesmo tempo")
+    parser.add_argument('--tamanho', type=int, default=3, help="lado do tabuleiro (até 5 em linha)")
+    parser.add_argument('--leituras', type=int, default=2000, help="partidas lidas em ordem aleatória")
+    parser.add_argument('--arquivo', default='', help="onde gravar o diário (padrão: diretório temporário)")
+    parser.add_argument('--sem-fsync', action='store_true', help="sem o fsync periódico")
+    args = parser.parse_args()
+    sequencia = min(args.tamanho, 5)
+    rng = random.Random(1)
+    modelos = [sortear_partida(args.tamanho, sequencia, rng) for _ in range(MODELOS)]
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho = args.arquivo or os.path.join(temporario, 'bench.diario')
+        for arquivo in (caminho, diario.caminho_indice(caminho)):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+        intervalo = None if args.sem_fsync else diario.INTERVALO_FSYNC
+        duracao, registros = gravar(caminho, args.partidas, args.simultaneas, args.tamanho, sequencia,
+                                    modelos, intervalo)
+        tamanho_mb = (os.path.getsize(caminho) + os.path.getsize(diario.caminho_indice(caminho))) / 1e6
+        print(f"Gravação: {args.partidas} partidas {args.tamanho}x{args.tamanho} ({registros} registros,"
+              f" {args.simultaneas} simultâneas) em {duracao:.2f} s")
+        print(f"  {args.partidas / duracao:,.0f} partidas/s | {registros / duracao:,.0f} registros/s"
+              f" | {tamanho_mb / duracao:.1f} MB/s | {tamanho_mb:.1f} MB no disco"
+              f" ({tamanho_mb * 1e6 / args.partidas:.0f} B por partida)")
+        print(f"  = {args.partidas / duracao * 86400 / 1e6:,.0f} milhões de partidas por dia num núcleo")
+
+        with diario.LeitorDiario(caminho) as leitor:
+            tempos = []
+            for _ in range(args.leituras):
+                partida = rng.randrange(len(leitor))
+                inicio = time.perf_counter()
+                gravada = leitor.partida(partida)
+                gravada.tabuleiro()
+                tempos.append(time.perf_counter() - inicio)
+                jogadas, vencedor = modelos[partida % len(modelos)]
+                assert [j[0] for j in gravada.jogadas] == [j[0] for j in jogadas]
+                assert gravada.resultado == (vencedor or 'empate')
+            tempos.sort()
+            print(f"Leitura aleatória: {args.leituras} partidas | p50 {percentil(tempos, 0.5) * 1e6:.0f} µs"
+                  f" | p99 {percentil(tempos, 0.99) * 1e6:.0f} µs")
+            inicio = time.perf_counter()
+            lidas = sum(1 for _ in leitor)
+            duracao = time.perf_counter() - inicio
+            print(f"Leitura completa: {lidas} partidas em {duracao:.2f} s ({lidas / duracao:,.0f} partidas/s)")
+
+
+if __name__ == '__main__':
+    main()
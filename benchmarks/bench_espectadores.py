@@ -0,0 +1,297 @@
+"""Mede a transmissão de uma partida P2P para muitos espectadores em loopback.
+
+Sobe quem hospeda e o oponente (rede.ConexaoJogo) neste processo e N
+espectadores em um subprocesso (um loop asyncio com N sockets). Os dois
+jogadores alternam jogadas aleatórias num tabuleiro grande, com revanche quando
+uma partida acaba. Mede:
+
+- quanto leva cada difusão no host, para os N espectadores de uma vez
+  (o histograma difusao_segundos de transmissao.py);
+- a latência de cada jogada até cada espectador (p50/p99) e quantas chegaram;
+- a ida e volta das jogadas entre os jogadores, para ver se os espectadores a
+  atrasam.
+
+--lentos K acrescenta K espectadores TCP que param de ler: a fila deles enche,
+eles passam a receber só o retrato da partida, e os jogadores não podem sentir.
+No fim, eles voltam a ler, e o benchmark confere se alcançaram a última jogada.
+--sem-lote troca o sendmmsg por um sendto por endereço no UDP, para comparar.
+
+Uso: python benchmarks/bench_espectadores.py [--protocolo tcp|udp] [--espectadores N]
+         [--jogadas M] [--ritmo S] [--tamanho N] [--lentos K] [--sem-lote]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+import metricas
+import protocolo as proto
+import rede
+import transmissao
+from bitboard import TabuleiroBits
+
+ASSISTIR = proto.codificar({'msg': 'ASSISTIR'})
+BATIMENTO = proto.codificar({'msg': 'BATIMENTO'})
+
+
+def porta_livre(tipo):
+    with socket.socket(socket.AF_INET, tipo) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentil(valores, q):
+    return valores[min(len(valores) - 1, int(q * len(valores)))] if valores else float('nan')
+
+
+# --- Espectadores (subprocesso) ---
+class Espectador:
+    """Anota o instante em que cada jogada chega; lê só o cabeçalho e a seq dos quadros."""
+
+    def __init__(self):
+        self.chegadas = {}
+        self.ultima_seq = 0
+        self.inscrito = False  # já recebeu o retrato inicial
+
+    def quadro(self, quadro, agora):
+        tipo = quadro[1]
+        if tipo in (proto.TIPO_JOGADA, proto.TIPO_ESTADO):
+            seq = int.from_bytes(quadro[4:8], 'big')
+            self.ultima_seq = max(self.ultima_seq, seq)
+            if tipo == proto.TIPO_JOGADA:
+                self.chegadas.setdefault(seq, agora)
+            else:
+                self.inscrito = True
+
+
+class EspectadorTCP(Espectador, asyncio.Protocol):
+    def __init__(self, lento=False):
+        super().__init__()
+        self.lento = lento
+        self.quadros = proto.LeitorQuadros()
+
+    def connection_made(self, transporte):
+        self.transporte = transporte
+        transporte.write(ASSISTIR)
+
+    def data_received(self, dados):
+        agora = time.monotonic()
+        self.quadros.alimentar(dados)
+        quadro = self.quadros.proximo()
+        while quadro is not None:
+            self.quadro(quadro, agora)
+            quadro = self.quadros.proximo()
+        if self.lento and self.inscrito:
+            self.transporte.pause_reading()  # já entrou na partida; daqui em diante, não lê mais
+
+
+class EspectadorUDP(Espectador, asyncio.DatagramProtocol):
+    def connection_made(self, transporte):
+        self.transporte = transporte
+        transporte.sendto(ASSISTIR)
+
+    def datagram_received(self, dados, addr):
+        self.quadro(dados, time.monotonic())
+
+
+async def assistir(protocolo, porta, n, lentos, canal):
+    loop = asyncio.get_running_loop()
+    espectadores, lentos_lista = [], []
+    for i in range(n + lentos):
+        if protocolo == 'tcp':
+            lento = i >= n
+            sock = socket.socket()
+            if lento:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.setblocking(False)
+            await loop.sock_connect(sock, ('127.0.0.1', porta))
+            _, espectador = await loop.create_connection(lambda: EspectadorTCP(lento), sock=sock)
+            (lentos_lista if lento else espectadores).append(espectador)
+        else:
+            _, espectador = await loop.create_datagram_endpoint(
+                EspectadorUDP, remote_addr=('127.0.0.1', porta))
+            espectadores.append(espectador)
+        if i % 100 == 99:
+            await asyncio.sleep(0.01)  # não estoura a fila de conexões pendentes do host
+    faltam = [e for e in espectadores + lentos_lista if not e.inscrito]
+    while faltam:
+        await asyncio.sleep(0.5)
+        faltam = [e for e in faltam if not e.inscrito]
+        if protocolo == 'udp':
+            for e in faltam:
+                e.transporte.sendto(ASSISTIR)  # a inscrição ou a resposta se perdeu
+    canal.send('pronto')
+    vez = 0
+    while not canal.poll(0):
+        await asyncio.sleep(0.1)
+        if protocolo == 'udp':
+            # Renova a inscrição de cada um a cada 5 s, espalhado: como os batimentos de verdade
+            for e in espectadores[vez % 50::50]:
+                e.transporte.sendto(BATIMENTO)
+            vez += 1
+    envios = canal.recv()
+    ultima = max(envios) if envios else 0
+    for e in lentos_lista:
+        e.lento = False
+        e.transporte.resume_reading()
+    await asyncio.sleep(1.5)
+    latencias = sorted(e.chegadas[seq] - envios[seq] for e in espectadores
+                       for seq in e.chegadas if seq in envios)
+    canal.send({
+        'recebidas': sum(len(e.chegadas) for e in espectadores),
+        'esperadas': len(envios) * len(espectadores),
+        'p50': percentil(latencias, 0.5), 'p99': percentil(latencias, 0.99),
+        'maxima': latencias[-1] if latencias else float('nan'),
+        'lentos_alcancaram': sum(e.ultima_seq == ultima for e in lentos_lista),
+        'lentos_jogadas': [len(e.chegadas) for e in lentos_lista],
+    })
+
+
+def processo_espectadores(protocolo, porta, n, lentos, canal):
+    asyncio.run(assistir(protocolo, porta, n, lentos, canal))
+
+
+# --- Jogadores (este processo) ---
+def esperar_evento(conexao, tipo, timeout=10):
+    fim = time.monotonic() + timeout
+    while time.monotonic() < fim:
+        try:
+            evento, conteudo = conexao.eventos.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if evento == tipo:
+            return conteudo
+        if evento in ('erro', 'desconexao'):
+            raise SystemExit(f"falha: {conteudo}")
+    raise SystemExit(f"sem o evento '{tipo}' em {timeout} s")
+
+
+def esperar_jogada(conexao, seq, timeout=10):
+    """Espera a jogada `seq` do outro lado chegar: como na partida de verdade, só então se joga."""
+    fim = time.monotonic() + timeout
+    while time.monotonic() < fim:
+        try:
+            evento, conteudo = conexao.eventos.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if evento == 'mensagem' and conteudo.get('seq', 0) >= seq and 'jogada' in conteudo:
+            return
+    raise SystemExit(f"a jogada {seq} não chegou em {timeout} s")
+
+
+def jogar(host, oponente, jogadas, ritmo, tamanho, aleatorio):
+    """Alterna jogadas aleatórias entre os dois lados. Retorna {seq: instante do envio}."""
+    variante = (tamanho, min(5, tamanho))
+    tabuleiro, partida, turno, seq = TabuleiroBits(*variante), 1, 'X', 0
+    envios = {}
+    anterior = None  # quem fez a última jogada
+    for _ in range(jogadas):
+        if tabuleiro.terminou():
+            partida += 1
+            for conexao in (host, oponente):
+                conexao.enviar({'msg': 'REVANCHE', 'partida': partida})
+            tabuleiro, turno = TabuleiroBits(*variante), proto.quem_comeca(partida)
+            time.sleep(ritmo)
+        ocupadas = tabuleiro.x | tabuleiro.o
+        indice = aleatorio.choice([i for i in range(tamanho * tamanho) if not ocupadas >> i & 1])
+        tabuleiro.jogar(indice, turno)
+        conexao = host if turno == 'X' else oponente
+        if anterior is not None and anterior is not conexao:
+            esperar_jogada(conexao, seq)
+        seq += 1
+        envios[seq] = time.monotonic()
+        conexao.enviar({'jogada': indice, 'jogador': turno, 'seq': seq})
+        anterior = conexao
+        turno = 'O' if turno == 'X' else 'X'
+        time.sleep(ritmo)
+    return envios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--protocolo', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--espectadores', type=int, default=1000)
+    parser.add_argument('--jogadas', type=int, default=300)
+    parser.add_argument('--ritmo', type=float, default=0.05, help="segundos entre jogadas")
+    parser.add_argument('--tamanho', type=int, default=15, help="lado do tabuleiro (5 em linha)")
+    parser.add_argument('--lentos', type=int, default=0, help="espectadores TCP que param de ler")
+    parser.add_argument('--sem-lote', action='store_true', help="UDP: um sendto por espectador")
+    args = parser.parse_args()
+    if args.sem_lote:
+        transmissao.ENVIO_EM_LOTE = False
+    tipo = socket.SOCK_STREAM if args.protocolo == 'tcp' else socket.SOCK_DGRAM
+    lentos = args.lentos if args.protocolo == 'tcp' else 0
+    porta = porta_livre(tipo)
+
+    metricas_host = metricas.Metricas()
+    sock_host = socket.socket(socket.AF_INET, tipo)
+    if args.protocolo == 'tcp':
+        sock_host.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    host = rede.ConexaoJogo(args.protocolo, 'h', sock_host, ('127.0.0.1', porta),
+                            variante=(args.tamanho, min(5, args.tamanho)), metricas=metricas_host)
+    host.iniciar()
+    time.sleep(0.2)
+    oponente = rede.ConexaoJogo(args.protocolo, 'c', socket.socket(socket.AF_INET, tipo),
+                                ('127.0.0.1', porta))
+    oponente.iniciar()
+    esperar_evento(host, 'conectado')
+    esperar_evento(oponente, 'conectado')
+
+    canal, canal_filho = multiprocessing.Pipe()
+    filho = multiprocessing.Process(target=processo_espectadores, daemon=True,
+                                    args=(args.protocolo, porta, args.espectadores, lentos, canal_filho))
+    filho.start()
+    if not canal.poll(60):
+        raise SystemExit("os espectadores não conseguiram entrar")
+    canal.recv()
+    inscritos = len(host.transmissao)
+
+    inicio = time.monotonic()
+    envios = jogar(host, oponente, args.jogadas, args.ritmo, args.tamanho, random.Random(1))
+    duracao = time.monotonic() - inicio
+    time.sleep(0.5)
+    canal.send(envios)
+    resultado = canal.recv()
+    filho.join(5)
+    host.fechar()
+    oponente.fechar()
+
+    instantaneo = metricas_host.instantaneo()
+    difusao = instantaneo['histogramas'].get('difusao_segundos')
+    rtt = instantaneo['histogramas'].get('rtt_jogada_segundos')
+    contadores = instantaneo['contadores']
+    lote = ''
+    if args.protocolo == 'udp':
+        lote = ", sendto por espectador" if args.sem_lote or not transmissao._carregar_sendmmsg() else ", sendmmsg"
+    print(f"{args.protocolo.upper()}, {inscritos} espectadores inscritos ({lentos} lentos){lote}, "
+          f"{len(envios)} jogadas em {duracao:.1f} s")
+    if difusao:
+        p50 = metricas.quantil(difusao, 0.5)
+        print(f"difusão no host: p50 {p50 * 1000:.2f} ms | p99 {metricas.quantil(difusao, 0.99) * 1000:.2f} ms"
+              f" ({p50 / max(1, inscritos) * 1e6:.2f} µs por espectador, {difusao['total']} difusões)")
+    print(f"jogada até o espectador: p50 {resultado['p50'] * 1000:.2f} ms | p99 {resultado['p99'] * 1000:.2f} ms"
+          f" | máx {resultado['maxima'] * 1000:.2f} ms")
+    print(f"jogadas entregues: {resultado['recebidas']} de {resultado['esperadas']}"
+          f" ({100 * resultado['recebidas'] / max(1, resultado['esperadas']):.2f}%)")
+    if rtt:
+        print(f"ida e volta entre os jogadores: p50 {metricas.quantil(rtt, 0.5) * 1000:.2f} ms"
+              f" | p99 {metricas.quantil(rtt, 0.99) * 1000:.2f} ms")
+    descartes_tcp = contadores.get(('descartes_difusao', 'tcp'), 0)
+    descartes_udp = contadores.get(('descartes_difusao', 'udp'), 0)
+    print(f"filas cheias (TCP, passaram ao retrato): {descartes_tcp} | datagramas descartados (UDP): {descartes_udp}")
+    if lentos:
+        print(f"lentos que alcançaram a última jogada: {resultado['lentos_alcancaram']} de {lentos}"
+              f" (jogadas recebidas por eles: mín {min(resultado['lentos_jogadas'])},"
+              f" máx {max(resultado['lentos_jogadas'])})")
+
+
+if __name__ == "__main__":
+    main()
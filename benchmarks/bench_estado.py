@@ -0,0 +1,132 @@
+"""Leitura do estado do jogo pela interface enquanto outra thread o altera.
+
+Uma thread escritora aplica jogadas aleatórias num tabuleiro 15x15 o mais
+rápido que pode (jogo.aplicar_mensagem_jogo, sob o lock_rede, com revanche a
+cada fim de partida), e a thread "da interface" lê, a cada quadro, o que o
+desenho usa: vencedor, empate, vez, as últimas mensagens e o tabuleiro.
+
+- estado publicado (jogo.py): o quadro pega estado_jogo uma vez, sem lock;
+- referência: o dicionário mutável de antes, alterado no lugar sob o lock, com
+  o quadro tomando o lock três vezes e lendo o tabuleiro fora dele.
+
+Relata o tempo de leitura de cada quadro (p50/p99), as jogadas por segundo da
+escritora e quantos quadros viram um estado rasgado (a vez de um momento e o
+tabuleiro de outro).
+
+Uso: python benchmarks/bench_estado.py [segundos]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ['JOGO_DIARIO'] = '0'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import jogo
+import protocolo as proto
+from bitboard import TabuleiroBits
+from logica import verificar_vencedor, verificar_empate
+
+TAMANHO, SEQUENCIA = 15, 5
+
+
+def percentil(valores, q):
+    return sorted(valores)[min(len(valores) - 1, int(q * len(valores)))]
+
+
+def rasgado(turno, partida, tabuleiro):
+    """A vez não bate com o tabuleiro: quem começa a partida joga quando o número de casas é par."""
+    comeca = proto.quem_comeca(partida)
+    return turno != (comeca if tabuleiro.ocupadas() % 2 == 0 else 'O' if comeca == 'X' else 'X')
+
+
+def escritor_publicado(parar, contagem):
+    rng = random.Random(1)
+    while not parar.is_set():
+        with jogo.lock_rede:
+            estado = jogo.estado_jogo
+            if estado.tabuleiro.terminou():
+                jogo.alterar(revanche_oponente=True)
+                jogo.pedir_revanche()
+                continue
+            livres = [i for i in range(TAMANHO * TAMANHO) if estado.tabuleiro.simbolo(i) == ' ']
+            jogo.aplicar_mensagem_jogo({'jogada': rng.choice(livres), 'jogador': estado.turno,
+                                        'seq': estado.seq + 1})
+            jogo.alterar(mensagem=f"jogada {estado.seq + 1}")
+        contagem[0] += 1
+
+
+def quadro_publicado():
+    estado = jogo.estado_jogo
+    vencedor = verificar_vencedor(estado.tabuleiro)
+    empate = verificar_empate(estado.tabuleiro)
+    textos = (estado.turno, estado.mensagens[-3:], vencedor, empate)
+    return textos, rasgado(estado.turno, estado.partida, estado.tabuleiro)
+
+
+def escritor_referencia(estado, lock, parar, contagem):
+    rng = random.Random(1)
+    while not parar.is_set():
+        with lock:
+            tabuleiro = estado['tabuleiro']
+            if tabuleiro.terminou():
+                estado['partida'] += 1
+                estado['tabuleiro'] = TabuleiroBits(TAMANHO, SEQUENCIA)
+                estado['turno'] = proto.quem_comeca(estado['partida'])
+                continue
+            livres = [i for i in range(TAMANHO * TAMANHO) if tabuleiro.simbolo(i) == ' ']
+            tabuleiro.jogar(rng.choice(livres), estado['turno'])
+            estado['seq'] += 1
+            estado['turno'] = 'O' if estado['turno'] == 'X' else 'X'
+            estado['mensagens'].append(f"jogada {estado['seq']}")
+        contagem[0] += 1
+
+
+def quadro_referencia(estado, lock):
+    with lock:
+        vencedor = verificar_vencedor(estado['tabuleiro'])
+        empate = verificar_empate(estado['tabuleiro'])
+    with lock:
+        turno = estado['turno']
+    with lock:
+        mensagens = estado['mensagens'][-3:]
+    return (turno, mensagens, vencedor, empate), rasgado(turno, estado['partida'], estado['tabuleiro'])
+
+
+def medir(escritor, quadro, segundos):
+    parar, contagem = threading.Event(), [0]
+    thread = threading.Thread(target=escritor, args=(parar, contagem))
+    thread.start()
+    tempos, rasgados = [], 0
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        _, torto = quadro()
+        tempos.append(time.perf_counter() - inicio)
+        rasgados += torto
+        time.sleep(0.001)  # o resto do quadro: desenhar, esperar eventos
+    parar.set()
+    thread.join()
+    return tempos, rasgados, contagem[0] / segundos
+
+
+if __name__ == "__main__":
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    jogo.estado_jogo = jogo.estado_inicial(TabuleiroBits(TAMANHO, SEQUENCIA))
+    referencia = {'tabuleiro': TabuleiroBits(TAMANHO, SEQUENCIA), 'turno': 'X', 'seq': 0, 'partida': 1,
+                  'mensagens': []}
+    lock = threading.Lock()
+    casos = [("estado publicado (sem lock)", escritor_publicado, quadro_publicado),
+             ("referência: dicionário + lock",
+              lambda parar, contagem: escritor_referencia(referencia, lock, parar, contagem),
+              lambda: quadro_referencia(referencia, lock))]
+    for nome, escritor, quadro in casos:
+        tempos, rasgados, jogadas = medir(escritor, quadro, segundos)
+        print(f"{nome:32s} quadro p50 {percentil(tempos, 0.5) * 1e6:7.1f} µs"
+              f" p99 {percentil(tempos, 0.99) * 1e6:8.1f} µs | {jogadas:9,.0f} jogadas/s"
+              f" | {rasgados} de {len(tempos)} quadros rasgados")
+    print(f"mensagens guardadas: {len(jogo.estado_jogo.mensagens)} (publicado)"
+          f" x {len(referencia['mensagens'])} (referência)")
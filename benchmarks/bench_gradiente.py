@@ -0,0 +1,47 @@
+"""Mede o tempo por quadro do fundo em gradiente, antes e depois do cache.
+
+Uso: python benchmarks/bench_gradiente.py [quadros]
+Roda sem janela (driver de vídeo "dummy" do SDL).
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame
+import jogo
+
+
+def gradiente_por_linhas(surface, cor_inicio, cor_fim):
+    """Implementação antiga: uma chamada a draw.line por linha, a cada quadro."""
+    for y in range(jogo.ALTURA):
+        r = cor_inicio[0] + (cor_fim[0] - cor_inicio[0]) * y / jogo.ALTURA
+        g = cor_inicio[1] + (cor_fim[1] - cor_inicio[1]) * y / jogo.ALTURA
+        b = cor_inicio[2] + (cor_fim[2] - cor_inicio[2]) * y / jogo.ALTURA
+        pygame.draw.line(surface, (r, g, b), (0, y), (jogo.LARGURA, y))
+
+
+def medir(funcao, quadros):
+    inicio = time.perf_counter()
+    for _ in range(quadros):
+        funcao(jogo.TELA, jogo.FUNDO_ESCURO, jogo.CINZA_FUNDO)
+    return (time.perf_counter() - inicio) / quadros * 1000
+
+
+if __name__ == "__main__":
+    quadros = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    jogo.inicializar_interface()
+    jogo.cache_gradiente.clear()
+    inicio = time.perf_counter()
+    jogo.desenhar_gradiente(jogo.TELA, jogo.FUNDO_ESCURO, jogo.CINZA_FUNDO)
+    primeira = (time.perf_counter() - inicio) * 1000
+
+    antes = medir(gradiente_por_linhas, quadros)
+    depois = medir(jogo.desenhar_gradiente, quadros)
+    print(f"numpy disponível: {jogo.obter_numpy() is not None}")
+    print(f"primeira renderização (cache vazio): {primeira:.3f} ms")
+    print(f"antes  (draw.line por quadro): {antes:.3f} ms/quadro")
+    print(f"depois (blit do cache):        {depois:.3f} ms/quadro")
+    print(f"ganho: {antes / depois:.1f}x")
@@ -0,0 +1,44 @@
+"""Mede o oponente do computador: resolução do 3x3 e busca nos tabuleiros maiores.
+
+Para cada variante joga uma partida do computador contra ele mesmo e mostra,
+por jogada, a média de tempo, de nós visitados e da profundidade alcançada.
+
+Uso: python benchmarks/bench_ia.py [orcamento_segundos]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ia
+from bitboard import TabuleiroBits
+
+VARIANTES = ((3, 3), (7, 4), (15, 5))
+LIMITE_JOGADAS = 20  # nos tabuleiros grandes, só o começo da partida
+
+
+def partida(motor, n, k):
+    tabuleiro, vez, buscas = TabuleiroBits(n, k), 'X', []
+    while not tabuleiro.vencedor() and tabuleiro.vazias and len(buscas) < LIMITE_JOGADAS:
+        tabuleiro.jogar(motor.escolher_jogada(tabuleiro, vez), vez)
+        buscas.append(motor.ultima_busca)
+        vez = 'O' if vez == 'X' else 'X'
+    return tabuleiro.vencedor(), buscas
+
+
+if __name__ == "__main__":
+    orcamento = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    inicio = time.perf_counter()
+    motor = ia.MotorIA(3, 3)
+    print(f"3x3 resolvido em {(time.perf_counter() - inicio) * 1000:.1f} ms"
+          f" ({len(motor.tabela)} posições canônicas)")
+    for n, k in VARIANTES:
+        motor = ia.MotorIA(n, k, orcamento) if n > 3 else ia.obter_motor(n, k)
+        vencedor, buscas = partida(motor, n, k)
+        tempo = sum(b['tempo'] for b in buscas) / len(buscas)
+        nos = sum(b['nos'] for b in buscas) / len(buscas)
+        profundidade = sum(b['profundidade'] for b in buscas) / len(buscas)
+        print(f"{n}x{n}, {k} em linha: {len(buscas)} jogadas, vencedor {vencedor or '-'}"
+              f" | {tempo * 1000:8.2f} ms/jogada | {nos:8.0f} nós/jogada"
+              f" | {nos / tempo:9.0f} nós/s | profundidade média {profundidade:.1f}")
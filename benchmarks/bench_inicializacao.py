@@ -0,0 +1,124 @@
+"""Mede a inicialização da interface: importação de jogo.py e tempo até o primeiro quadro.
+
+Cada medida roda num processo Python novo, para pegar a partida a frio:
+
+- `python -X importtime -c "import jogo"`: total da importação e os módulos mais
+  caros (a importação não abre janela nem carrega fontes);
+- tempo até o primeiro quadro do menu, do início do processo ao primeiro flip,
+  em três cenários: a inicialização antiga (pygame.init, set_mode e quatro
+  SysFont durante o import), a nova com o cache de fontes vazio (resolve os
+  caminhos uma vez e grava) e a nova com o cache já gravado.
+
+Uso: python benchmarks/bench_inicializacao.py [repeticoes]
+Roda sem janela (driver de vídeo "dummy" do SDL).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAIS_CAROS = 8
+
+PRIMEIRO_QUADRO = """
+jogo.desenhar_menu('PROTOCOLO', {'host': '127.0.0.1', 'porta': '5555'}, None)
+jogo.pygame.display.flip()
+fim = time.perf_counter()
+print(importado - inicio, pronto - importado, fim - pronto)
+"""
+
+CODIGO_NOVO = """
+import time
+inicio = time.perf_counter()
+import jogo
+importado = time.perf_counter()
+jogo.inicializar_interface()
+pronto = time.perf_counter()
+""" + PRIMEIRO_QUADRO
+
+# O que o import de jogo.py fazia antes: tudo acontecia no carregamento do módulo
+CODIGO_ANTIGO = """
+import time
+inicio = time.perf_counter()
+import pygame
+try:
+    import numpy
+except ImportError:
+    pass
+pygame.init()
+pygame.font.init()
+tela = pygame.display.set_mode((600, 700))
+pygame.display.set_caption("Jogo da Velha em Rede")
+fontes = (pygame.font.SysFont('Arial', 40, bold=True), pygame.font.SysFont('Arial', 32),
+          pygame.font.SysFont('Arial', 24), pygame.font.SysFont('Arial', 150, bold=True))
+relogio = pygame.time.Clock()
+import jogo
+jogo.TELA, jogo.CLOCK = tela, relogio
+jogo.FONTE_TITULO, jogo.FONTE_PADRAO, jogo.FONTE_MENOR, jogo.FONTE_JOGADOR_GRANDE = fontes
+importado = pronto = time.perf_counter()
+""" + PRIMEIRO_QUADRO
+
+
+def ambiente(cache_fontes=None):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    env['PYTHONPATH'] = RAIZ + os.pathsep + env.get('PYTHONPATH', '')
+    if cache_fontes:
+        env['JOGO_CACHE_FONTES'] = cache_fontes
+    return env
+
+
+def importtime():
+    """Roda `python -X importtime -c "import jogo"` e retorna (total_us, [(proprio_us, modulo)])."""
+    env = ambiente()
+    del env['SDL_VIDEODRIVER']  # importar não pode depender de display
+    env.pop('DISPLAY', None)
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import jogo'],
+                           env=env, capture_output=True, text=True, check=True).stderr
+    modulos, total = [], 0
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        modulos.append((int(proprio), nome.rstrip()))
+        if nome.strip() == 'jogo':
+            total = int(acumulado)
+    return total, sorted(modulos, reverse=True)[:MAIS_CAROS]
+
+
+def primeiro_quadro(codigo, cache_fontes=None, limpar_cache=False):
+    """Roda `codigo` num processo novo; retorna (importação, inicialização, quadro, processo) em s."""
+    if limpar_cache and os.path.exists(cache_fontes):
+        os.remove(cache_fontes)
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente(cache_fontes),
+                           capture_output=True, text=True, check=True).stdout
+    processo = time.perf_counter() - inicio
+    return tuple(float(v) for v in saida.split()[-3:]) + (processo,)
+
+
+def mediana(medidas):
+    return [statistics.median(coluna) * 1000 for coluna in zip(*medidas)]
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    total, modulos = importtime()
+    print(f"import jogo (-X importtime, sem display): {total / 1000:.1f} ms; mais caros:")
+    for proprio, nome in modulos:
+        print(f"  {proprio / 1000:7.1f} ms  {nome.strip()}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        cache = os.path.join(pasta, 'fontes.json')
+        cenarios = (
+            ("antigo (init no import, SysFont)", lambda: primeiro_quadro(CODIGO_ANTIGO)),
+            ("novo, cache de fontes vazio", lambda: primeiro_quadro(CODIGO_NOVO, cache, limpar_cache=True)),
+            ("novo, cache de fontes gravado", lambda: primeiro_quadro(CODIGO_NOVO, cache)),
+        )
+        print(f"\ntempo até o primeiro quadro (mediana de {repeticoes} processos, ms):")
+        print(f"{'':32s} {'import':>8s} {'init':>8s} {'quadro':>8s} {'total':>8s} {'processo':>9s}")
+        for nome, medir in cenarios:
+            importacao, inicializacao, quadro, processo = mediana([medir() for _ in range(repeticoes)])
+            print(f"{nome:32s} {importacao:8.1f} {inicializacao:8.1f} {quadro:8.1f}"
+                  f" {importacao + inicializacao + quadro:8.1f} {processo:9.1f}")
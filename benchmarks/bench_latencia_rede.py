@@ -0,0 +1,115 @@
+"""Compara a latência jogada→tela da rede asyncio com o modelo antigo de threads com polling.
+
+Modelo antigo: thread de rede com recv(settimeout(0.1)) + sleep(0.01) gravando no
+estado, e a interface verificando o estado a 60 FPS. Modelo novo: rede.ConexaoJogo,
+com a interface bloqueada até ser notificada.
+
+Uso: python benchmarks/bench_latencia_rede.py [jogadas]
+"""
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import protocolo as proto
+import rede
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def enviar_jogadas(porta, total, enviados):
+    """Conecta ao host e envia `total` jogadas em intervalos aleatórios."""
+    aleatorio = random.Random(1)
+    with socket.create_connection(('127.0.0.1', porta)) as sock:
+        time.sleep(0.2)
+        for seq in range(1, total + 1):
+            time.sleep(aleatorio.uniform(0.02, 0.05))
+            enviados[seq] = time.perf_counter()
+            sock.sendall(proto.codificar({'jogada': seq % 9, 'jogador': 'O', 'seq': seq}))
+        time.sleep(0.3)
+
+
+def medir_threads_antigas(total):
+    porta = porta_livre()
+    enviados, vistos, estado = {}, {}, {'seq': 0}
+    lock, fim = threading.Lock(), threading.Event()
+
+    def thread_rede():
+        servidor = socket.socket()
+        servidor.bind(('127.0.0.1', porta))
+        servidor.listen(1)
+        conn, _ = servidor.accept()
+        leitor = proto.LeitorQuadros()
+        while not fim.is_set():
+            try:
+                conn.settimeout(0.1)
+                dados = conn.recv(4096)
+                if not dados:
+                    break
+                leitor.alimentar(dados)
+                quadro = leitor.proximo()
+                while quadro is not None:
+                    with lock:
+                        estado['seq'] = proto.decodificar(quadro)['seq']
+                    quadro = leitor.proximo()
+            except socket.timeout:
+                pass
+            time.sleep(0.01)
+        conn.close()
+        servidor.close()
+
+    threading.Thread(target=thread_rede, daemon=True).start()
+    time.sleep(0.1)
+    cliente = threading.Thread(target=enviar_jogadas, args=(porta, total, enviados))
+    cliente.start()
+    while cliente.is_alive():  # "interface" a 60 FPS
+        with lock:
+            seq = estado['seq']
+        if seq and seq not in vistos:
+            vistos[seq] = time.perf_counter()
+        time.sleep(1 / 60)
+    fim.set()
+    return [vistos[s] - enviados[s] for s in vistos]
+
+
+def medir_asyncio(total):
+    porta = porta_livre()
+    enviados, vistos = {}, {}
+    acordar = threading.Event()
+    conexao = rede.ConexaoJogo('tcp', 'h', socket.socket(), ('127.0.0.1', porta), ao_notificar=acordar.set)
+    conexao.iniciar()
+    time.sleep(0.1)
+    cliente = threading.Thread(target=enviar_jogadas, args=(porta, total, enviados))
+    cliente.start()
+    while cliente.is_alive():  # "interface" bloqueada até ser notificada
+        if not acordar.wait(0.5):
+            continue
+        acordar.clear()
+        while not conexao.eventos.empty():
+            tipo, dados = conexao.eventos.get_nowait()
+            if tipo == 'mensagem':
+                vistos[dados['seq']] = time.perf_counter()
+    conexao.fechar()
+    return [vistos[s] - enviados[s] for s in vistos]
+
+
+def resumo(nome, latencias):
+    ms = sorted(x * 1000 for x in latencias)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(f"{nome:28s} n={len(ms):4d}  média={statistics.mean(ms):7.2f} ms"
+          f"  p50={statistics.median(ms):7.2f} ms  p99={p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    resumo("threads com polling (antigo)", medir_threads_antigas(total))
+    resumo("asyncio + fila (novo)", medir_asyncio(total))
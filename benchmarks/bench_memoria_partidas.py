@@ -0,0 +1,54 @@
+"""Compara a memória ocupada por partida: dicionário no estilo estado_jogo x Partida compacta.
+
+Cria N partidas de cada forma (com algumas jogadas feitas) e mede com
+tracemalloc os bytes alocados, sem contar os objetos dos clientes.
+
+Uso: python benchmarks/bench_memoria_partidas.py [partidas]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logica import criar_tabuleiro, fazer_jogada
+from servidor import Partida
+
+JOGADAS = [(0, 'X'), (4, 'O'), (8, 'X')]
+
+
+def partida_em_dicionario(id_partida, cliente_x, cliente_o):
+    estado = {'id': id_partida, 'jogadores': {'X': cliente_x, 'O': cliente_o},
+              'tabuleiro': criar_tabuleiro(), 'turno': 'X', 'seq': 0, 'encerrada': False}
+    for seq, (indice, simbolo) in enumerate(JOGADAS, 1):
+        fazer_jogada(estado['tabuleiro'], indice // 3, indice % 3, simbolo)
+        estado['seq'] = seq
+    return estado
+
+
+def partida_compacta(id_partida, cliente_x, cliente_o):
+    partida = Partida(id_partida, cliente_x, cliente_o)
+    for seq, (indice, simbolo) in enumerate(JOGADAS, 1):
+        partida.jogar(indice, simbolo)
+        partida.seq = seq
+    return partida
+
+
+def medir(criar, n, cliente_x, cliente_o):
+    tracemalloc.start()
+    # Ids acima do cache de inteiros pequenos, como num servidor em produção
+    partidas = {1000 + i: criar(1000 + i, cliente_x, cliente_o) for i in range(n)}
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del partidas
+    return atual / n
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cliente_x, cliente_o = object(), object()
+    antes = medir(partida_em_dicionario, n, cliente_x, cliente_o)
+    depois = medir(partida_compacta, n, cliente_x, cliente_o)
+    print(f"{n} partidas (incluindo a entrada no dicionário de partidas)")
+    print(f"dicionário estilo estado_jogo: {antes:7.0f} bytes/partida")
+    print(f"Partida compacta:              {depois:7.0f} bytes/partida ({antes / depois:.1f}x menor)")
@@ -0,0 +1,52 @@
+"""Custo das métricas no caminho quente, ligadas e desligadas.
+
+Compara cada operação (somar um contador, observar um histograma, entrar e
+sair do lock_rede medido) com a referência sem métricas e com o custo de
+codificar uma jogada, que é o trabalho que a rede faz a cada mensagem.
+
+Uso: python benchmarks/bench_metricas.py [repeticoes]
+"""
+import os
+import sys
+import threading
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import metricas
+import protocolo as proto
+
+JOGADA = {'jogada': 4, 'jogador': 'X', 'seq': 7}
+
+
+def medir(funcao, repeticoes):
+    return min(timeit.repeat(funcao, number=repeticoes, repeat=5)) / repeticoes * 1e9
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    lock = threading.Lock()
+
+    def com_lock():
+        with lock:
+            pass
+
+    referencias = (("codificar uma jogada", lambda: proto.codificar(JOGADA)),
+                   ("with threading.Lock", com_lock))
+    for nome, funcao in referencias:
+        print(f"{nome:36s} {medir(funcao, repeticoes):8.1f} ns")
+
+    for ativo in (False, True):
+        m = metricas.Metricas(ativo=ativo)
+        medido = metricas.LockMedido(threading.Lock(), m, 'espera')
+
+        def com_lock_medido():
+            with medido:
+                pass
+
+        estado = 'ligadas' if ativo else 'desligadas'
+        operacoes = (("somar contador", lambda: m.somar('bytes_enviados', 11, 'tcp')),
+                     ("observar histograma", lambda: m.observar('rtt', 0.0012)),
+                     ("with LockMedido", com_lock_medido))
+        for nome, funcao in operacoes:
+            print(f"{nome + ' (' + estado + ')':36s} {medir(funcao, repeticoes):8.1f} ns")
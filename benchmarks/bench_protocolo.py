@@ -0,0 +1,41 @@
+"""Compara codificação/decodificação do protocolo binário com o caminho JSON antigo.
+
+Uso: python benchmarks/bench_protocolo.py [repetições]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import protocolo as proto
+
+TABULEIRO = [['X', 'O', ' '], [' ', 'X', ' '], ['O', ' ', ' ']]
+
+
+def medir(descricao, funcao, repeticoes):
+    segundos = min(timeit.repeat(funcao, number=repeticoes, repeat=5))
+    print(f"{descricao:42s} {segundos / repeticoes * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    mensagem = {'tabuleiro': TABULEIRO}
+    jogada = {'jogada': 4, 'jogador': 'X', 'seq': 1}
+
+    antigo = json.dumps(mensagem).encode('utf-8')
+    binario = proto.codificar(mensagem)
+    print(f"tamanho JSON antigo: {len(antigo)} bytes | tabuleiro binário: {len(binario)} bytes"
+          f" | jogada binária: {len(proto.codificar(jogada))} bytes")
+
+    medir("json.dumps + encode (antigo)", lambda: json.dumps(mensagem).encode('utf-8'), repeticoes)
+    medir("json.loads + decode (antigo)", lambda: json.loads(antigo.decode('utf-8')), repeticoes)
+    medir("codificar tabuleiro (binário)", lambda: proto.codificar(mensagem), repeticoes)
+    medir("decodificar tabuleiro (binário)", lambda: proto.decodificar(binario), repeticoes)
+    quadro_jogada = proto.codificar(jogada)
+    medir("codificar jogada (binário)", lambda: proto.codificar(jogada), repeticoes)
+    medir("decodificar jogada (binário)", lambda: proto.decodificar(quadro_jogada), repeticoes)
+    quadro_json = proto.codificar(mensagem, proto.FORMATO_JSON)
+    medir("codificar tabuleiro (JSON enquadrado)", lambda: proto.codificar(mensagem, proto.FORMATO_JSON), repeticoes)
+    medir("decodificar tabuleiro (JSON enquadrado)", lambda: proto.decodificar(quadro_json), repeticoes)
@@ -0,0 +1,119 @@
+"""Pareamento do saguão (saguao.py) com milhares de jogadores esperando.
+
+A fila começa com J jogadores espalhados por V variantes, com níveis sorteados
+(normal, média 1500, desvio 350), inseridos direto no índice, como se as
+tolerâncias ainda não tivessem alcançado ninguém. Depois chegam C jogadores,
+um de cada vez, por Saguao.entrar (o que o servidor chama a cada cliente
+novo); para manter a fila em J, cada um que sai pareado é reposto sem medir.
+
+- saguão: faixas de nível com bisect (FilaNivelada);
+- referência: uma lista por variante, percorrida inteira a cada chegada atrás
+  do nível mais próximo dentro da tolerância.
+
+Relata o tempo de cada chegada (p50/p99/máximo) e quanto leva uma varredura
+(Saguao.varrer) com a fila cheia.
+
+Uso: python benchmarks/bench_saguao.py [--jogadores J] [--chegadas C] [--variantes V]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import metricas
+import saguao
+
+VARIANTES = [(3, 3, 'tcp'), (3, 3, 'udp'), (15, 5, 'tcp'), (15, 5, 'udp'), (7, 4, 'tcp'), (7, 4, 'udp')]
+
+
+def sortear_nivel(rng):
+    return min(max(int(rng.gauss(1500, 350)), 0), saguao.NIVEL_MAXIMO)
+
+
+class FilaLista:
+    """Referência: os que esperam numa lista por variante, percorrida a cada chegada."""
+
+    def __init__(self, tolerancia=saguao.TOLERANCIA_INICIAL):
+        self.tolerancia = tolerancia
+        self.listas = {}
+
+    def encher(self, jogador, variante, nivel, chegada):
+        self.listas.setdefault(variante, []).append((nivel, chegada, jogador))
+
+    def entrar(self, jogador, variante, nivel, agora):
+        lista = self.listas.setdefault(variante, [])
+        melhor, distancia = None, self.tolerancia + 1
+        for indice, (outro, _, _) in enumerate(lista):
+            if abs(outro - nivel) < distancia:  # a lista está em ordem de chegada: empate fica com o mais antigo
+                melhor, distancia = indice, abs(outro - nivel)
+        if melhor is None:
+            lista.append((nivel, agora, jogador))
+            return None
+        return lista.pop(melhor)[2]
+
+
+def percentil(valores, q):
+    return valores[min(len(valores) - 1, int(q * len(valores)))]
+
+
+def medir(fila, encher, chegadas, populacao, rng):
+    """Enche a fila com a população e mede cada chegada; retorna (tempos, pareados)."""
+    ids = itertools.count()
+    for variante, nivel in populacao:
+        encher(next(ids), variante, nivel, 0.0)
+    tempos, pareados = [], 0
+    for agora, (variante, nivel) in enumerate(chegadas, 1):
+        inicio = time.perf_counter()
+        oponente = fila.entrar(next(ids), variante, nivel, agora * 1e-3)
+        tempos.append(time.perf_counter() - inicio)
+        if oponente is not None:
+            pareados += 1
+            # Repõe quem saiu pareado (sem medir), para a fila continuar do mesmo tamanho
+            encher(next(ids), rng.choice(VARIANTES), sortear_nivel(rng), agora * 1e-3)
+    tempos.sort()
+    return tempos, pareados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jogadores', type=int, default=10000, help="jogadores esperando na fila")
+    parser.add_argument('--chegadas', type=int, default=20000, help="chegadas medidas")
+    parser.add_argument('--variantes', type=int, default=4, help=f"filas (até {len(VARIANTES)})")
+    args = parser.parse_args()
+    variantes = VARIANTES[:args.variantes]
+    rng = random.Random(1)
+    populacao = [(rng.choice(variantes), sortear_nivel(rng)) for _ in range(args.jogadores)]
+    chegadas = [(rng.choice(variantes), sortear_nivel(rng)) for _ in range(args.chegadas)]
+
+    print(f"{args.jogadores} jogadores esperando em {len(variantes)} filas, {args.chegadas} chegadas")
+    lobby = saguao.Saguao(metricas.Metricas())
+
+    def encher_saguao(jogador, variante, nivel, chegada):
+        fila = lobby.filas.get(variante)
+        if fila is None:
+            fila = lobby.filas[variante] = saguao.FilaNivelada(lobby.largura)
+        fila.entrar(jogador, nivel, chegada)
+        lobby.onde[jogador] = variante
+
+    referencia = FilaLista()
+    for nome, fila, encher in (("saguão (faixas + bisect)", lobby, encher_saguao),
+                               ("referência: lista percorrida", referencia, referencia.encher)):
+        tempos, pareados = medir(fila, encher, chegadas, populacao, random.Random(2))
+        print(f"{nome:30s} chegada p50 {percentil(tempos, 0.5) * 1e6:8.1f} µs"
+              f" | p99 {percentil(tempos, 0.99) * 1e6:8.1f} µs | máx {tempos[-1] * 1e6:8.1f} µs"
+              f" | {pareados} pareados na hora")
+
+    faixas = sum(len(fila.ocupadas) for fila in lobby.filas.values())
+    inicio = time.perf_counter()
+    pares = lobby.varrer(agora=args.chegadas * 1e-3 + 5)
+    duracao = time.perf_counter() - inicio
+    print(f"varredura com {len(lobby) + 2 * len(pares)} esperando ({faixas} faixas ocupadas):"
+          f" {duracao * 1e3:.2f} ms, {len(pares)} pares formados")
+
+
+if __name__ == '__main__':
+    main()
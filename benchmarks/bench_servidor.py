@@ -0,0 +1,141 @@
+"""Mede quantas partidas o servidor dedicado sustenta por núcleo.
+
+Sobe `servidor.py` (com 1 ou mais processos trabalhadores) em um subprocesso e conecta 2×N robôs TCP em loopback, que
+jogam partidas completas com jogadas aleatórias (esperando `ritmo` segundos
+antes de cada jogada) e reconectam para uma nova partida ao final. Mede as
+jogadas e partidas por segundo e o uso de CPU do servidor, somando os
+processos trabalhadores (Linux).
+
+Uso: python benchmarks/bench_servidor.py [partidas_simultaneas] [segundos] [ritmo] [processos]
+"""
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+import protocolo as proto
+from logica import criar_tabuleiro, fazer_jogada, verificar_vencedor, verificar_empate
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def cpu_do_processo(pid):
+    """Tempo de CPU (usuário + sistema) do processo em segundos, via /proc."""
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def cpu_do_servidor(pid):
+    """CPU do processo do servidor mais a dos seus trabalhadores."""
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        filhos = [int(p) for p in f.read().split()]
+    return cpu_do_processo(pid) + sum(cpu_do_processo(filho) for filho in filhos)
+
+
+async def robo(porta, ritmo, contadores, parar, aleatorio):
+    """Joga partidas em sequência até `parar` ser sinalizado."""
+    while not parar.is_set():
+        leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+        # Como o jogo: o servidor põe na fila quem se apresenta (sem HELLO, só depois de
+        # servidor.ESPERA_PRIMEIRA_MENSAGEM, o prazo de quem poderia estar mandando um RETOMAR)
+        escritor.write(proto.codificar({'msg': 'HELLO', 'formato': proto.FORMATO_BINARIO}))
+        quadros = proto.LeitorQuadros()
+        tabuleiro, turno, seq, simbolo = criar_tabuleiro(), 'X', 0, None
+
+        async def jogar():
+            nonlocal turno, seq
+            await asyncio.sleep(ritmo)
+            livres = [(i, j) for i in range(3) for j in range(3) if tabuleiro[i][j] == ' ']
+            i, j = aleatorio.choice(livres)
+            fazer_jogada(tabuleiro, i, j, simbolo)
+            seq += 1
+            turno = 'O' if simbolo == 'X' else 'X'
+            escritor.write(proto.codificar({'jogada': i * 3 + j, 'jogador': simbolo, 'seq': seq}))
+            contadores['jogadas'] += 1
+
+        try:
+            while not parar.is_set():
+                if simbolo and turno == simbolo:
+                    await jogar()
+                    if verificar_vencedor(tabuleiro) or verificar_empate(tabuleiro):
+                        break
+                    continue
+                dados = await leitor.read(4096)
+                if not dados:
+                    break
+                quadros.alimentar(dados)
+                quadro = quadros.proximo()
+                fim = False
+                while quadro is not None:
+                    mensagem = proto.decodificar(quadro)
+                    if mensagem.get('msg') == 'PARTIDA':
+                        simbolo = mensagem['jogador']
+                    elif 'jogada' in mensagem:
+                        linha, coluna = divmod(mensagem['jogada'], 3)
+                        fazer_jogada(tabuleiro, linha, coluna, mensagem['jogador'])
+                        seq, turno = mensagem['seq'], simbolo
+                        fim = bool(verificar_vencedor(tabuleiro) or verificar_empate(tabuleiro))
+                    elif 'tabuleiro' in mensagem:
+                        tabuleiro, turno, seq = mensagem['tabuleiro'], mensagem['turno'], mensagem['seq']
+                    quadro = quadros.proximo()
+                if fim:
+                    break
+            contadores['partidas'] += 0.5  # cada partida é contada pelos dois robôs
+            escritor.write(proto.codificar({'msg': 'DESCONEXAO'}))  # sem isso, o servidor guardaria a sessão
+        finally:
+            escritor.close()
+
+
+async def principal(partidas, segundos, ritmo, processos):
+    porta = porta_livre()
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, 'servidor.py'),
+                                 '--host', '127.0.0.1', '--porta', str(porta),
+                                 '--processos', str(processos)],
+                                stdout=subprocess.DEVNULL)
+    try:
+        await asyncio.sleep(1.0)
+        contadores, parar = {'jogadas': 0, 'partidas': 0}, asyncio.Event()
+        robos = [asyncio.create_task(robo(porta, ritmo, contadores, parar, random.Random(i)))
+                 for i in range(2 * partidas)]
+        await asyncio.sleep(2.0)  # aquecimento: todos conectados e pareados
+        jogadas0, partidas0 = contadores['jogadas'], contadores['partidas']
+        cpu0, t0 = cpu_do_servidor(processo.pid), time.perf_counter()
+        await asyncio.sleep(segundos)
+        duracao = time.perf_counter() - t0
+        cpu = (cpu_do_servidor(processo.pid) - cpu0) / duracao
+        jogadas = (contadores['jogadas'] - jogadas0) / duracao
+        concluidas = (contadores['partidas'] - partidas0) / duracao
+        parar.set()
+        for tarefa in robos:
+            tarefa.cancel()
+        await asyncio.gather(*robos, return_exceptions=True)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    print(f"{partidas} partidas simultâneas, ritmo {ritmo * 1000:.0f} ms por jogada,"
+          f" {processos} processo(s) no servidor")
+    print(f"jogadas/s: {jogadas:9.0f} | partidas concluídas/s: {concluidas:7.0f}"
+          f" | CPU do servidor: {cpu * 100:5.1f}% de um núcleo")
+    if cpu > 0:
+        print(f"estimativa por núcleo: {jogadas / cpu:9.0f} jogadas/s"
+              f" | {partidas / cpu:7.0f} partidas simultâneas neste ritmo")
+
+
+if __name__ == "__main__":
+    partidas = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    ritmo = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    processos = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    asyncio.run(principal(partidas, segundos, ritmo, processos))
@@ -0,0 +1,74 @@
+"""Custo por jogada da verificação de fim de jogo, do 3x3 ao 100x100.
+
+Preenche cada tabuleiro com jogadas aleatórias (jogadas que dariam vitória são
+desfeitas, para a partida seguir até o fim, que é o pior caso) e compara:
+
+- incremental: TabuleiroBits.jogar verifica só as 4 linhas da célula jogada,
+  O(K), e vencedor()/empate() leem o estado guardado, O(1);
+- varredura: depois de cada jogada, percorre o tabuleiro inteiro procurando
+  K em linha e células vazias, O(N²). Nos tabuleiros grandes ela é medida só
+  numa amostra de jogadas espalhadas pela partida.
+
+Uso: python benchmarks/bench_tabuleiro_grande.py
+"""
+import random
+import time
+
+from bench_bitboard import vencedor_varredura, empate_varredura
+from bitboard import TabuleiroBits
+
+VARIANTES = ((3, 3), (7, 4), (15, 5), (30, 5), (50, 5), (100, 5))
+AMOSTRAS_VARREDURA = 100
+
+
+def sequencia_de_jogadas(n, k, aleatorio):
+    """Jogadas (índice, símbolo) que preenchem o tabuleiro sem ninguém vencer."""
+    tabuleiro = TabuleiroBits(n, k)
+    celulas = list(range(n * n))
+    aleatorio.shuffle(celulas)
+    jogadas = []
+    for indice in celulas:
+        simbolo = 'XO'[len(jogadas) % 2]
+        tabuleiro.jogar(indice, simbolo)
+        if tabuleiro.vencedor():
+            tabuleiro.desfazer(indice)
+        else:
+            jogadas.append((indice, simbolo))
+    return jogadas
+
+
+def medir_incremental(n, k, jogadas):
+    tabuleiro = TabuleiroBits(n, k)
+    inicio = time.perf_counter()
+    for indice, simbolo in jogadas:
+        tabuleiro.jogar(indice, simbolo)
+        tabuleiro.vencedor()
+        tabuleiro.empate()
+    return (time.perf_counter() - inicio) / len(jogadas)
+
+
+def medir_varredura(n, k, jogadas):
+    tabuleiro = [[' '] * n for _ in range(n)]
+    passo = max(1, len(jogadas) // AMOSTRAS_VARREDURA)
+    total, medidas = 0.0, 0
+    for numero, (indice, simbolo) in enumerate(jogadas):
+        linha, coluna = divmod(indice, n)
+        tabuleiro[linha][coluna] = simbolo
+        if numero % passo == 0:
+            inicio = time.perf_counter()
+            vencedor_varredura(tabuleiro, k)
+            empate_varredura(tabuleiro, k)
+            total += time.perf_counter() - inicio
+            medidas += 1
+    return total / medidas
+
+
+if __name__ == "__main__":
+    aleatorio = random.Random(1)
+    for n, k in VARIANTES:
+        jogadas = sequencia_de_jogadas(n, k, aleatorio)
+        incremental = medir_incremental(n, k, jogadas)
+        varredura = medir_varredura(n, k, jogadas)
+        print(f"{n:3d}x{n:<3d} {k} em linha, {len(jogadas):5d} jogadas:"
+              f" incremental {incremental * 1e6:7.2f} µs/jogada"
+              f" | varredura {varredura * 1e6:10.1f} µs/jogada | {varredura / incremental:8.0f}x")
@@ -0,0 +1,71 @@
+"""Exercita a camada UDP confiável em loopback com perda, atraso e reordenação simulados.
+
+Uso: python benchmarks/bench_udp_confiavel.py [mensagens] [perda] [atraso_s] [reordenar]
+Ex.: python benchmarks/bench_udp_confiavel.py 500 0.2 0.01 0.1
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import protocolo as proto
+import udp_confiavel
+
+
+def socket_loopback():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(0.02)
+    return sock
+
+
+def bombear(canal, recebidos, parar):
+    """Loop de recepção: processa datagramas, entrega quadros e faz retransmissões."""
+    while not parar.is_set():
+        canal.retransmitir()
+        try:
+            datagrama, addr = canal.sock.recvfrom(4096)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+        quadro = canal.processar(datagrama, addr)
+        if quadro is not None:
+            recebidos.append(proto.decodificar(quadro))
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    perda = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    atraso = float(sys.argv[3]) if len(sys.argv) > 3 else 0.005
+    reordenar = float(sys.argv[4]) if len(sys.argv) > 4 else 0.1
+
+    a, b = socket_loopback(), socket_loopback()
+    simulador = dict(perda=perda, atraso=atraso, variacao=atraso, reordenar=reordenar)
+    canal_a = udp_confiavel.CanalConfiavel(a, udp_confiavel.SimuladorRede(semente=1, **simulador))
+    canal_b = udp_confiavel.CanalConfiavel(b, udp_confiavel.SimuladorRede(semente=2, **simulador))
+    recebidos_a, recebidos_b, parar = [], [], threading.Event()
+    for canal, recebidos in ((canal_a, recebidos_a), (canal_b, recebidos_b)):
+        threading.Thread(target=bombear, args=(canal, recebidos, parar), daemon=True).start()
+
+    inicio = time.perf_counter()
+    for seq in range(1, total + 1):
+        quadro = proto.codificar({'jogada': seq % 9, 'jogador': 'X', 'seq': seq})
+        canal_a.enviar(quadro, b.getsockname())
+        time.sleep(0.001)
+    while canal_a.pendentes and time.perf_counter() - inicio < 60:
+        time.sleep(0.01)
+    duracao = time.perf_counter() - inicio
+    parar.set()
+
+    seqs = sorted(m['seq'] for m in recebidos_b)
+    print(f"perda={perda:.0%} atraso={atraso * 1000:.0f}ms reordenar={reordenar:.0%}")
+    print(f"entregues: {len(set(seqs))}/{total} | entregas repetidas: {len(seqs) - len(set(seqs))}"
+          f" | fora de ordem: {sum(1 for x, y in zip(recebidos_b, recebidos_b[1:]) if y['seq'] < x['seq'])}")
+    print(f"remetente: {canal_a.estatisticas}")
+    print(f"destinatário: {canal_b.estatisticas}")
+    srtt = canal_a.srtt * 1000 if canal_a.srtt is not None else float('nan')
+    print(f"srtt={srtt:.1f}ms rto={canal_a.rto * 1000:.1f}ms tempo total={duracao:.2f}s")
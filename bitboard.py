@@ -0,0 +1,237 @@
+"""Motor de tabuleiro em bits: as casas de X e de O são dois inteiros de N×N bits.
+
+A célula (linha, coluna) é o bit linha * N + coluna. Cada jogada verifica só as
+quatro linhas (horizontal, vertical e diagonais) que passam pela célula
+jogada, em O(K), e um contador de células vazias torna o empate O(1); o
+vencedor fica guardado, então vencedor() e empate() não varrem o tabuleiro.
+
+Para tabuleiros que chegam prontos (snapshots da rede), procurar_vencedor()
+faz a verificação completa: com as máscaras de vitória pré-calculadas (toda
+sequência de K células seguidas, `bits & máscara == máscara`) nos tamanhos
+pequenos e célula a célula nos grandes, onde a tabela de máscaras ocuparia
+dezenas de megabytes.
+
+TabuleiroBits também se comporta como a lista de listas de logica.py para
+leitura (`len`, `tabuleiro[i][j]`, iteração por linhas), então o desenho e o
+protocolo funcionam sem mudanças; as funções de logica.py aceitam os dois.
+"""
+VAZIO = ' '
+LIMITE_MASCARAS = 32  # acima deste N a verificação completa não usa máscaras
+DIRECOES = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+try:
+    contar_bits = int.bit_count  # Python 3.10+
+except AttributeError:
+    def contar_bits(valor):
+        return bin(valor).count('1')
+
+
+class Geometria:
+    """Dimensões de um tabuleiro N×N com K em linha e suas máscaras de vitória."""
+
+    __slots__ = ('n', 'k', '_mascaras')
+
+    def __init__(self, n, k):
+        if not 1 <= k <= n:
+            raise ValueError(f"sequência de vitória {k} impossível num tabuleiro {n}x{n}")
+        self.n = n
+        self.k = k
+        self._mascaras = None
+
+    @property
+    def mascaras(self):
+        """Toda sequência de K células em linha, calculada no primeiro uso."""
+        if self._mascaras is None:
+            n, k = self.n, self.k
+            mascaras = []
+            for dl, dc in DIRECOES:
+                for linha in range(n):
+                    for coluna in range(n):
+                        fim_l, fim_c = linha + dl * (k - 1), coluna + dc * (k - 1)
+                        if 0 <= fim_l < n and 0 <= fim_c < n:
+                            mascara = 0
+                            for passo in range(k):
+                                mascara |= 1 << ((linha + dl * passo) * n + coluna + dc * passo)
+                            mascaras.append(mascara)
+            self._mascaras = tuple(mascaras)
+        return self._mascaras
+
+
+_geometrias = {}
+
+
+def obter_geometria(n, k):
+    """Geometria de (N, K), criada na primeira vez e reaproveitada depois."""
+    geo = _geometrias.get((n, k))
+    if geo is None:
+        geo = _geometrias[(n, k)] = Geometria(n, k)
+    return geo
+
+
+class TabuleiroBits:
+    """Tabuleiro N×N com K em linha guardado como dois inteiros (X e O)."""
+
+    __slots__ = ('geo', 'x', 'o', 'vazias', 'ganhador', 'decisiva')
+
+    def __init__(self, n=3, k=3):
+        self.geo = obter_geometria(n, k)
+        self.x = 0
+        self.o = 0
+        self.vazias = n * n
+        self.ganhador = None
+        self.decisiva = None  # célula da jogada que deu a vitória, para desfazer() a desfazer
+
+    @classmethod
+    def de_lista(cls, tabuleiro, k=3, n=None):
+        """Converte um tabuleiro em lista de listas (ex.: vindo da rede).
+
+        Levanta ValueError se a lista não é quadrada, se K passa de N ou, com `n`,
+        se ela não tem N linhas (um snapshot de outra variante).
+        """
+        if n is not None and len(tabuleiro) != n:
+            raise ValueError(f"tabuleiro {len(tabuleiro)}x{len(tabuleiro)} numa partida {n}x{n}")
+        n = len(tabuleiro)
+        if not 1 <= k <= n:
+            raise ValueError(f"sequência {k} não cabe num tabuleiro {n}x{n}")
+        if any(len(linha) != n for linha in tabuleiro):
+            raise ValueError("tabuleiro não é quadrado")
+        novo = cls(n, k)
+        for i, linha in enumerate(tabuleiro):
+            for j, simbolo in enumerate(linha):
+                if simbolo == 'X':
+                    novo.x |= 1 << (i * n + j)
+                elif simbolo == 'O':
+                    novo.o |= 1 << (i * n + j)
+        novo.vazias = n * n - contar_bits(novo.x | novo.o)
+        novo.ganhador = novo.procurar_vencedor()
+        return novo
+
+    def copia(self):
+        """Um tabuleiro novo com as mesmas casas (o original pode seguir imutável)."""
+        novo = TabuleiroBits.__new__(TabuleiroBits)
+        novo.geo, novo.x, novo.o, novo.vazias = self.geo, self.x, self.o, self.vazias
+        novo.ganhador, novo.decisiva = self.ganhador, self.decisiva
+        return novo
+
+    @property
+    def n(self):
+        return self.geo.n
+
+    @property
+    def k(self):
+        return self.geo.k
+
+    def simbolo(self, indice):
+        bit = 1 << indice
+        if self.x & bit:
+            return 'X'
+        if self.o & bit:
+            return 'O'
+        return VAZIO
+
+    def jogar(self, indice, jogador):
+        """Marca a célula `indice` (linha * N + coluna) se estiver livre e ninguém tiver vencido."""
+        if self.ganhador is not None or not 0 <= indice < self.geo.n * self.geo.n:
+            return False
+        bit = 1 << indice
+        if (self.x | self.o) & bit:
+            return False
+        if jogador == 'X':
+            self.x |= bit
+            bits = self.x
+        elif jogador == 'O':
+            self.o |= bit
+            bits = self.o
+        else:
+            return False
+        self.vazias -= 1
+        if self._fecha_sequencia(bits, indice):
+            self.ganhador = jogador
+            self.decisiva = indice
+        return True
+
+    def desfazer(self, indice):
+        """Desfaz a jogada em `indice` (a última feita, numa busca).
+
+        Como não se joga depois de uma vitória, o tabuleiro só volta a não ter
+        ganhador quando a jogada desfeita é a que venceu.
+        """
+        bit = 1 << indice
+        if (self.x | self.o) & bit:
+            self.x &= ~bit
+            self.o &= ~bit
+            self.vazias += 1
+            if indice == self.decisiva:
+                self.ganhador = self.decisiva = None
+
+    def _fecha_sequencia(self, bits, indice):
+        """Há K em linha passando pela célula `indice`? Olha só as 4 linhas dela, O(K)."""
+        n, k = self.geo.n, self.geo.k
+        linha, coluna = divmod(indice, n)
+        for dl, dc in DIRECOES:
+            total = 1
+            for sentido in (1, -1):
+                l, c = linha + dl * sentido, coluna + dc * sentido
+                while total < k and 0 <= l < n and 0 <= c < n and bits >> (l * n + c) & 1:
+                    total += 1
+                    l += dl * sentido
+                    c += dc * sentido
+            if total >= k:
+                return True
+        return False
+
+    def vencedor(self):
+        """'X' ou 'O' se alguém completou K em linha, senão None."""
+        return self.ganhador
+
+    def procurar_vencedor(self):
+        """Verificação completa do tabuleiro, sem usar o vencedor guardado."""
+        x, o = self.x, self.o
+        if self.geo.n <= LIMITE_MASCARAS:
+            for mascara in self.geo.mascaras:
+                if x & mascara == mascara:
+                    return 'X'
+                if o & mascara == mascara:
+                    return 'O'
+            return None
+        for simbolo, bits in (('X', x), ('O', o)):
+            restantes = bits
+            while restantes:
+                menor = restantes & -restantes
+                if self._fecha_sequencia(bits, menor.bit_length() - 1):
+                    return simbolo
+                restantes ^= menor
+        return None
+
+    def ocupadas(self):
+        return self.geo.n * self.geo.n - self.vazias
+
+    def cheio(self):
+        return self.vazias == 0
+
+    def empate(self):
+        return self.vazias == 0 and self.ganhador is None
+
+    def terminou(self):
+        return self.ganhador is not None or self.vazias == 0
+
+    def para_lista(self):
+        return [list(linha) for linha in self]
+
+    # --- Leitura no formato lista de listas ---
+    def __len__(self):
+        return self.geo.n
+
+    def __getitem__(self, linha):
+        n = self.geo.n
+        if not 0 <= linha < n:
+            raise IndexError(linha)
+        mascara_linha = (1 << n) - 1
+        x = self.x >> (linha * n) & mascara_linha
+        o = self.o >> (linha * n) & mascara_linha
+        return tuple('X' if x >> coluna & 1 else 'O' if o >> coluna & 1 else VAZIO
+                     for coluna in range(n))
+
+    def __iter__(self):
+        for linha in range(self.geo.n):
+            yield self[linha]
@@ -0,0 +1,325 @@
+"""Diário de partidas: registro binário, só de acréscimos, de todas as jogadas.
+
+O diário é um arquivo de registros de tamanho fixo (16 bytes, little-endian),
+depois de um cabeçalho do mesmo tamanho:
+
+    tipo (1 byte) | a (1) | b (2) | partida (4) | c (4) | d (4)
+
+    INICIO  a = K em linha, b = N do tabuleiro, c = hora (epoch, s), d = número da partida na sessão
+    JOGADA  a = jogador (1 X, 2 O), b = índice da célula, c = seq, d = ms desde o INICIO
+    FIM     a = resultado (0 empate, 1 X, 2 O, 3 abandonada), b = jogadas, c = hora, d = duração em ms
+
+O servidor grava muitas partidas ao mesmo tempo, então os registros de uma
+partida ficam intercalados com os das outras. Cada partida recebe um número
+sequencial no INICIO, e um índice ao lado (`<arquivo>.idx`, 8 bytes por
+partida) guarda a posição do INICIO de cada uma: achar a partida p é ler a
+entrada p do índice. O índice pode ser reconstruído a partir do diário.
+
+DiarioPartidas acumula os registros num buffer em memória e só escreve no
+arquivo quando ele enche (ou em descarregar()); a cada `intervalo_fsync`
+segundos, os dados escritos vão para o disco com fsync. Uma queda perde no
+máximo esse intervalo, e um registro cortado pela metade no fim do arquivo é
+descartado ao reabrir. LeitorDiario mapeia o arquivo na memória (mmap) e lê
+só os registros da partida pedida.
+"""
+import mmap
+import os
+import struct
+import time
+
+import protocolo as proto
+from bitboard import TabuleiroBits
+
+MAGICO = b'JVDI'
+VERSAO = 1
+CABECALHO = struct.Struct('<4sBB10x')
+REGISTRO = struct.Struct('<BBHIII')
+TAM_REGISTRO = REGISTRO.size  # 16, o mesmo tamanho do cabeçalho
+ENTRADA_INDICE = struct.Struct('<Q')
+
+INICIO, JOGADA, FIM = 1, 2, 3
+EMPATE, ABANDONADA = 0, 3
+RESULTADOS = {EMPATE: 'empate', 1: 'X', 2: 'O', ABANDONADA: 'abandonada'}
+
+TAM_BUFFER = 64 * 1024  # bytes acumulados antes de cada escrita no arquivo
+INTERVALO_FSYNC = 1.0   # segundos entre fsyncs
+
+
+def caminho_indice(caminho):
+    return caminho + '.idx'
+
+
+def _validar_cabecalho(dados, caminho):
+    magico, versao, tamanho = CABECALHO.unpack_from(dados)
+    if magico != MAGICO or versao != VERSAO or tamanho != TAM_REGISTRO:
+        raise ValueError(f"{caminho} não é um diário de partidas (versão {VERSAO})")
+
+
+def _ms_desde(instante):
+    return min(int((time.monotonic() - instante) * 1000), 0xFFFFFFFF)
+
+
+def _inicios(dados, primeiro, total):
+    """Posições (números de registro) dos INICIOs de `primeiro` até `total`, em ordem."""
+    posicoes = []
+    for numero in range(primeiro, total):
+        if dados[(numero + 1) * TAM_REGISTRO] == INICIO:
+            posicoes.append(numero)
+    return posicoes
+
+
+class DiarioPartidas:
+    """Grava partidas num diário; abre o arquivo para acréscimo, criando-o se preciso."""
+
+    def __init__(self, caminho, intervalo_fsync=INTERVALO_FSYNC, tam_buffer=TAM_BUFFER):
+        self.caminho = caminho
+        self.intervalo_fsync = intervalo_fsync
+        self.tam_buffer = tam_buffer
+        self.buffer = bytearray()
+        self.buffer_indice = bytearray()
+        self.abertas = {}  # partida -> (instante do INICIO, jogadas)
+        self.pendente = False  # há registros ainda sem fsync
+        self.registros, self.partidas = self._recuperar()
+        self.arquivo = open(caminho, 'ab')
+        self.indice = open(caminho_indice(caminho), 'ab')
+        self.proximo_fsync = time.monotonic() + (intervalo_fsync or 0)
+
+    def _recuperar(self):
+        """Cria o diário ou acerta o que uma queda deixou pela metade. Retorna (registros, partidas)."""
+        with open(self.caminho, 'a+b') as arquivo:
+            tamanho = arquivo.seek(0, os.SEEK_END)
+            if tamanho < TAM_REGISTRO:
+                arquivo.truncate(0)
+                arquivo.write(CABECALHO.pack(MAGICO, VERSAO, TAM_REGISTRO))
+                tamanho = TAM_REGISTRO
+            arquivo.seek(0)
+            _validar_cabecalho(arquivo.read(TAM_REGISTRO), self.caminho)
+            registros = tamanho // TAM_REGISTRO - 1
+            if tamanho % TAM_REGISTRO:
+                arquivo.truncate((registros + 1) * TAM_REGISTRO)  # registro cortado no meio
+        with open(caminho_indice(self.caminho), 'a+b') as indice:
+            tamanho = indice.seek(0, os.SEEK_END)
+            indice.seek(0)
+            entradas = [e for (e,) in ENTRADA_INDICE.iter_unpack(
+                indice.read(tamanho - tamanho % ENTRADA_INDICE.size))]
+            # O índice vai junto com o diário, mas pode ter ficado à frente ou atrás dele
+            while entradas and entradas[-1] >= registros:
+                entradas.pop()
+            if len(entradas) * ENTRADA_INDICE.size != tamanho:
+                indice.truncate(len(entradas) * ENTRADA_INDICE.size)
+            primeiro = entradas[-1] + 1 if entradas else 0
+            if primeiro < registros:
+                with open(self.caminho, 'rb') as arquivo, \
+                        mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                    faltando = _inicios(dados, primeiro, registros)
+                indice.seek(0, os.SEEK_END)
+                indice.write(b''.join(ENTRADA_INDICE.pack(n) for n in faltando))
+                entradas.extend(faltando)
+        return registros, len(entradas)
+
+    # --- Registros ---
+    def _registrar(self, tipo, a, b, partida, c, d):
+        self.buffer += REGISTRO.pack(tipo, a, b, partida, c, d)
+        self.registros += 1
+        self.pendente = True
+        if len(self.buffer) >= self.tam_buffer:
+            self._escrever()
+        if self.intervalo_fsync is not None and time.monotonic() >= self.proximo_fsync:
+            self.descarregar(sincronizar=True)
+
+    def iniciar(self, tamanho, sequencia, numero=1):
+        """Abre uma partida NxN com K em linha e retorna o número dela no diário."""
+        partida = self.partidas
+        self.partidas += 1
+        self.buffer_indice += ENTRADA_INDICE.pack(self.registros)
+        self.abertas[partida] = (time.monotonic(), 0)
+        self._registrar(INICIO, sequencia, tamanho, partida, int(time.time()), numero)
+        return partida
+
+    def jogada(self, partida, indice, jogador, seq):
+        inicio, jogadas = self.abertas[partida]
+        self.abertas[partida] = (inicio, jogadas + 1)
+        self._registrar(JOGADA, proto.CODIGO_SIMBOLO[jogador], indice, partida, seq, _ms_desde(inicio))
+
+    def terminar(self, partida, vencedor=None, abandonada=False):
+        """Fecha a partida: vitória de `vencedor`, empate (None) ou abandono."""
+        inicio, jogadas = self.abertas.pop(partida)
+        resultado = ABANDONADA if abandonada else proto.CODIGO_SIMBOLO[vencedor or ' ']
+        self._registrar(FIM, resultado, min(jogadas, 0xFFFF), partida, int(time.time()), _ms_desde(inicio))
+
+    # --- Escrita em disco ---
+    def _escrever(self):
+        # O índice vai depois do diário: uma entrada nunca aponta para um INICIO não escrito
+        if self.buffer:
+            self.arquivo.write(self.buffer)
+            self.arquivo.flush()
+            self.buffer.clear()
+        if self.buffer_indice:
+            self.indice.write(self.buffer_indice)
+            self.indice.flush()
+            self.buffer_indice.clear()
+
+    def descarregar(self, sincronizar=False):
+        """Escreve o buffer no arquivo; com `sincronizar`, também faz o fsync."""
+        self._escrever()
+        if sincronizar:
+            os.fsync(self.arquivo.fileno())
+            os.fsync(self.indice.fileno())
+            self.pendente = False
+            self.proximo_fsync = time.monotonic() + (self.intervalo_fsync or 0)
+
+    def manter(self):
+        """Fsync periódico para quem fica parado: chame de tempos em tempos."""
+        if self.pendente and time.monotonic() >= self.proximo_fsync:
+            self.descarregar(sincronizar=True)
+
+    def fechar(self):
+        if self.arquivo.closed:
+            return
+        self.descarregar(sincronizar=True)
+        self.arquivo.close()
+        self.indice.close()
+
+
+class PartidaGravada:
+    """Uma partida lida do diário."""
+
+    __slots__ = ('numero', 'tamanho', 'sequencia', 'inicio', 'numero_sessao', 'jogadas',
+                 'resultado', 'duracao')
+
+    def __init__(self, numero, tamanho, sequencia, inicio, numero_sessao):
+        self.numero = numero          # posição no diário (0, 1, 2...)
+        self.tamanho = tamanho
+        self.sequencia = sequencia
+        self.inicio = inicio          # hora do início (epoch, s)
+        self.numero_sessao = numero_sessao
+        self.jogadas = []             # (índice, jogador, seq, ms desde o início)
+        self.resultado = None         # 'X', 'O', 'empate', 'abandonada'; None se não terminou
+        self.duracao = None           # ms
+
+    def tabuleiro(self, ate=None):
+        """O tabuleiro depois das `ate` primeiras jogadas (todas, se None)."""
+        tabuleiro = TabuleiroBits(self.tamanho, self.sequencia)
+        for indice, jogador, _, _ in self.jogadas[:ate]:
+            tabuleiro.jogar(indice, jogador)
+        return tabuleiro
+
+
+class LeitorDiario:
+    """Lê um diário mapeado na memória, partida por partida, sem carregá-lo inteiro."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.dados = self.indice = None
+        self.atualizar()
+
+    def atualizar(self):
+        """Remapeia os arquivos, para enxergar o que foi gravado desde a abertura."""
+        self.fechar()
+        with open(self.caminho, 'rb') as arquivo:
+            self.dados = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        _validar_cabecalho(self.dados, self.caminho)
+        self.registros = len(self.dados) // TAM_REGISTRO - 1
+        try:
+            with open(caminho_indice(self.caminho), 'rb') as arquivo:
+                self.indice = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            entradas = len(self.indice) // ENTRADA_INDICE.size
+        except (OSError, ValueError):  # sem índice (ou vazio: o mmap não aceita tamanho 0)
+            self.indice, entradas = None, 0
+        self._inicios = None
+        if self.indice is not None:
+            # Só valem as entradas que apontam para um INICIO já gravado no diário
+            while entradas and ENTRADA_INDICE.unpack_from(
+                    self.indice, (entradas - 1) * ENTRADA_INDICE.size)[0] >= self.registros:
+                entradas -= 1
+        if self.indice is None or (entradas == 0 and self.registros):
+            self._inicios = _inicios(self.dados, 0, self.registros)  # reconstrói em memória
+            entradas = len(self._inicios)
+        self.partidas = entradas
+
+    def __len__(self):
+        return self.partidas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def posicao(self, partida):
+        """Número do registro INICIO da partida."""
+        if not 0 <= partida < self.partidas:
+            raise IndexError(f"partida {partida} fora do diário ({self.partidas} partidas)")
+        if self._inicios is not None:
+            return self._inicios[partida]
+        return ENTRADA_INDICE.unpack_from(self.indice, partida * ENTRADA_INDICE.size)[0]
+
+    def registros_da_partida(self, partida):
+        """Os registros (tipo, a, b, partida, c, d) da partida, do INICIO ao FIM."""
+        dados = self.dados
+        fim = (self.registros + 1) * TAM_REGISTRO
+        chave = struct.pack('<I', partida)
+        # A busca pelos 4 bytes do número da partida roda em C (mmap.find); só os
+        # acertos alinhados ao campo `partida` de um registro são lidos de verdade
+        pos = (self.posicao(partida) + 1) * TAM_REGISTRO + 4
+        while True:
+            pos = dados.find(chave, pos, fim)
+            if pos < 0:
+                return
+            desalinhado = (pos - 4) % TAM_REGISTRO
+            if desalinhado:
+                pos += TAM_REGISTRO - desalinhado
+                continue
+            registro = REGISTRO.unpack_from(dados, pos - 4)
+            yield registro
+            if registro[0] == FIM:
+                return
+            pos += TAM_REGISTRO
+
+    def partida(self, partida):
+        """Lê a partida inteira como uma PartidaGravada."""
+        gravada = None
+        for tipo, a, b, _, c, d in self.registros_da_partida(partida):
+            if tipo == INICIO:
+                gravada = PartidaGravada(partida, b, a, c, d)
+            elif tipo == JOGADA:
+                gravada.jogadas.append((b, proto.SIMBOLO_CODIGO[a], c, d))
+            elif tipo == FIM:
+                gravada.resultado = RESULTADOS.get(a)
+                gravada.duracao = d
+        return gravada
+
+    def __iter__(self):
+        """Todas as partidas, na ordem em que terminaram, numa só passada pelo diário.
+
+        Só as partidas em andamento ficam em memória; as que não terminaram vêm no fim.
+        """
+        andamento = {}
+        corpo = memoryview(self.dados)[TAM_REGISTRO:(self.registros + 1) * TAM_REGISTRO]
+        try:
+            for tipo, a, b, partida, c, d in REGISTRO.iter_unpack(corpo):
+                if tipo == JOGADA:
+                    gravada = andamento.get(partida)
+                    if gravada is not None:
+                        gravada.jogadas.append((b, proto.SIMBOLO_CODIGO[a], c, d))
+                elif tipo == INICIO:
+                    andamento[partida] = PartidaGravada(partida, b, a, c, d)
+                elif tipo == FIM:
+                    gravada = andamento.pop(partida, None)
+                    if gravada is not None:
+                        gravada.resultado = RESULTADOS.get(a)
+                        gravada.duracao = d
+                        yield gravada
+        finally:
+            corpo.release()
+        yield from andamento.values()
+
+    def tabuleiro(self, partida, ate=None):
+        """Posiciona a partida na jogada `ate`: o tabuleiro depois das `ate` primeiras jogadas."""
+        return self.partida(partida).tabuleiro(ate)
+
+    def fechar(self):
+        for mapa in (self.dados, self.indice):
+            if mapa is not None:
+                mapa.close()
+        self.dados = self.indice = None
@@ -0,0 +1,457 @@
+"""Oponente controlado pelo computador: negamax com poda alfa-beta.
+
+Cada posição tem 8 hashes de Zobrist, um por simetria do tabuleiro (4 rotações
+e suas reflexões), atualizados em O(1) a cada jogada; a chave canônica é o
+menor deles, então posições simétricas dividem a mesma entrada da tabela de
+transposição.
+
+No 3x3 a árvore inteira do jogo é resolvida uma única vez, quando o motor é
+criado (são só 765 posições canônicas), e daí em diante escolher uma jogada
+é consultar a tabela. Em tabuleiros maiores a busca usa aprofundamento
+iterativo dentro de um orçamento de tempo, só considera células vizinhas às
+já ocupadas e avalia as folhas pelas sequências abertas de cada jogador.
+
+MotorIA.ultima_busca guarda, para a última jogada escolhida, o tempo gasto,
+os nós visitados, a profundidade alcançada e o valor da posição.
+"""
+import queue
+import random
+import threading
+import time
+
+import protocolo as proto
+from bitboard import TabuleiroBits, DIRECOES
+
+VITORIA = 1_000_000
+ORCAMENTO_PADRAO = 0.5       # segundos por jogada nos tabuleiros maiores que 3x3
+LIMITE_TABELA = 1 << 20      # entradas da tabela de transposição antes de ser esvaziada
+VERIFICAR_TEMPO_A_CADA = 1024
+TAMANHO_RESOLVIDO = 3        # até este N a árvore inteira é resolvida
+
+# Tipo do valor guardado na tabela de transposição
+EXATO, LIMITE_INFERIOR, LIMITE_SUPERIOR = 0, 1, 2
+
+
+class TempoEsgotado(Exception):
+    """Interrompe a iteração de aprofundamento quando o orçamento acaba."""
+
+
+# --- Simetrias e Zobrist ---
+_tabelas = {}
+
+
+def obter_tabelas(n):
+    """Chaves de Zobrist e permutações das 8 simetrias de um tabuleiro NxN."""
+    if n not in _tabelas:
+        m = n - 1
+        transformacoes = (
+            lambda l, c: (l, c), lambda l, c: (c, m - l), lambda l, c: (m - l, m - c),
+            lambda l, c: (m - c, l), lambda l, c: (l, m - c), lambda l, c: (m - l, c),
+            lambda l, c: (c, l), lambda l, c: (m - c, m - l),
+        )
+        simetrias = []
+        for transformar in transformacoes:
+            simetrias.append(tuple(tl * n + tc for tl, tc in
+                                   (transformar(l, c) for l in range(n) for c in range(n))))
+        inversas = []
+        for simetria in simetrias:
+            inversa = [0] * (n * n)
+            for celula, imagem in enumerate(simetria):
+                inversa[imagem] = celula
+            inversas.append(tuple(inversa))
+        aleatorio = random.Random(n)  # determinístico: as chaves não dependem da execução
+        chaves = {simbolo: tuple(aleatorio.getrandbits(64) for _ in range(n * n)) for simbolo in 'XO'}
+        chave_vez = aleatorio.getrandbits(64)
+        _tabelas[n] = (chaves, chave_vez, tuple(simetrias), tuple(inversas))
+    return _tabelas[n]
+
+
+class PosicaoBusca:
+    """Cópia do tabuleiro usada na busca, com os 8 hashes mantidos a cada jogada."""
+
+    __slots__ = ('tabuleiro', 'vez', 'hashes', 'chaves', 'chave_vez', 'simetrias')
+
+    def __init__(self, tabuleiro, vez):
+        n = tabuleiro.n
+        self.tabuleiro = TabuleiroBits(n, tabuleiro.k)
+        self.tabuleiro.x, self.tabuleiro.o = tabuleiro.x, tabuleiro.o
+        self.tabuleiro.vazias, self.tabuleiro.ganhador = tabuleiro.vazias, tabuleiro.vencedor()
+        self.vez = vez
+        self.chaves, self.chave_vez, self.simetrias, _ = obter_tabelas(n)
+        self.hashes = []
+        for simetria in self.simetrias:
+            h = self.chave_vez if vez == 'O' else 0
+            for simbolo, bits in (('X', tabuleiro.x), ('O', tabuleiro.o)):
+                for celula in _bits(bits):
+                    h ^= self.chaves[simbolo][simetria[celula]]
+            self.hashes.append(h)
+
+    def jogar(self, indice):
+        """Joga pela vez atual (como fazer_jogada) e atualiza os hashes em O(1)."""
+        vez = self.vez
+        self.tabuleiro.jogar(indice, vez)
+        chaves = self.chaves[vez]
+        hashes = self.hashes
+        for s, simetria in enumerate(self.simetrias):
+            hashes[s] ^= chaves[simetria[indice]] ^ self.chave_vez
+        self.vez = 'O' if vez == 'X' else 'X'
+
+    def desfazer(self, indice):
+        vez = self.vez = 'O' if self.vez == 'X' else 'X'
+        self.tabuleiro.desfazer(indice)
+        chaves = self.chaves[vez]
+        hashes = self.hashes
+        for s, simetria in enumerate(self.simetrias):
+            hashes[s] ^= chaves[simetria[indice]] ^ self.chave_vez
+
+    def chave(self):
+        """(chave canônica, índice da simetria que a produz)."""
+        menor = min(self.hashes)
+        return menor, self.hashes.index(menor)
+
+
+def _recuar(valor):
+    """Valor visto um lance antes: vitórias mais distantes valem um pouco menos."""
+    if valor > 0:
+        return valor - 1
+    if valor < 0:
+        return valor + 1
+    return valor
+
+
+def _bits(valor):
+    """Índices dos bits ligados, do menor para o maior."""
+    while valor:
+        menor = valor & -valor
+        yield menor.bit_length() - 1
+        valor ^= menor
+
+
+class MotorIA:
+    """Escolhe jogadas para um tabuleiro NxN com K em linha."""
+
+    def __init__(self, n=3, k=3, orcamento=ORCAMENTO_PADRAO):
+        self.n = n
+        self.k = k
+        self.orcamento = orcamento
+        self.tabela = {}
+        self.pesos = [10 ** tamanho for tamanho in range(k)]
+        self.nos = 0
+        self.prazo = None
+        self.ultima_busca = None
+        self.trava = threading.Lock()  # uma busca por vez quando o motor é compartilhado (obter_motor)
+        _, _, _, self.inversas = obter_tabelas(n)
+        if n <= TAMANHO_RESOLVIDO:
+            inicio = time.perf_counter()
+            self._resolver(PosicaoBusca(TabuleiroBits(n, k), 'X'))
+            self.tempo_resolucao = time.perf_counter() - inicio
+
+    # --- Interface ---
+    def escolher_jogada(self, tabuleiro, jogador):
+        """Índice da melhor jogada para `jogador` em `tabuleiro` (TabuleiroBits)."""
+        inicio = time.perf_counter()
+        self.nos = 0
+        pos = PosicaoBusca(tabuleiro, jogador)
+        if self.n <= TAMANHO_RESOLVIDO:
+            valor, jogada = self._melhor_resolvida(pos)
+            profundidade = pos.tabuleiro.vazias
+        else:
+            valor, jogada, profundidade = self._aprofundar(pos, inicio + self.orcamento)
+        self.ultima_busca = {'jogada': jogada, 'valor': valor, 'nos': self.nos,
+                             'tempo': time.perf_counter() - inicio, 'profundidade': profundidade}
+        return jogada
+
+    # --- 3x3: árvore inteira ---
+    def _resolver(self, pos):
+        """Valor exato da posição para quem vai jogar, memorizado pela chave canônica."""
+        self.nos += 1
+        chave, _ = pos.chave()
+        valor = self.tabela.get(chave)
+        if valor is not None:
+            return valor
+        tabuleiro = pos.tabuleiro
+        if tabuleiro.vencedor():
+            valor = -VITORIA  # quem jogou por último completou a sequência
+        elif tabuleiro.vazias == 0:
+            valor = 0
+        else:
+            valor = -2 * VITORIA
+            for indice in _bits(~(tabuleiro.x | tabuleiro.o) & ((1 << (self.n * self.n)) - 1)):
+                pos.jogar(indice)
+                valor = max(valor, _recuar(-self._resolver(pos)))
+                pos.desfazer(indice)
+        self.tabela[chave] = valor
+        return valor
+
+    def _melhor_resolvida(self, pos):
+        tabuleiro = pos.tabuleiro
+        melhor, jogada = -2 * VITORIA, None
+        for indice in _bits(~(tabuleiro.x | tabuleiro.o) & ((1 << (self.n * self.n)) - 1)):
+            pos.jogar(indice)
+            valor = _recuar(-self._resolver(pos))
+            pos.desfazer(indice)
+            if valor > melhor:
+                melhor, jogada = valor, indice
+        return melhor, jogada
+
+    # --- Tabuleiros maiores: aprofundamento iterativo ---
+    def _aprofundar(self, pos, prazo):
+        self.prazo = prazo
+        if len(self.tabela) > LIMITE_TABELA:
+            self.tabela.clear()
+        candidatas = self._candidatas(pos)
+        melhor_valor, melhor_jogada, alcancada = 0, candidatas[0], 0
+        for profundidade in range(1, pos.tabuleiro.vazias + 1):
+            try:
+                valor, jogada = self._raiz(pos, profundidade, candidatas)
+            except TempoEsgotado:
+                break
+            melhor_valor, melhor_jogada, alcancada = valor, jogada, profundidade
+            # A melhor da iteração anterior é a primeira a ser examinada na próxima
+            candidatas.remove(jogada)
+            candidatas.insert(0, jogada)
+            if abs(valor) > VITORIA - pos.tabuleiro.vazias - 1:
+                break  # vitória ou derrota forçada: aprofundar não muda a decisão
+        return melhor_valor, melhor_jogada, alcancada
+
+    def _raiz(self, pos, profundidade, candidatas):
+        alfa, beta = -2 * VITORIA, 2 * VITORIA
+        melhor_jogada = candidatas[0]
+        for indice in candidatas:
+            pos.jogar(indice)
+            try:
+                valor = _recuar(-self._negamax(pos, profundidade - 1, -beta - 1, -alfa + 1))
+            finally:
+                pos.desfazer(indice)
+            if valor > alfa:
+                alfa, melhor_jogada = valor, indice
+        return alfa, melhor_jogada
+
+    def _negamax(self, pos, profundidade, alfa, beta):
+        self.nos += 1
+        if self.nos % VERIFICAR_TEMPO_A_CADA == 0 and time.perf_counter() > self.prazo:
+            raise TempoEsgotado()
+        tabuleiro = pos.tabuleiro
+        if tabuleiro.vencedor():
+            return -VITORIA
+        if tabuleiro.vazias == 0:
+            return 0
+        if profundidade == 0:
+            return self._avaliar(pos)
+
+        alfa_original = alfa
+        chave, simetria = pos.chave()
+        entrada = self.tabela.get(chave)
+        primeira = None
+        if entrada is not None:
+            prof_entrada, valor_entrada, tipo, jogada_canonica = entrada
+            primeira = self.inversas[simetria][jogada_canonica]
+            if prof_entrada >= profundidade:
+                if tipo == EXATO:
+                    return valor_entrada
+                if tipo == LIMITE_INFERIOR:
+                    alfa = max(alfa, valor_entrada)
+                else:
+                    beta = min(beta, valor_entrada)
+                if alfa >= beta:
+                    return valor_entrada
+
+        candidatas = self._candidatas(pos)
+        if primeira is not None and primeira in candidatas:
+            candidatas.remove(primeira)
+            candidatas.insert(0, primeira)
+        melhor, melhor_jogada = -2 * VITORIA, candidatas[0]
+        for indice in candidatas:
+            pos.jogar(indice)
+            # Janela alargada em 1: _recuar pode mover o valor do filho um ponto
+            valor = _recuar(-self._negamax(pos, profundidade - 1, -beta - 1, -alfa + 1))
+            pos.desfazer(indice)
+            if valor > melhor:
+                melhor, melhor_jogada = valor, indice
+                if valor > alfa:
+                    alfa = valor
+                    if alfa >= beta:
+                        break
+
+        if melhor <= alfa_original:
+            tipo = LIMITE_SUPERIOR
+        elif melhor >= beta:
+            tipo = LIMITE_INFERIOR
+        else:
+            tipo = EXATO
+        self.tabela[chave] = (profundidade, melhor, tipo, pos.simetrias[simetria][melhor_jogada])
+        return melhor
+
+    def _candidatas(self, pos):
+        """Células livres vizinhas às ocupadas, as mais promissoras primeiro."""
+        tabuleiro = pos.tabuleiro
+        n = self.n
+        ocupadas = tabuleiro.x | tabuleiro.o
+        if not ocupadas:
+            return [(n // 2) * n + n // 2]
+        vizinhas = set()
+        for indice in _bits(ocupadas):
+            linha, coluna = divmod(indice, n)
+            for l in range(max(linha - 1, 0), min(linha + 2, n)):
+                for c in range(max(coluna - 1, 0), min(coluna + 2, n)):
+                    if not ocupadas >> (l * n + c) & 1:
+                        vizinhas.add(l * n + c)
+        return sorted(vizinhas, key=lambda i: -self._potencial(tabuleiro, i))
+
+    def _potencial(self, tabuleiro, indice):
+        """Quantas peças (de qualquer jogador) a célula estende ou bloqueia em linha."""
+        n = self.n
+        linha, coluna = divmod(indice, n)
+        total = 0
+        for bits in (tabuleiro.x, tabuleiro.o):
+            for dl, dc in DIRECOES:
+                for sentido in (1, -1):
+                    l, c = linha + dl * sentido, coluna + dc * sentido
+                    seguidas = 0
+                    while 0 <= l < n and 0 <= c < n and bits >> (l * n + c) & 1:
+                        seguidas += 1
+                        l += dl * sentido
+                        c += dc * sentido
+                    total += seguidas * seguidas
+        return total
+
+    def _avaliar(self, pos):
+        """Heurística para quem vai jogar: sequências abertas suas menos as do adversário."""
+        tabuleiro = pos.tabuleiro
+        if pos.vez == 'X':
+            minhas, dele = tabuleiro.x, tabuleiro.o
+        else:
+            minhas, dele = tabuleiro.o, tabuleiro.x
+        return self._pontuar(minhas, dele) - self._pontuar(dele, minhas)
+
+    def _pontuar(self, bits, adversario):
+        n, k, pesos = self.n, self.k, self.pesos
+        total = 0
+        for indice in _bits(bits):
+            linha, coluna = divmod(indice, n)
+            for dl, dc in DIRECOES:
+                antes_l, antes_c = linha - dl, coluna - dc
+                dentro_antes = 0 <= antes_l < n and 0 <= antes_c < n
+                if dentro_antes and bits >> (antes_l * n + antes_c) & 1:
+                    continue  # só conta cada sequência a partir da primeira peça
+                tamanho, l, c = 1, linha + dl, coluna + dc
+                while 0 <= l < n and 0 <= c < n and bits >> (l * n + c) & 1:
+                    tamanho += 1
+                    l += dl
+                    c += dc
+                abertas = ((dentro_antes and not adversario >> (antes_l * n + antes_c) & 1)
+                           + (0 <= l < n and 0 <= c < n and not adversario >> (l * n + c) & 1))
+                if abertas:
+                    total += pesos[min(tamanho, k - 1)] * abertas
+        return total
+
+
+_motores = {}
+_trava_motores = threading.Lock()  # criação dos motores compartilhados, entre threads
+
+
+def obter_motor(n=3, k=3):
+    """Motor compartilhado para (N, K); no 3x3 a árvore é resolvida só na primeira chamada."""
+    with _trava_motores:
+        if (n, k) not in _motores:
+            _motores[(n, k)] = MotorIA(n, k)
+        return _motores[(n, k)]
+
+
+class OponenteComputador:
+    """Faz o papel da ConexaoJogo numa partida local contra o computador.
+
+    Recebe as jogadas do jogador por enviar() e responde pela fila `eventos`,
+    com as mesmas tuplas (tipo, conteúdo) da rede. Uma única thread, alimentada
+    pela fila `pedidos`, trata as mensagens e faz a busca, para não travar a
+    interface: o tabuleiro, a seq e a partida só mudam nela, uma mensagem por
+    vez, então a jogada escolhida sempre vale para o estado em que foi buscada.
+    """
+
+    def __init__(self, variante=(3, 3), simbolo='O', ao_notificar=None):
+        self.variante = variante
+        self.simbolo = simbolo
+        self.ao_notificar = ao_notificar
+        self.eventos = queue.Queue()
+        self.pedidos = queue.Queue()  # mensagens do jogador; None encerra a thread
+        self.tabuleiro = TabuleiroBits(*variante)
+        self.turno = 'X'
+        self.seq = 0
+        self.partida = 1
+        self.motor = None
+        self.encerrado = False
+
+    def iniciar(self):
+        threading.Thread(target=self._rodar, daemon=True).start()
+
+    def enviar(self, dados):
+        self.pedidos.put(dados)
+
+    def fechar(self, timeout=None):
+        self.encerrado = True
+        self.pedidos.put(None)
+
+    def _emitir(self, tipo, conteudo=None):
+        self.eventos.put((tipo, conteudo))
+        if self.ao_notificar:
+            self.ao_notificar()
+
+    # --- Thread do computador ---
+    def _rodar(self):
+        self.motor = obter_motor(*self.variante)
+        self._emitir('conectado', "Você joga contra o computador.")
+        self._pensar()
+        while True:
+            dados = self.pedidos.get()
+            if dados is None or self.encerrado:
+                return
+            if self._tratar(dados):
+                self._pensar()
+
+    def _tratar(self, dados):
+        """Aplica uma mensagem do jogador; retorna True se o computador pode ter de jogar."""
+        if 'jogada' in dados:
+            # Como no servidor: só vale a jogada do jogador, na vez dele
+            if (dados['seq'] != self.seq + 1 or dados['jogador'] == self.simbolo
+                    or dados['jogador'] != self.turno
+                    or not self.tabuleiro.jogar(dados['jogada'], dados['jogador'])):
+                self._emitir('mensagem', {'msg': 'RESYNC', 'seq': self.seq})
+                return False
+            self.seq = dados['seq']
+            self.turno = self.simbolo
+            return True
+        if dados.get('msg') == 'RESYNC':
+            self._emitir('mensagem', {'tabuleiro': self.tabuleiro.para_lista(),
+                                      'turno': self.turno, 'seq': self.seq})
+        elif 'tabuleiro' in dados:
+            try:
+                self.tabuleiro = TabuleiroBits.de_lista(dados['tabuleiro'], self.variante[1], self.variante[0])
+            except ValueError:
+                return False  # não cabe na variante da partida
+            self.turno, self.seq = dados['turno'], dados['seq']
+            return True
+        elif dados.get('msg') == 'REVANCHE' and dados['partida'] == self.partida + 1:
+            # O computador sempre aceita; a seq continua e quem começa alterna
+            self.partida = dados['partida']
+            self.tabuleiro = TabuleiroBits(*self.variante)
+            self.turno = proto.quem_comeca(self.partida)
+            self._emitir('mensagem', {'msg': 'REVANCHE', 'partida': self.partida})
+            return True
+        return False
+
+    def _pensar(self):
+        tabuleiro = self.tabuleiro
+        if (self.encerrado or self.turno != self.simbolo or tabuleiro.vencedor()
+                or tabuleiro.vazias == 0):
+            return
+        with self.motor.trava:  # o motor é compartilhado (obter_motor) com outras instâncias
+            indice = self.motor.escolher_jogada(tabuleiro, self.simbolo)
+            busca = self.motor.ultima_busca
+        if self.encerrado:
+            return
+        tabuleiro.jogar(indice, self.simbolo)
+        self.seq += 1
+        self.turno = 'O' if self.simbolo == 'X' else 'X'
+        self._emitir('mensagem', {'jogada': indice, 'jogador': self.simbolo, 'seq': self.seq})
+        self._emitir('status', f"Computador: {busca['tempo'] * 1000:.1f} ms, {busca['nos']} nós,"
+                               f" profundidade {busca['profundidade']}")
@@ -1,17 +1,38 @@
 import pygame
+import os
 import sys
-import socket
 import json
+import socket
 import ipaddress
 import threading
 import time
-# --- Inicialização Pygame ---
-try:
-    pygame.init()
-    pygame.font.init()
-except Exception as e:
-    print(f"Erro ao inicializar Pygame: {e}")
-    sys.exit()
+import queue
+from collections import OrderedDict, namedtuple
+
+import protocolo as proto
+from logica import fazer_jogada, verificar_vencedor, verificar_empate
+from bitboard import TabuleiroBits
+import rede
+import udp_confiavel
+import ia
+import metricas
+import diario
+import saguao
+
+# numpy é opcional (acelera a renderização do gradiente) e só é importado no
+# primeiro gradiente, para não pesar na importação do módulo.
+_numpy = None
+
+def obter_numpy():
+    """Importa numpy na primeira chamada; retorna None se não estiver instalado."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
 
 # --- PALETA DE CORES ---
 FUNDO_ESCURO = (28, 28, 28)
@@ -24,41 +45,298 @@ VERMELHO_DESTAQUE = (255, 80, 80)
 
 # --- Configurações da Tela ---
 LARGURA, ALTURA = 600, 700
-TAM_CELULA = 200
-TELA = pygame.display.set_mode((LARGURA, ALTURA))
-pygame.display.set_caption("Jogo da Velha em Rede")
+TAM_CELULA = 200  # no tabuleiro 3x3; em geral LARGURA // N
+
+# Janela, fontes e relógio só existem depois de inicializar_interface(); até lá o
+# módulo pode ser importado sem display (servidor, benchmarks, scripts).
+TELA = None
+FONTE_TITULO = FONTE_PADRAO = FONTE_MENOR = FONTE_JOGADOR_GRANDE = FONTE_METRICAS = None
+CLOCK = None
 
 # --- Fontes ---
-FONTE_TITULO = pygame.font.SysFont('Arial', 40, bold=True)
-FONTE_PADRAO = pygame.font.SysFont('Arial', 32)
-FONTE_MENOR = pygame.font.SysFont('Arial', 24)
-FONTE_JOGADOR_GRANDE = pygame.font.SysFont('Arial', 150, bold=True)
+# pygame.font.SysFont varre as fontes do sistema (fc-list no Linux) na primeira
+# chamada. O caminho resolvido de cada fonte fica gravado em disco e as
+# execuções seguintes abrem o arquivo direto com pygame.font.Font.
+NOME_FONTE = 'Arial'
+ARQUIVO_CACHE_FONTES = os.environ.get('JOGO_CACHE_FONTES', os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'jogo_da_velha', 'fontes.json'))
+caminhos_fonte = None  # (nome, negrito) -> [caminho ou None, negrito_sintetico]
+
+def _ler_cache_fontes():
+    try:
+        with open(ARQUIVO_CACHE_FONTES, encoding='utf-8') as arquivo:
+            return {tuple(json.loads(chave)): valor for chave, valor in json.load(arquivo).items()}
+    except (OSError, ValueError, TypeError):
+        return {}
+
+def _gravar_cache_fontes():
+    try:
+        os.makedirs(os.path.dirname(ARQUIVO_CACHE_FONTES), exist_ok=True)
+        with open(ARQUIVO_CACHE_FONTES, 'w', encoding='utf-8') as arquivo:
+            json.dump({json.dumps(list(chave)): valor for chave, valor in caminhos_fonte.items()}, arquivo)
+    except OSError:
+        pass  # sem cache em disco, a próxima execução só resolve de novo
+
+def resolver_fonte(nome, negrito=False):
+    """Retorna (caminho, negrito_sintetico) da fonte, consultando o sistema só se preciso."""
+    global caminhos_fonte
+    if caminhos_fonte is None:
+        caminhos_fonte = _ler_cache_fontes()
+    chave = (nome, negrito)
+    if chave in caminhos_fonte:
+        caminho, sintetico = caminhos_fonte[chave]
+        if caminho is None or os.path.isfile(caminho):
+            return caminho, sintetico
+    # Mesmo critério do SysFont: sem arquivo em negrito, engrossa a regular;
+    # sem nenhum arquivo (None), usa a fonte padrão do pygame.
+    caminho, sintetico = pygame.font.match_font(nome, bold=negrito), False
+    if caminho is None and negrito:
+        caminho, sintetico = pygame.font.match_font(nome), True
+    caminhos_fonte[chave] = [caminho, sintetico]
+    _gravar_cache_fontes()
+    return caminho, sintetico
 
-CLOCK = pygame.time.Clock()
+def carregar_fonte(tamanho, negrito=False, nome=NOME_FONTE):
+    """Equivalente a pygame.font.SysFont(nome, tamanho, negrito), sem varrer o sistema."""
+    caminho, sintetico = resolver_fonte(nome, negrito)
+    fonte = pygame.font.Font(caminho, tamanho)
+    if sintetico:
+        fonte.set_bold(True)
+    return fonte
+
+# --- Eventos ---
+# A interface bloqueia em pygame.event.wait e só acorda com entrada do usuário
+# ou quando a thread de rede posta EVENTO_REDE após enfileirar um evento.
+EVENTO_REDE = pygame.USEREVENT + 1
+ESPERA_EVENTOS_MS = 1000  # acorda periodicamente mesmo sem eventos, por segurança
+
+# --- Inicialização Pygame ---
+def inicializar_interface():
+    """Abre a janela e carrega fontes e relógio; só a primeira chamada tem efeito."""
+    global TELA, FONTE_TITULO, FONTE_PADRAO, FONTE_MENOR, FONTE_JOGADOR_GRANDE, FONTE_METRICAS, CLOCK
+    if TELA is not None:
+        return TELA
+    try:
+        pygame.display.init()
+        pygame.font.init()
+    except Exception as e:
+        print(f"Erro ao inicializar Pygame: {e}")
+        sys.exit()
+    TELA = pygame.display.set_mode((LARGURA, ALTURA))
+    pygame.display.set_caption("Jogo da Velha em Rede")
+
+    FONTE_TITULO = carregar_fonte(40, negrito=True)
+    FONTE_PADRAO = carregar_fonte(32)
+    FONTE_MENOR = carregar_fonte(24)
+    FONTE_JOGADOR_GRANDE = carregar_fonte(150, negrito=True)
+    FONTE_METRICAS = carregar_fonte(16)
+    fontes_simbolo[TAM_CELULA] = FONTE_JOGADOR_GRANDE
+
+    CLOCK = pygame.time.Clock()
+    pygame.event.set_blocked(pygame.MOUSEMOTION)  # nenhuma tela usa movimento do mouse
+    return TELA
+
+# --- Estado do jogo ---
+# O estado da partida é um EstadoJogo imutável (uma tupla nomeada). Quem o muda
+# (os eventos de rede e os cliques) monta um estado novo e o publica com
+# alterar(), sob o lock_rede, trocando a referência global de uma vez. Quem só
+# lê, como o desenho de cada quadro, pega estado_jogo uma vez, sem lock, e
+# nunca vê um estado pela metade. O tabuleiro de um estado publicado também não
+# muda mais: jogar é marcar uma cópia e publicá-la.
+LIMITE_MENSAGENS = 32  # mensagens de status guardadas; as mais antigas vão saindo
+
+class EstadoJogo(namedtuple('EstadoJogo', ('tabuleiro', 'turno', 'seq', 'jogador', 'mensagens', 'partida',
+                                           'revanche_pedida', 'revanche_oponente', 'adiadas', 'registro'))):
+    __slots__ = ()
+
+def estado_inicial(tabuleiro=None, jogador='X'):
+    return EstadoJogo(tabuleiro=tabuleiro, turno='X', seq=0, jogador=jogador, mensagens=(), partida=1,
+                      revanche_pedida=False, revanche_oponente=False, adiadas=(), registro=None)
 
 # --- Variáveis ---
-estado_jogo = {'tabuleiro': None, 'vencedor': None, 'empate': False, 'turno': 'X', 'mensagens': []}
-sock_comunicacao = None
-oponente_addr = None
+estado_jogo = estado_inicial()
+conexao_rede = None
 rodando_jogo = False
 conectado = False
-thread_rede = None
+sessao_suspensa = False  # a conexão caiu e a sessão espera a retomada
+
+# Formato preferido das mensagens ('bin' ou 'json', para depuração); a sessão
+# usa JSON se qualquer um dos lados pedir no HELLO.
+formato_rede = os.environ.get('JOGO_FORMATO_REDE', proto.FORMATO_BINARIO)
 
-# Lock para evitar race conditions em variáveis compartilhadas
-lock_rede = threading.Lock()
+# Camada de confiabilidade do UDP (ACKs e retransmissão). JOGO_UDP_CONFIAVEL=0
+# desliga o envio confiável; JOGO_SIMULAR_REDE="perda=0.1,atraso=0.05" injeta
+# falhas de rede para testes.
+udp_confiavel_ativo = os.environ.get('JOGO_UDP_CONFIAVEL', '1') != '0'
+simulador_rede = udp_confiavel.SimuladorRede.de_texto(os.environ.get('JOGO_SIMULAR_REDE', ''))
+
+def ler_variante(texto):
+    """Lê 'N,K' (tabuleiro NxN, K em linha para vencer); 3x3 se vazio ou inválido."""
+    try:
+        tamanho, sequencia = (int(v) for v in texto.split(','))
+        if 1 <= sequencia <= tamanho <= proto.TAMANHO_TABULEIRO_MAXIMO:
+            return tamanho, sequencia
+    except ValueError:
+        pass
+    if texto:
+        print(f"JOGO_TABULEIRO inválido: {texto!r}; usando 3,3")
+    return 3, 3
+
+# Tamanho do tabuleiro e sequência de vitória de quem hospeda (ex.: JOGO_TABULEIRO=15,5);
+# quem conecta adota os do outro lado.
+variante_jogo = ler_variante(os.environ.get('JOGO_TABULEIRO', ''))
+
+# --- Métricas ---
+# Tempo de quadro, FPS, tráfego por protocolo, erros, ida e volta das jogadas e
+# espera no lock_rede. JOGO_METRICAS=0 desliga a coleta; F3 mostra o overlay.
+metricas_jogo = metricas.Metricas(ativo=os.environ.get('JOGO_METRICAS', '1') != '0')
+taxa_quadros = metricas.Taxa(janela=2.0)
+overlay_metricas = False
+
+# --- Diário de partidas ---
+# Cada partida jogada ou assistida vai para um diário binário (diario.py), em
+# ~/.local/share/jogo_da_velha/partidas.diario; JOGO_DIARIO=outro/arquivo muda
+# o lugar e JOGO_DIARIO=0 desliga. "Replays", no menu, reproduz as partidas.
+DIRETORIO_DADOS = os.path.join(
+    os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share'),
+    'jogo_da_velha')
+ARQUIVO_DIARIO = os.environ.get('JOGO_DIARIO', os.path.join(DIRETORIO_DADOS, 'partidas.diario'))
+diario_jogo = None  # DiarioPartidas aberto na primeira partida; False se desligado
+
+def abrir_diario():
+    """Abre o diário (só na primeira chamada); retorna None se está desligado ou inacessível."""
+    global diario_jogo
+    if diario_jogo is None:
+        diario_jogo = False
+        if ARQUIVO_DIARIO not in ('', '0'):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(ARQUIVO_DIARIO)), exist_ok=True)
+                diario_jogo = diario.DiarioPartidas(ARQUIVO_DIARIO)
+            except (OSError, ValueError) as e:
+                print(f"Diário de partidas desligado: {e}")
+    return diario_jogo or None
+
+# --- Partida rápida ---
+# "Partida rápida" entra no saguão do servidor dedicado em JOGO_SERVIDOR
+# (host:porta), que pareia por variante e nível (saguao.py). O nível (Elo) que
+# o servidor devolve ao fim de cada partida fica em ~/.local/share/jogo_da_velha/nivel.
+ENDERECO_SERVIDOR = os.environ.get('JOGO_SERVIDOR', '127.0.0.1:5555')
+ARQUIVO_NIVEL = os.path.join(DIRETORIO_DADOS, 'nivel')
+nivel_jogador = None  # lido do arquivo na primeira partida rápida
+
+def ler_nivel():
+    try:
+        with open(ARQUIVO_NIVEL) as arquivo:
+            return min(max(int(arquivo.read()), 0), saguao.NIVEL_MAXIMO)
+    except (OSError, ValueError):
+        return saguao.NIVEL_INICIAL
+
+def gravar_nivel():
+    if nivel_jogador is None:
+        return
+    try:
+        os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+        with open(ARQUIVO_NIVEL, 'w') as arquivo:
+            arquivo.write(str(nivel_jogador))
+    except OSError as e:
+        print(f"Não foi possível gravar o nível: {e}")
+
+def endereco_servidor():
+    """(host, porta) de JOGO_SERVIDOR; o host pode ser IPv6 (o que vem depois do último ':' é a porta)."""
+    host, _, porta = ENDERECO_SERVIDOR.rpartition(':')
+    if not host or not porta.isdigit():
+        print(f"JOGO_SERVIDOR inválido: {ENDERECO_SERVIDOR!r}; usando 127.0.0.1:5555")
+        return '127.0.0.1', 5555
+    return host.strip('[]'), int(porta)
+
+# Só quem altera o estado_jogo usa o lock, para duas alterações não se atropelarem; a leitura não espera
+lock_rede = metricas.LockMedido(threading.Lock(), metricas_jogo, 'espera_lock_rede_segundos')
+
+def alterar(mensagem=None, **campos):
+    """Publica um estado novo com os campos trocados (com lock_rede); `mensagem` vai para o fim das mensagens."""
+    global estado_jogo
+    if mensagem is not None:
+        campos['mensagens'] = (estado_jogo.mensagens + (mensagem,))[-LIMITE_MENSAGENS:]
+    estado_jogo = estado_jogo._replace(**campos)
+
+def notificar_interface():
+    """Acorda o loop da interface (pode ser chamado de qualquer thread)."""
+    try:
+        pygame.event.post(pygame.event.Event(EVENTO_REDE))
+    except pygame.error:
+        pass  # fila cheia ou vídeo já finalizado
+
+def aguardar_eventos(timeout_ms=ESPERA_EVENTOS_MS):
+    """Bloqueia até chegar um evento (ou estourar o timeout) e retorna os pendentes."""
+    primeiro = pygame.event.wait(timeout_ms)
+    if primeiro.type == pygame.NOEVENT:
+        return []
+    return [primeiro] + pygame.event.get()
 
 # --- Funções de Desenho da Interface ---
+# Fundos em gradiente já renderizados, por (tamanho, cor_inicio, cor_fim)
+cache_gradiente = {}
+
+def renderizar_gradiente(tamanho, cor_inicio, cor_fim):
+    """Renderiza um gradiente vertical em uma nova Surface do tamanho indicado."""
+    largura, altura = tamanho
+    numpy = obter_numpy()
+    if numpy is not None:
+        t = numpy.arange(altura, dtype=numpy.float64) / altura
+        inicio = numpy.array(cor_inicio, dtype=numpy.float64)
+        fim = numpy.array(cor_fim, dtype=numpy.float64)
+        linhas = (inicio + (fim - inicio) * t[:, None]).astype(numpy.uint8)
+        pixels = numpy.broadcast_to(linhas, (largura, altura, 3))
+        fundo = pygame.surfarray.make_surface(numpy.ascontiguousarray(pixels))
+    else:
+        fundo = pygame.Surface(tamanho)
+        for y in range(altura):
+            r = cor_inicio[0] + (cor_fim[0] - cor_inicio[0]) * y / altura
+            g = cor_inicio[1] + (cor_fim[1] - cor_inicio[1]) * y / altura
+            b = cor_inicio[2] + (cor_fim[2] - cor_inicio[2]) * y / altura
+            pygame.draw.line(fundo, (r, g, b), (0, y), (largura, y))
+    if pygame.display.get_surface() is not None:
+        fundo = fundo.convert()
+    return fundo
+
+def obter_gradiente(tamanho, cor_inicio, cor_fim):
+    """Retorna a Surface do gradiente, renderizando-a só na primeira vez."""
+    chave = (tuple(tamanho), tuple(cor_inicio), tuple(cor_fim))
+    fundo = cache_gradiente.get(chave)
+    if fundo is None:
+        fundo = renderizar_gradiente(chave[0], cor_inicio, cor_fim)
+        cache_gradiente[chave] = fundo
+    return fundo
+
 def desenhar_gradiente(surface, cor_inicio, cor_fim):
     """Desenha um gradiente vertical no fundo."""
-    for y in range(ALTURA):
-        r = cor_inicio[0] + (cor_fim[0] - cor_inicio[0]) * y / ALTURA
-        g = cor_inicio[1] + (cor_fim[1] - cor_inicio[1]) * y / ALTURA
-        b = cor_inicio[2] + (cor_fim[2] - cor_inicio[2]) * y / ALTURA
-        pygame.draw.line(surface, (r, g, b), (0, y), (LARGURA, y))
+    surface.blit(obter_gradiente(surface.get_size(), cor_inicio, cor_fim), (0, 0))
+
+# --- Cache de textos renderizados ---
+# Superfícies de texto já rasterizadas, por (fonte, texto, cor, antialias), em ordem LRU
+LIMITE_CACHE_TEXTO = 256
+cache_texto = OrderedDict()
+estatisticas_texto = {'acertos': 0, 'falhas': 0}
+
+def renderizar_texto(fonte, texto, antialias, cor):
+    """Equivalente a fonte.render(), reaproveitando superfícies já renderizadas."""
+    chave = (fonte, texto, tuple(cor), antialias)
+    superficie = cache_texto.get(chave)
+    if superficie is not None:
+        cache_texto.move_to_end(chave)
+        estatisticas_texto['acertos'] += 1
+        return superficie
+    estatisticas_texto['falhas'] += 1
+    superficie = fonte.render(texto, antialias, cor)
+    cache_texto[chave] = superficie
+    if len(cache_texto) > LIMITE_CACHE_TEXTO:
+        cache_texto.popitem(last=False)
+    return superficie
 
 def desenhar_texto_centralizado(surface, texto, fonte, cor, y):
     """Desenha um texto centralizado na tela."""
-    texto_render = fonte.render(texto, True, cor)
+    texto_render = renderizar_texto(fonte, texto, True, cor)
     ret = texto_render.get_rect(center=(LARGURA // 2, y))
     surface.blit(texto_render, ret)
 
@@ -66,7 +344,7 @@ def desenhar_botao(x, y, largura, altura, cor, texto, fonte, texto_cor):
     """Desenha um botão retangular com bordas arredondadas."""
     ret = pygame.Rect(x, y, largura, altura)
     pygame.draw.rect(TELA, cor, ret, border_radius=20)
-    txt_render = fonte.render(texto, True, texto_cor)
+    txt_render = renderizar_texto(fonte, texto, True, texto_cor)
     TELA.blit(txt_render, txt_render.get_rect(center=ret.center))
     return ret
 
@@ -75,71 +353,175 @@ def desenhar_caixa_texto(x, y, largura, altura, texto, ativo, cor_borda):
     ret = pygame.Rect(x, y, largura, altura)
     pygame.draw.rect(TELA, BRANCO_CLARO, ret, border_radius=10)
     pygame.draw.rect(TELA, cor_borda, ret, 3, border_radius=10)
-    txt_render = FONTE_PADRAO.render(texto, True, FUNDO_ESCURO)
+    txt_render = renderizar_texto(FONTE_PADRAO, texto, True, FUNDO_ESCURO)
     TELA.blit(txt_render, (ret.x + 10, ret.y + 10))
     return ret
 
+# Fonte dos símbolos proporcional à célula (150 px em células de 200 px)
+fontes_simbolo = {}
+
+def fonte_simbolo(tam):
+    if tam not in fontes_simbolo:
+        fontes_simbolo[tam] = carregar_fonte(max(tam * 3 // 4, 1), negrito=True)
+    return fontes_simbolo[tam]
+
+def tamanho_celula(tabuleiro):
+    return LARGURA // len(tabuleiro)
+
+def desenhar_celula(surface, tabuleiro, i, j):
+    """Desenha uma célula do tabuleiro e retorna o retângulo ocupado."""
+    tam = tamanho_celula(tabuleiro)
+    rect = pygame.Rect(j * tam, i * tam, tam, tam)
+    pygame.draw.rect(surface, CINZA_FUNDO, rect)
+    pygame.draw.rect(surface, FUNDO_ESCURO, rect, min(3, max(1, tam // 20)))
+    if tabuleiro[i][j] != ' ':
+        simbolo = tabuleiro[i][j]
+        if simbolo == 'X':
+            cor_simbolo = COR_X
+        elif simbolo == 'O':
+            cor_simbolo = COR_O
+        else:
+            cor_simbolo = FUNDO_ESCURO
+
+        texto = renderizar_texto(fonte_simbolo(tam), simbolo, True, cor_simbolo)
+        texto_rect = texto.get_rect(center=rect.center)
+        surface.blit(texto, texto_rect)
+    return rect
+
 def desenhar_tabuleiro(surface, tabuleiro):
     """Desenha o tabuleiro do jogo na tela."""
     if not tabuleiro:
         return
-    pygame.draw.rect(surface, CINZA_FUNDO, (0, 0, LARGURA, LARGURA))
-    for i in range(3):
-        for j in range(3):
-            x = j * TAM_CELULA
-            y = i * TAM_CELULA
-            rect = pygame.Rect(x, y, TAM_CELULA, TAM_CELULA)
-            pygame.draw.rect(surface, FUNDO_ESCURO, rect, 3)
-            if tabuleiro[i][j] != ' ':
-                simbolo = tabuleiro[i][j]
-                if simbolo == 'X':
-                    cor_simbolo = COR_X
-                elif simbolo == 'O':
-                    cor_simbolo = COR_O
-                else:
-                    cor_simbolo = FUNDO_ESCURO 
+    n = len(tabuleiro)
+    for i in range(n):
+        for j in range(n):
+            desenhar_celula(surface, tabuleiro, i, j)
+
+# --- Renderização por regiões sujas (tela do jogo) ---
+# A tela do jogo só é redesenhada onde algo mudou: cada célula do tabuleiro e
+# cada linha de texto da área de status é comparada com o que já está na tela.
+AREA_STATUS = pygame.Rect(0, LARGURA, LARGURA, ALTURA - LARGURA)
+
+def criar_renderizador():
+    """Cria o estado do renderizador: o que está desenhado atualmente na tela."""
+    return {'celulas': None, 'linhas': [], 'completo': True}
 
-                texto = FONTE_JOGADOR_GRANDE.render(simbolo, True, cor_simbolo)
-                texto_rect = texto.get_rect(center=rect.center)
-                surface.blit(texto, texto_rect)
+def invalidar_tela(render):
+    """Força o redesenho completo no próximo quadro (ex.: janela exposta)."""
+    render['completo'] = True
 
-# --- Funções da Lógica do Jogo da Velha (sem mudanças) ---
-def criar_tabuleiro():
-    """Cria um tabuleiro 3x3 vazio."""
-    return [[' ' for _ in range(3)] for _ in range(3)]
+def faixa_linha(linha):
+    """Retorna a faixa horizontal da área de status ocupada por uma linha de texto."""
+    texto, fonte, cor, y = linha
+    altura = fonte.size(texto)[1] + 2
+    return pygame.Rect(0, y - altura // 2, LARGURA, altura).clip(AREA_STATUS)
 
-def fazer_jogada(tabuleiro, linha, coluna, jogador):
-    """Realiza uma jogada se for válida."""
-    if 0 <= linha < 3 and 0 <= coluna < 3 and tabuleiro[linha][coluna] == ' ':
-        tabuleiro[linha][coluna] = jogador
+def atualizar_tela_jogo(render, tabuleiro, linhas, sobreposicao=None):
+    """Redesenha apenas as células e linhas que mudaram. Retorna True se algo foi desenhado.
+
+    `linhas` é uma lista de (texto, fonte, cor, y) desenhados com desenhar_texto_centralizado.
+    `sobreposicao(surface)` desenha algo por cima de tudo (ex.: o overlay de métricas) e
+    força o redesenho completo.
+    """
+    if sobreposicao:
+        render['completo'] = True
+    if render['completo'] or len(render['celulas']) != len(tabuleiro):
+        desenhar_gradiente(TELA, FUNDO_ESCURO, CINZA_FUNDO)
+        desenhar_tabuleiro(TELA, tabuleiro)
+        for linha in linhas:
+            desenhar_texto_centralizado(TELA, *linha)
+        if sobreposicao:
+            sobreposicao(TELA)
+        render['celulas'] = [list(l) for l in tabuleiro]
+        render['linhas'] = list(linhas)
+        render['completo'] = False
+        pygame.display.flip()
         return True
-    return False
-
-def verificar_vencedor(tabuleiro):
-    """Verifica se há um vencedor e retorna o símbolo ('X' ou 'O')."""
-    if not tabuleiro: return None
-    for i in range(3):
-        if tabuleiro[i][0] == tabuleiro[i][1] == tabuleiro[i][2] != ' ':
-            return tabuleiro[i][0]
-        if tabuleiro[0][i] == tabuleiro[1][i] == tabuleiro[2][i] != ' ':
-            return tabuleiro[0][i]
-    if tabuleiro[0][0] == tabuleiro[1][1] == tabuleiro[2][2] != ' ':
-        return tabuleiro[0][0]
-    if tabuleiro[0][2] == tabuleiro[1][1] == tabuleiro[2][0] != ' ':
-        return tabuleiro[0][2]
-    return None
 
-def verificar_empate(tabuleiro):
-    """Verifica se o jogo terminou em empate."""
-    if not tabuleiro: return False
-    for linha in tabuleiro:
-        if ' ' in linha:
-            return False
-    return verificar_vencedor(tabuleiro) is None
+    sujos = []
+    for i, linha in enumerate(tabuleiro):
+        desenhada = render['celulas'][i]
+        for j, simbolo in enumerate(linha):
+            if simbolo != desenhada[j]:
+                sujos.append(desenhar_celula(TELA, tabuleiro, i, j))
+                desenhada[j] = simbolo
+
+    antigas = render['linhas']
+    faixas = []
+    for k in range(max(len(antigas), len(linhas))):
+        antiga = antigas[k] if k < len(antigas) else None
+        nova = linhas[k] if k < len(linhas) else None
+        if antiga != nova:
+            faixas.extend(faixa_linha(l) for l in (antiga, nova) if l)
+
+    if faixas:
+        fundo = obter_gradiente(TELA.get_size(), FUNDO_ESCURO, CINZA_FUNDO)
+        for faixa in faixas:
+            # Restaura o fundo da faixa e redesenha todas as linhas que a tocam
+            TELA.set_clip(faixa)
+            TELA.blit(fundo, faixa, faixa)
+            for linha in linhas:
+                if faixa_linha(linha).colliderect(faixa):
+                    desenhar_texto_centralizado(TELA, *linha)
+        TELA.set_clip(None)
+        render['linhas'] = list(linhas)
+        sujos.extend(faixas)
+
+    if sujos:
+        pygame.display.update(sujos)
+    return bool(sujos)
+
+# --- Overlay de métricas (F3) ---
+def formatar_ms(segundos):
+    return f"{segundos * 1000:.2f} ms"
+
+def linhas_overlay():
+    """Textos do overlay, a partir de um instantâneo das métricas."""
+    instantaneo = metricas_jogo.instantaneo()
+    contadores, histogramas = instantaneo['contadores'], instantaneo['histogramas']
+    linhas = []
+    quadro = histogramas.get('quadro_segundos')
+    linha = f"FPS {taxa_quadros.por_segundo():.1f}"
+    if quadro:
+        linha += f" | quadro p50 {formatar_ms(metricas.quantil(quadro, 0.5))} p99 {formatar_ms(metricas.quantil(quadro, 0.99))}"
+    linhas.append(linha)
+    for protocolo in ('tcp', 'udp'):
+        def valor(nome):
+            return contadores.get((nome, protocolo), 0)
+        if valor('mensagens_enviadas') or valor('mensagens_recebidas'):
+            linhas.append(f"{protocolo.upper()} enviados {valor('mensagens_enviadas')} msg"
+                          f" {valor('bytes_enviados')} B | recebidos {valor('mensagens_recebidas')} msg"
+                          f" {valor('bytes_recebidos')} B")
+    rtt = histogramas.get('rtt_jogada_segundos')
+    if rtt:
+        linhas.append(f"RTT jogada p50 {formatar_ms(metricas.quantil(rtt, 0.5))} p99 {formatar_ms(metricas.quantil(rtt, 0.99))}"
+                      f" ({rtt['total']} jogadas)")
+    erros_envio = sum(v for (nome, _), v in contadores.items() if nome == 'erros_envio')
+    erros_recepcao = sum(v for (nome, _), v in contadores.items() if nome == 'erros_recepcao')
+    linha = f"erros envio {erros_envio} recepção {erros_recepcao}"
+    espera = histogramas.get('espera_lock_rede_segundos')
+    if espera:
+        linha += f" | lock_rede p99 {formatar_ms(metricas.quantil(espera, 0.99))}"
+    linhas.append(linha)
+    return linhas
+
+def desenhar_overlay(surface):
+    """Desenha o painel de métricas no canto superior esquerdo."""
+    # Os números mudam a cada quadro: renderiza direto, sem passar pelo cache de textos
+    textos = [FONTE_METRICAS.render(linha, True, BRANCO_CLARO) for linha in linhas_overlay()]
+    largura = max(t.get_width() for t in textos) + 16
+    altura = sum(t.get_height() for t in textos) + 12
+    painel = pygame.Surface((largura, altura), pygame.SRCALPHA)
+    painel.fill((0, 0, 0, 180))
+    y = 6
+    for texto in textos:
+        painel.blit(texto, (8, y))
+        y += texto.get_height()
+    surface.blit(painel, (4, 4))
 
 # --- Funções da Lógica de Rede CORRIGIDAS ---
 def get_ip_family(host):
-"""Determina a família do endereço IP (IPv4 ou IPv6) e retorna a string."""
+    """Determina a família do endereço IP (IPv4 ou IPv6) e retorna a string."""
     try:
         ip = ipaddress.ip_address(host)
         return 'IPv4' if isinstance(ip, ipaddress.IPv4Address) else 'IPv6'
@@ -159,223 +541,284 @@ def criar_socket_comunicacao(protocolo, host, porta):
         return sock, sa
     
     except socket.gaierror as e:
-        estado_jogo['mensagens'].append(f"Erro de endereço: {e}")
+        with lock_rede:
+            alterar(mensagem=f"Erro de endereço: {e}")
         return None, None
     except Exception as e:
-        estado_jogo['mensagens'].append(f"Erro ao criar o socket: {e}")
+        with lock_rede:
+            alterar(mensagem=f"Erro ao criar o socket: {e}")
         return None, None
 
-def enviar_dados(sock, dados, protocolo, oponente_addr=None):
-    """Serializa e envia os dados."""
-    payload = json.dumps(dados).encode('utf-8')
-    try:
-        if protocolo == 'tcp':
-            sock.sendall(payload)
-        else:
-            if oponente_addr:
-                sock.sendto(payload, oponente_addr)
-        return True
-    except (socket.timeout, ConnectionResetError, BrokenPipeError) as e:
-        print(f"Erro de envio: {e}")
-        return False
-    except Exception as e:
-        print(f"Erro ao enviar dados: {e}")
-        return False
+# --- Sincronização por jogadas ---
+# Cada lado envia só as próprias jogadas, numeradas por 'seq' (a seq da n-ésima
+# jogada da partida é n). O estado completo só trafega quando alguém detecta
+# uma lacuna ou uma jogada inválida e pede ressincronização.
+def mensagem_jogada(indice, jogador, seq):
+    """Monta a mensagem de uma jogada na célula `indice` (linha * N + coluna)."""
+    return {'jogada': indice, 'jogador': jogador, 'seq': seq}
 
-def receber_dados(sock, protocolo, buffer_size=4096):
-    """Recebe e desserializa os dados."""
-    try:
-        if protocolo == 'tcp':
-            sock.settimeout(0.1)
-            payload = sock.recv(buffer_size)
-            if not payload:
-                return None, None
-            return json.loads(payload.decode('utf-8')), None
-        else:
-            sock.settimeout(0.1)
-            payload, addr = sock.recvfrom(buffer_size)
-            if not payload:
-                return None, None
-            return json.loads(payload.decode('utf-8')), addr
-    except socket.timeout:
-        return None, None
-    except (ConnectionResetError, ConnectionAbortedError) as e:
-        print(f"Conexão perdida: {e}")
-        return {'status': 'desconexao'}, None
-    except Exception as e:
-        print(f"Erro ao receber dados: {e}")
-        return None, None
+def mensagem_estado():
+    """Monta o snapshot completo do estado, enviado apenas em ressincronização."""
+    estado = estado_jogo
+    tabuleiro = [list(linha) for linha in estado.tabuleiro]
+    return {'tabuleiro': tabuleiro, 'turno': estado.turno, 'seq': estado.seq}
 
-def thread_servidor_tcp(sock, addr):
-    global sock_comunicacao, oponente_addr, rodando_jogo, estado_jogo, conectado
-    
-    with lock_rede:
-        estado_jogo['mensagens'].append("Aguardando oponente...")
-    
-    try:
-        sock.bind(addr)
-        sock.listen(1)
-        
-        sock.settimeout(1.0)
-        while rodando_jogo and not conectado:
-            try:
-                conn, addr = sock.accept()
-                with lock_rede:
-                    sock_comunicacao = conn
-                    oponente_addr = addr
-                    estado_jogo['mensagens'] = ["Oponente conectado!"]
-                    conectado = True
-                sock_comunicacao.settimeout(0.1)
-            except socket.timeout:
-                continue
-    except Exception as e:
-        with lock_rede:
-            estado_jogo['mensagens'].append(f"Erro no servidor TCP: {e}")
-            rodando_jogo = False
-        return
+def jogada_local(linha, coluna, jogador):
+    """Aplica uma jogada nossa (com lock_rede). Retorna a mensagem a enviar, ou None se ela não vale."""
+    estado = estado_jogo
+    if estado.turno != jogador or estado.tabuleiro.terminou():
+        return None
+    tabuleiro = estado.tabuleiro.copia()
+    if not fazer_jogada(tabuleiro, linha, coluna, jogador):
+        return None
+    seq = estado.seq + 1
+    alterar(tabuleiro=tabuleiro, seq=seq, turno='O' if jogador == 'X' else 'X')
+    indice = linha * len(tabuleiro) + coluna
+    registrar_jogadas([(indice, jogador, seq)])
+    return mensagem_jogada(indice, jogador, seq)
 
-    while rodando_jogo:
-        dados, _ = receber_dados(sock_comunicacao, 'tcp')
-        if dados:
-            if dados.get('status') == 'desconexao':
-                with lock_rede:
-                    estado_jogo['mensagens'].append("Conexão perdida com o oponente.")
-                    rodando_jogo = False
-            else:
-                with lock_rede:
-                    estado_jogo['tabuleiro'] = dados.get('tabuleiro', estado_jogo['tabuleiro'])
-                    estado_jogo['turno'] = 'X' if estado_jogo['turno'] == 'O' else 'O'
-        time.sleep(0.01)
-    
-    if sock_comunicacao:
-        sock_comunicacao.close()
-    if sock:
-        sock.close()
+def aplicar_mensagem_jogo(dados):
+    """Aplica uma jogada, snapshot ou pedido de resync vindo do oponente.
 
-def thread_cliente_tcp(sock, addr):
-    global sock_comunicacao, oponente_addr, rodando_jogo, estado_jogo, conectado
-    
-    host_display = addr[0]
-    with lock_rede:
-        estado_jogo['mensagens'].append(f"Conectando a {host_display}:{addr[1]}...")
-    
-    try:
-        sock.connect(addr)
-        with lock_rede:
-            sock_comunicacao = sock
-            oponente_addr = addr
-            estado_jogo['mensagens'] = ["Conectado ao servidor!"]
-            conectado = True
-        sock_comunicacao.settimeout(0.1)
-    except ConnectionRefusedError:
-        with lock_rede:
-            estado_jogo['mensagens'].append("Conexão recusada pelo servidor.")
-            rodando_jogo = False
+    Deve ser chamada com lock_rede. Jogadas repetidas são ignoradas; lacunas ou
+    jogadas inválidas geram um pedido de resync. Snapshots só chegam em resposta
+    a um resync (ou quando o servidor dedicado rejeita uma jogada nossa) e
+    substituem o estado local. Retorna a mensagem a ser respondida, ou None.
+    """
+    global sessao_suspensa, nivel_jogador
+    estado = estado_jogo
+    if 'jogada' in dados:
+        seq = dados['seq']
+        if seq <= estado.seq:
+            return None
+        if estado.tabuleiro.terminou():
+            # Jogada da próxima partida que chegou antes do aceite da revanche (o UDP reordena)
+            alterar(adiadas=estado.adiadas + (dados,))
+            return None
+        pedido_resync = {'msg': 'RESYNC', 'seq': estado.seq}
+        if seq > estado.seq + 1 or dados['jogador'] != estado.turno:
+            return pedido_resync
+        tabuleiro = estado.tabuleiro.copia()
+        linha, coluna = divmod(dados['jogada'], len(tabuleiro))
+        if not fazer_jogada(tabuleiro, linha, coluna, dados['jogador']):
+            return pedido_resync
+        alterar(tabuleiro=tabuleiro, seq=seq, turno='O' if dados['jogador'] == 'X' else 'X')
+        registrar_jogadas([(dados['jogada'], dados['jogador'], seq)])
+    elif dados.get('msg') == 'RESYNC':
+        return mensagem_estado()
+    elif 'tabuleiro' in dados:
+        try:
+            tabuleiro = TabuleiroBits.de_lista(dados['tabuleiro'], estado.tabuleiro.k, estado.tabuleiro.n)
+        except ValueError:
+            return None  # não cabe na variante desta partida: descartado como mensagem inválida
+        alterar(tabuleiro=tabuleiro, turno=dados['turno'], seq=dados['seq'])
+        registrar_snapshot(estado.tabuleiro, tabuleiro, dados['seq'])
+    elif dados.get('msg') == 'PARTIDA':
+        # Servidor dedicado: fomos pareados com um oponente e recebemos nosso símbolo
+        # e, na partida rápida, a variante em que o saguão nos colocou
+        if 'tamanho' in dados and (dados['tamanho'], dados['sequencia']) != (len(estado.tabuleiro), estado.tabuleiro.k):
+            alterar(tabuleiro=TabuleiroBits(dados['tamanho'], dados['sequencia']))
+        alterar(jogador=dados['jogador'], mensagem=f"Partida iniciada! Você é '{dados['jogador']}'.")
+    elif dados.get('msg') == 'NIVEL':
+        nivel_jogador = dados['nivel']
+        alterar(mensagem=f"Seu nível agora é {nivel_jogador}.")
+    elif dados.get('msg') == 'REVANCHE':
+        # Pode chegar antes da última jogada da partida atual: vale mesmo assim
+        if dados['partida'] == estado.partida + 1:
+            if estado.revanche_pedida:
+                return iniciar_proxima_partida()
+            alterar(revanche_oponente=True)
+    elif dados.get('msg') == 'RETOMADA':
+        return aplicar_retomada(dados['partida'])
+    elif dados.get('msg') in ('OPONENTE_CAIU', 'OPONENTE_VOLTOU'):
+        # Servidor dedicado: a conexão do oponente caiu (ou ele voltou) e a partida espera
+        sessao_suspensa = dados['msg'] == 'OPONENTE_CAIU'
+        alterar(mensagem="O oponente caiu; aguardando a reconexão..." if sessao_suspensa
+                else "O oponente voltou!")
+    return None
+
+# --- Revanche ---
+# A conexão continua aberta entre as partidas. Terminada uma, cada lado pede a
+# seguinte com {'msg': 'REVANCHE', 'partida': n}; quem já pediu e recebe o
+# pedido do outro começa na hora (no servidor dedicado, o servidor responde
+# quando os dois pediram). As seqs seguem de uma partida para a outra e quem
+# faz a primeira jogada alterna (protocolo.quem_comeca).
+def pedir_revanche():
+    """Registra nosso pedido de revanche (com lock_rede). Retorna a mensagem a enviar, ou None."""
+    estado = estado_jogo
+    if estado.revanche_pedida or not estado.tabuleiro.terminou():
+        return None
+    alterar(revanche_pedida=True)
+    pedido = {'msg': 'REVANCHE', 'partida': estado.partida + 1}
+    if estado.revanche_oponente:
+        iniciar_proxima_partida()
+    return pedido
+
+def iniciar_proxima_partida():
+    """Zera o tabuleiro para a próxima partida (com lock_rede) e aplica as jogadas adiadas."""
+    encerrar_registro()  # normalmente já fechada pela última jogada
+    anterior = estado_jogo
+    partida = anterior.partida + 1
+    turno = proto.quem_comeca(partida)
+    alterar(partida=partida, tabuleiro=TabuleiroBits(len(anterior.tabuleiro), anterior.tabuleiro.k), turno=turno,
+            revanche_pedida=False, revanche_oponente=False, adiadas=(),
+            mensagem=f"Partida {partida}: começa '{turno}'.")
+    resposta = None
+    for dados in anterior.adiadas:
+        resposta = aplicar_mensagem_jogo(dados) or resposta
+    return resposta
+
+# --- Retomada ---
+# Se a conexão cai, a sessão fica suspensa (rede.py) e quem conectou volta com o
+# token dela. Quem hospeda é a referência: ao ver o oponente de volta, manda o
+# número da partida e o snapshot, que substituem o que o outro lado tinha (uma
+# jogada que se perdeu na queda volta a ser a vez de quem a fez).
+def mensagens_retomada():
+    """Host: o que mandar a quem voltou (com lock_rede): partida, snapshot e revanche pendente."""
+    estado = estado_jogo
+    mensagens = [{'msg': 'RETOMADA', 'partida': estado.partida}, mensagem_estado()]
+    if estado.revanche_pedida:
+        mensagens.append({'msg': 'REVANCHE', 'partida': estado.partida + 1})
+    return mensagens
+
+def aplicar_retomada(partida):
+    """Adota o número da partida de quem hospeda (o snapshot vem em seguida). Retorna o que reenviar."""
+    if partida != estado_jogo.partida:
+        # A revanche começou do outro lado enquanto estávamos fora
+        encerrar_registro(abandonada=True)  # o fim da partida anterior não chegou até aqui
+        alterar(partida=partida, revanche_pedida=False, revanche_oponente=False, adiadas=())
+    elif estado_jogo.revanche_pedida:
+        return {'msg': 'REVANCHE', 'partida': partida + 1}  # o pedido pode ter se perdido na queda
+    return None
+
+# --- Gravação no diário ---
+# Só entram no diário as jogadas já aplicadas ao estado_jogo. A partida é aberta
+# no diário na primeira jogada (até lá o tamanho do tabuleiro ainda pode mudar)
+# e fechada quando termina ou quando saímos dela.
+def registrar_jogadas(jogadas):
+    """Grava (índice, jogador, seq) da partida atual (com lock_rede); fecha a partida se ela acabou."""
+    if not diario_jogo or not jogadas:
         return
-    except Exception as e:
-        with lock_rede:
-            estado_jogo['mensagens'].append(f"Erro ao conectar: {e}")
-            rodando_jogo = False
+    estado = estado_jogo
+    registro = estado.registro
+    if registro is None:
+        registro = diario_jogo.iniciar(len(estado.tabuleiro), estado.tabuleiro.k, estado.partida)
+        alterar(registro=registro)
+    for indice, jogador, seq in jogadas:
+        diario_jogo.jogada(registro, indice, jogador, seq)
+    if estado.tabuleiro.terminou():
+        encerrar_registro()
+
+def registrar_snapshot(anterior, novo, seq):
+    """Grava como jogadas as casas que um snapshot preencheu (as que ele esvaziou não têm registro)."""
+    if len(anterior) != len(novo):
         return
+    jogadas = []
+    for simbolo, antes, depois in (('X', anterior.x, novo.x), ('O', anterior.o, novo.o)):
+        novas = depois & ~antes
+        while novas:
+            menor = novas & -novas
+            jogadas.append((menor.bit_length() - 1, simbolo, seq))
+            novas ^= menor
+    registrar_jogadas(jogadas)
 
-    while rodando_jogo:
-        dados, _ = receber_dados(sock_comunicacao, 'tcp')
-        if dados:
-if dados.get('status') == 'desconexao':
-                with lock_rede:
-                    estado_jogo['mensagens'].append("Conexão perdida com o oponente.")
-                    rodando_jogo = False
-            else:
-                with lock_rede:
-                    estado_jogo['tabuleiro'] = dados.get('tabuleiro', estado_jogo['tabuleiro'])
-                    estado_jogo['turno'] = 'X' if estado_jogo['turno'] == 'O' else 'O'
-        time.sleep(0.01)
-        
-    if sock_comunicacao:
-        sock_comunicacao.close()
-    if sock:
-        sock.close()
+def encerrar_registro(abandonada=False):
+    """Fecha no diário a partida atual, se ela foi aberta (com lock_rede)."""
+    estado = estado_jogo
+    if estado.registro is None:
+        return
+    diario_jogo.terminar(estado.registro, estado.tabuleiro.vencedor(), abandonada)
+    alterar(registro=None)
+    diario_jogo.descarregar()  # sem fsync: o lock_rede não espera o disco
 
-def thread_servidor_udp(sock, addr):
-    global sock_comunicacao, oponente_addr, rodando_jogo, estado_jogo, conectado
-    
-    with lock_rede:
-        estado_jogo['mensagens'].append("Aguardando oponente...")
-    sock.bind(addr)
-    
-    while rodando_jogo and not conectado:
-        dados, client_addr = receber_dados(sock, 'udp')
-        if dados and dados.get('msg') == 'HELLO':
-            with lock_rede:
-                oponente_addr = client_addr
-                sock_comunicacao = sock
-            enviar_dados(sock_comunicacao, {'msg': 'HELLO'}, 'udp', oponente_addr)
-            with lock_rede:
-                estado_jogo['mensagens'] = ["Oponente conectado!"]
+def processar_eventos_rede(conexao):
+    """Aplica ao estado do jogo os eventos entregues pela thread de rede."""
+    global rodando_jogo, conectado, sessao_suspensa
+    while True:
+        try:
+            tipo, conteudo = conexao.eventos.get_nowait()
+        except queue.Empty:
+            return
+        respostas = []
+        with lock_rede:
+            if tipo == 'status':
+                alterar(mensagem=conteudo)
+            elif tipo == 'conectado':
+                alterar(mensagens=(conteudo,))
                 conectado = True
-            break
-        time.sleep(0.01)
+            elif tipo == 'variante':
+                # Quem hospeda escolhe o tamanho do tabuleiro; só troca antes da 1ª jogada
+                if estado_jogo.seq == 0:
+                    alterar(tabuleiro=TabuleiroBits(*conteudo),
+                            mensagem=f"Tabuleiro {conteudo[0]}x{conteudo[0]}, {conteudo[1]} em linha.")
+            elif tipo == 'suspensa':
+                alterar(mensagem=conteudo)
+                sessao_suspensa = True
+            elif tipo == 'retomada':
+                alterar(mensagem=conteudo)
+                sessao_suspensa = False
+                if conexao.modo == 'h':
+                    respostas = mensagens_retomada()
+            elif tipo in ('desconexao', 'erro'):
+                alterar(mensagem=conteudo)
+                rodando_jogo = False
+            elif tipo == 'mensagem':
+                resposta = aplicar_mensagem_jogo(conteudo)
+                if resposta:
+                    respostas.append(resposta)
+        for resposta in respostas:
+            conexao.enviar(resposta)
 
-    while rodando_jogo:
-        dados, addr_recebido = receber_dados(sock_comunicacao, 'udp')
-        if dados:
-            with lock_rede:
-                oponente_addr = addr_recebido or oponente_addr
-                estado_jogo['tabuleiro'] = dados.get('tabuleiro', estado_jogo['tabuleiro'])
-                estado_jogo['turno'] = 'X' if estado_jogo['turno'] == 'O' else 'O'
-        time.sleep(0.01)
-    
-    if sock:
-        sock.close()
+# --- Loop principal do menu de configuração ---
+def desenhar_menu(estado_menu, config, input_ativo):
+    """Desenha a tela do menu (sem atualizar o display)."""
+    desenhar_gradiente(TELA, FUNDO_ESCURO, CINZA_FUNDO)
+    desenhar_texto_centralizado(TELA, "Jogo da Velha em Rede", FONTE_TITULO, BRANCO_CLARO, 100)
 
-def thread_cliente_udp(sock, addr):
-    global sock_comunicacao, oponente_addr, rodando_jogo, estado_jogo, conectado
-    
-    host_display = addr[0]
-    with lock_rede:
-        estado_jogo['mensagens'].append(f"Conectando a {host_display}:{addr[1]}...")
-        oponente_addr = addr
-        sock_comunicacao = sock
-
-    inicio_tempo = time.time()
-    while rodando_jogo and not conectado and (time.time() - inicio_tempo) < 10:
-        enviar_dados(sock_comunicacao, {'msg': 'HELLO'}, 'udp', oponente_addr)
-        dados, addr_recebido = receber_dados(sock_comunicacao, 'udp')
-        if dados and dados.get('msg') == 'HELLO':
-            with lock_rede:
-                estado_jogo['mensagens'] = ["Conectado ao servidor!"]
-                conectado = True
-            break
-        time.sleep(0.5)
-    
-    if not conectado:
-        with lock_rede:
-            estado_jogo['mensagens'].append("Não foi possível conectar ao servidor UDP.")
-            rodando_jogo = False
-        if sock:
-            sock.close()
-        return
+    if estado_menu == 'PROTOCOLO':
+        desenhar_texto_centralizado(TELA, "Selecione o Protocolo", FONTE_PADRAO, BRANCO_CLARO, 150)
+        desenhar_botao(LARGURA // 2 - 100, 200, 200, 50, VERDE_DESTAQUE, "TCP", FONTE_PADRAO, FUNDO_ESCURO)
+        desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, VERDE_DESTAQUE, "UDP", FONTE_PADRAO, FUNDO_ESCURO)
+        desenhar_botao(LARGURA // 2 - 150, 420, 300, 50, COR_O, "Contra o computador", FONTE_PADRAO, BRANCO_CLARO)
+        desenhar_botao(LARGURA // 2 - 150, 500, 300, 50, COR_X, "Replays", FONTE_PADRAO, BRANCO_CLARO)
 
-    while rodando_jogo:
-        dados, addr_recebido = receber_dados(sock_comunicacao, 'udp')
-        if dados:
-            with lock_rede:
-                oponente_addr = addr_recebido or oponente_addr
-                estado_jogo['tabuleiro'] = dados.get('tabuleiro', estado_jogo['tabuleiro'])
-                estado_jogo['turno'] = 'X' if estado_jogo['turno'] == 'O' else 'O'
-        time.sleep(0.01)
+    elif estado_menu == 'MODO':
+        desenhar_texto_centralizado(TELA, "Selecione o Modo", FONTE_PADRAO, BRANCO_CLARO, 150)
+        desenhar_botao(LARGURA // 2 - 100, 200, 200, 50, COR_O, "Hospedar", FONTE_PADRAO, BRANCO_CLARO)
+        desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, COR_X, "Conectar", FONTE_PADRAO, BRANCO_CLARO)
+        desenhar_botao(LARGURA // 2 - 100, 400, 200, 50, VERDE_DESTAQUE, "Assistir", FONTE_PADRAO, FUNDO_ESCURO)
+        desenhar_botao(LARGURA // 2 - 150, 520, 300, 50, COR_O, "Partida rápida", FONTE_PADRAO, BRANCO_CLARO)
+        desenhar_texto_centralizado(TELA, f"Servidor: {ENDERECO_SERVIDOR}", FONTE_MENOR, BRANCO_CLARO, 590)
 
-    if sock:
-        sock.close()
+    elif estado_menu == 'CONFIG_REDE':
+        desenhar_texto_centralizado(TELA, "Configurações de Rede", FONTE_PADRAO, BRANCO_CLARO, 150)
+
+        desenhar_texto_centralizado(TELA, "Endereço IP:", FONTE_MENOR, BRANCO_CLARO, 230)
+        cor_borda_ip = COR_O if input_ativo == 'host' else BRANCO_CLARO
+        desenhar_caixa_texto(LARGURA // 2 - 150, 250, 300, 50, config['host'], input_ativo == 'host', cor_borda_ip)
+
+        desenhar_texto_centralizado(TELA, "Porta:", FONTE_MENOR, BRANCO_CLARO, 330)
+        cor_borda_porta = COR_O if input_ativo == 'porta' else BRANCO_CLARO
+        desenhar_caixa_texto(LARGURA // 2 - 150, 350, 300, 50, config['porta'], input_ativo == 'porta', cor_borda_porta)
+
+        tipo_ip = get_ip_family(config['host'])
+        cor_ip = VERDE_DESTAQUE if tipo_ip in ['IPv4', 'IPv6'] else VERMELHO_DESTAQUE
+        desenhar_texto_centralizado(TELA, f"Tipo de IP: {tipo_ip}", FONTE_MENOR, cor_ip, 420)
+
+        desenhar_botao(LARGURA // 2 - 100, ALTURA - 100, 200, 50, VERDE_DESTAQUE, "Iniciar Jogo", FONTE_PADRAO, FUNDO_ESCURO)
 
-# --- Loop principal do menu de configuração ---
 def main_menu():
+    inicializar_interface()
     config = {'protocolo': None, 'modo': None, 'host': '127.0.0.1', 'porta': '5555'}
     estado_menu = 'PROTOCOLO'
     input_ativo = None
 
+    notificar_interface()  # garante o primeiro desenho
     while True:
-        for event in pygame.event.get():
+        eventos = aguardar_eventos()
+        if not eventos:
+            continue
+        for event in eventos:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -388,6 +831,10 @@ def main_menu():
                     elif desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, VERDE_DESTAQUE, "UDP", FONTE_PADRAO, FUNDO_ESCURO).collidepoint(event.pos):
                         config['protocolo'] = 'udp'
                         estado_menu = 'MODO'
+                    elif desenhar_botao(LARGURA // 2 - 150, 420, 300, 50, COR_O, "Contra o computador", FONTE_PADRAO, BRANCO_CLARO).collidepoint(event.pos):
+                        return 'ia', None, None, None
+                    elif desenhar_botao(LARGURA // 2 - 150, 500, 300, 50, COR_X, "Replays", FONTE_PADRAO, BRANCO_CLARO).collidepoint(event.pos):
+                        return 'replay', None, None, None
                 
                 elif estado_menu == 'MODO':
                     if desenhar_botao(LARGURA // 2 - 100, 200, 200, 50, COR_O, "Hospedar", FONTE_PADRAO, BRANCO_CLARO).collidepoint(event.pos):
@@ -396,6 +843,11 @@ def main_menu():
                     elif desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, COR_X, "Conectar", FONTE_PADRAO, BRANCO_CLARO).collidepoint(event.pos):
                         config['modo'] = 'c'
                         estado_menu = 'CONFIG_REDE'
+                    elif desenhar_botao(LARGURA // 2 - 100, 400, 200, 50, VERDE_DESTAQUE, "Assistir", FONTE_PADRAO, FUNDO_ESCURO).collidepoint(event.pos):
+                        config['modo'] = 'e'  # espectador: só acompanha a partida de quem hospeda
+                        estado_menu = 'CONFIG_REDE'
+                    elif desenhar_botao(LARGURA // 2 - 150, 520, 300, 50, COR_O, "Partida rápida", FONTE_PADRAO, BRANCO_CLARO).collidepoint(event.pos):
+                        return ('r', config['protocolo']) + endereco_servidor()
                 
                 elif estado_menu == 'CONFIG_REDE':
                     if desenhar_caixa_texto(LARGURA // 2 - 150, 250, 300, 50, config['host'], False, FUNDO_ESCURO).collidepoint(event.pos):
@@ -422,145 +874,237 @@ def main_menu():
                         config['host'] += event.unicode
                     elif input_ativo == 'porta' and len(config['porta']) < 5 and event.unicode.isdigit():
                         config['porta'] += event.unicode
-                        desenhar_gradiente(TELA, FUNDO_ESCURO, CINZA_FUNDO)
-        desenhar_texto_centralizado(TELA, "Jogo da Velha em Rede", FONTE_TITULO, BRANCO_CLARO, 100)
-        
-        if estado_menu == 'PROTOCOLO':
-            desenhar_texto_centralizado(TELA, "Selecione o Protocolo", FONTE_PADRAO, BRANCO_CLARO, 150)
-            desenhar_botao(LARGURA // 2 - 100, 200, 200, 50, VERDE_DESTAQUE, "TCP", FONTE_PADRAO, FUNDO_ESCURO)
-            desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, VERDE_DESTAQUE, "UDP", FONTE_PADRAO, FUNDO_ESCURO)
-        
-        elif estado_menu == 'MODO':
-            desenhar_texto_centralizado(TELA, "Selecione o Modo", FONTE_PADRAO, BRANCO_CLARO, 150)
-            desenhar_botao(LARGURA // 2 - 100, 200, 200, 50, COR_O, "Hospedar", FONTE_PADRAO, BRANCO_CLARO)
-            desenhar_botao(LARGURA // 2 - 100, 300, 200, 50, COR_X, "Conectar", FONTE_PADRAO, BRANCO_CLARO)
-
-        elif estado_menu == 'CONFIG_REDE':
-            desenhar_texto_centralizado(TELA, "Configurações de Rede", FONTE_PADRAO, BRANCO_CLARO, 150)
-            
-            desenhar_texto_centralizado(TELA, "Endereço IP:", FONTE_MENOR, BRANCO_CLARO, 230)
-            cor_borda_ip = COR_O if input_ativo == 'host' else BRANCO_CLARO
-            desenhar_caixa_texto(LARGURA // 2 - 150, 250, 300, 50, config['host'], input_ativo == 'host', cor_borda_ip)
-            
-            desenhar_texto_centralizado(TELA, "Porta:", FONTE_MENOR, BRANCO_CLARO, 330)
-            cor_borda_porta = COR_O if input_ativo == 'porta' else BRANCO_CLARO
-            desenhar_caixa_texto(LARGURA // 2 - 150, 350, 300, 50, config['porta'], input_ativo == 'porta', cor_borda_porta)
-
-            tipo_ip = get_ip_family(config['host'])
-            cor_ip = VERDE_DESTAQUE if tipo_ip in ['IPv4', 'IPv6'] else VERMELHO_DESTAQUE
-            desenhar_texto_centralizado(TELA, f"Tipo de IP: {tipo_ip}", FONTE_MENOR, cor_ip, 420)
-            
-            desenhar_botao(LARGURA // 2 - 100, ALTURA - 100, 200, 50, VERDE_DESTAQUE, "Iniciar Jogo", FONTE_PADRAO, FUNDO_ESCURO)
-
+        desenhar_menu(estado_menu, config, input_ativo)
         pygame.display.flip()
-        CLOCK.tick(30)
 
 # --- Loop principal do Jogo ---
 def jogo(modo, protocolo, host, porta):
-    global sock_comunicacao, oponente_addr, rodando_jogo, estado_jogo, conectado, thread_rede
-    
-    estado_jogo = {'tabuleiro': criar_tabuleiro(), 'vencedor': None, 'empate': False, 'turno': 'X', 'mensagens': []}
+    global rodando_jogo, estado_jogo, conectado, sessao_suspensa, conexao_rede, overlay_metricas, nivel_jogador
+    inicializar_interface()
+
+    jogador = {'c': 'O', 'r': 'O', 'e': None}.get(modo, 'X')  # o espectador não joga
+    estado_jogo = estado_inicial(TabuleiroBits(*variante_jogo), jogador)
+    abrir_diario()
     rodando_jogo = True
-    conectado = False
-    jogador = 'X' if modo == 'h' else 'O'
-    
-    sock, addr = criar_socket_comunicacao(protocolo, host, porta)
-    
-    if not sock:
-        rodando_jogo = False
-        return
-    
-    if protocolo == 'tcp':
-        if modo == 'h':
-            thread_rede = threading.Thread(target=thread_servidor_tcp, args=(sock, addr))
-        else:
-            thread_rede = threading.Thread(target=thread_cliente_tcp, args=(sock, addr))
-    else: # udp
-        if modo == 'h':
-            thread_rede = threading.Thread(target=thread_servidor_udp, args=(sock, addr))
-        else:
-            thread_rede = threading.Thread(target=thread_cliente_udp, args=(sock, addr))
+    conectado = sessao_suspensa = False
+
+    if modo == 'ia':
+        # Partida local: o computador responde pela mesma interface da conexão de rede
+        conexao_rede = ia.OponenteComputador(variante_jogo, 'O', ao_notificar=notificar_interface)
+    else:
+        sock, addr = criar_socket_comunicacao(protocolo, host, porta)
 
-    thread_rede.daemon = True
-    thread_rede.start()
+        if not sock:
+            rodando_jogo = False
+            return
+
+        nivel = None
+        if modo == 'r':
+            # Partida rápida: um "Conectar" ao servidor dedicado que pede variante e nível no HELLO
+            if nivel_jogador is None:
+                nivel_jogador = ler_nivel()
+            nivel = nivel_jogador
+        conexao_rede = rede.ConexaoJogo(protocolo, 'c' if modo == 'r' else modo, sock, addr,
+                                        ao_notificar=notificar_interface,
+                                        formato=formato_rede, confiavel=udp_confiavel_ativo,
+                                        simulador=simulador_rede, variante=variante_jogo,
+                                        metricas=metricas_jogo, nivel=nivel)
+    conexao_rede.iniciar()
 
+    render = criar_renderizador()
+    vencedor = empate = None
+    notificar_interface()  # garante o primeiro desenho
     while rodando_jogo:
-        for event in pygame.event.get():
+        eventos = aguardar_eventos()
+        inicio_quadro = time.perf_counter() if metricas_jogo.ativo else 0.0
+        for event in eventos:
             if event.type == pygame.QUIT:
+                conexao_rede.enviar({'msg': 'DESCONEXAO'})  # saída de propósito: não há o que retomar
+                rodando_jogo = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                invalidar_tela(render)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                overlay_metricas = not overlay_metricas
+                invalidar_tela(render)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_r and conectado and modo != 'e':
+                with lock_rede:
+                    pedido = pedir_revanche()
+                if pedido:
+                    conexao_rede.enviar(pedido)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and (vencedor or empate or modo == 'e'):
+                conexao_rede.enviar({'msg': 'DESCONEXAO'})  # o oponente volta ao menu sem esperar o timeout
                 rodando_jogo = False
-            elif event.type == pygame.MOUSEBUTTONDOWN and estado_jogo['turno'] == jogador and not estado_jogo['vencedor'] and not estado_jogo['empate'] and conectado:
+                conexao_rede.fechar()
+                sair_do_diario()
+                gravar_nivel()
+                return
+            elif event.type == pygame.MOUSEBUTTONDOWN and conectado and not sessao_suspensa:
                 mx, my = pygame.mouse.get_pos()
-                linha = my // TAM_CELULA
-                coluna = mx // TAM_CELULA
-                if fazer_jogada(estado_jogo['tabuleiro'], linha, coluna, jogador):
-                    enviar_dados(sock_comunicacao, {'tabuleiro': estado_jogo['tabuleiro']}, protocolo, oponente_addr)
-                    estado_jogo['turno'] = 'O' if estado_jogo['turno'] == 'X' else 'X'
-        
-        with lock_rede:
-            vencedor = verificar_vencedor(estado_jogo['tabuleiro'])
-            empate = verificar_empate(estado_jogo['tabuleiro'])
+                tam = tamanho_celula(estado_jogo.tabuleiro)
+                linha = my // tam
+                coluna = mx // tam
+                with lock_rede:
+                    jogada = jogada_local(linha, coluna, jogador)
+                if jogada:
+                    conexao_rede.enviar(jogada)
+        processar_eventos_rede(conexao_rede)
+        estado = estado_jogo  # o quadro inteiro sai deste estado, lido sem lock
+        jogador = estado.jogador  # o servidor dedicado pode definir nosso símbolo
 
-        desenhar_gradiente(TELA, FUNDO_ESCURO, CINZA_FUNDO)
-        desenhar_tabuleiro(TELA, estado_jogo['tabuleiro'])
-        
+        vencedor = verificar_vencedor(estado.tabuleiro)
+        empate = verificar_empate(estado.tabuleiro)
+
+        linhas = []
         if vencedor or empate:
             if vencedor:
                 mensagem = f"Jogador '{vencedor}' venceu!"
                 cor_vencedor = COR_X if vencedor == 'X' else COR_O
-                desenhar_texto_centralizado(TELA, mensagem, FONTE_TITULO, cor_vencedor, LARGURA + 50)
+                linhas.append((mensagem, FONTE_TITULO, cor_vencedor, LARGURA + 40))
             elif empate:
                 mensagem = "Empate!"
-                desenhar_texto_centralizado(TELA, mensagem, FONTE_TITULO, BRANCO_CLARO, LARGURA + 50)
+                linhas.append((mensagem, FONTE_TITULO, BRANCO_CLARO, LARGURA + 40))
+            if not rodando_jogo or sessao_suspensa:
+                dica = estado.mensagens[-1]  # ex.: o oponente saiu ou caiu
+            elif modo == 'e':
+                dica = "Aguardando a próxima partida... | ESC: menu"
+            elif estado.revanche_pedida:
+                dica = "Revanche pedida. Aguardando o oponente..."
+            elif estado.revanche_oponente:
+                dica = "O oponente quer revanche! R: aceitar | ESC: menu"
+            else:
+                dica = "R: revanche | ESC: menu"
+            linhas.append((dica, FONTE_MENOR, BRANCO_CLARO, LARGURA + 80))
         else:
             if conectado:
-                status_text = f"Sua vez: {jogador} | Vez: {estado_jogo['turno']}"
-                cor_turno = COR_X if estado_jogo['turno'] == 'X' else COR_O
-                desenhar_texto_centralizado(TELA, status_text, FONTE_PADRAO, cor_turno, LARGURA + 25)
-                
+                if modo == 'e':
+                    status_text = f"Assistindo | Partida {estado.partida} | Vez: {estado.turno}"
+                else:
+                    status_text = f"Sua vez: {jogador} | Vez: {estado.turno}"
+                cor_turno = COR_X if estado.turno == 'X' else COR_O
+                linhas.append((status_text, FONTE_PADRAO, cor_turno, LARGURA + 25))
+
                 y_msg_start = LARGURA + 50
-                with lock_rede:
-                    mensagens_exibir = estado_jogo['mensagens'][-3:]
-                for i, msg in enumerate(mensagens_exibir):
-                    desenhar_texto_centralizado(TELA, msg, FONTE_MENOR, BRANCO_CLARO, y_msg_start + i * 20)
-            else:
-                with lock_rede:
-                    if estado_jogo['mensagens']:
-                        desenhar_texto_centralizado(TELA, estado_jogo['mensagens'][0], FONTE_PADRAO, BRANCO_CLARO, LARGURA + 50)
-        
-        pygame.display.flip()
-        CLOCK.tick(60)
+                for i, msg in enumerate(estado.mensagens[-3:]):
+                    linhas.append((msg, FONTE_MENOR, BRANCO_CLARO, y_msg_start + i * 20))
+            elif estado.mensagens:
+                linhas.append((estado.mensagens[0], FONTE_PADRAO, BRANCO_CLARO, LARGURA + 50))
 
-        if vencedor or empate:
-            while True:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        rodando_jogo = False
-                        if sock: sock.close()
-                        return
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_r:
-                            rodando_jogo = False
-                            if sock: sock.close()
-                            return
-                        elif event.key == pygame.K_ESCAPE:
-                            rodando_jogo = False
-                            if sock: sock.close()
-                            return
-                pygame.display.flip()
-    
-    if thread_rede and thread_rede.is_alive():
-        thread_rede.join(timeout=2)
-    
-    if sock:
-        sock.close()
+        desenhou = atualizar_tela_jogo(render, estado.tabuleiro, linhas,
+                                       desenhar_overlay if overlay_metricas else None)
+        if desenhou and metricas_jogo.ativo:
+            agora = time.perf_counter()
+            metricas_jogo.observar('quadro_segundos', agora - inicio_quadro)
+            taxa_quadros.marcar(agora)
+
+    conexao_rede.fechar()
+    sair_do_diario()
+    gravar_nivel()
     
     pygame.time.wait(2000)
 
+def sair_do_diario():
+    """Fim da sessão: fecha a partida em aberto como abandonada e sincroniza o diário."""
+    with lock_rede:
+        encerrar_registro(abandonada=True)
+    if diario_jogo:
+        diario_jogo.descarregar(sincronizar=True)
+
+# --- Replays ---
+PASSO_REPLAY = 0.6  # segundos entre jogadas na reprodução automática
+TEXTO_RESULTADO = {'X': "Vitória de X", 'O': "Vitória de O", 'empate': "Empate",
+                   'abandonada': "Abandonada", None: "Não terminou"}
+
+def linhas_replay(leitor, gravada, jogada):
+    """Textos da área de status da tela de replays."""
+    if gravada is None:
+        return [("Nenhuma partida gravada.", FONTE_PADRAO, BRANCO_CLARO, LARGURA + 25),
+                ("ESC: menu", FONTE_MENOR, BRANCO_CLARO, LARGURA + 80)]
+    if jogada:
+        turno = gravada.jogadas[jogada - 1][1]
+        cor = COR_X if turno == 'X' else COR_O
+    else:
+        cor = BRANCO_CLARO
+    data = time.strftime('%d/%m/%Y %H:%M', time.localtime(gravada.inicio))
+    return [(f"Partida {gravada.numero + 1}/{len(leitor)} | Jogada {jogada}/{len(gravada.jogadas)}",
+             FONTE_PADRAO, cor, LARGURA + 25),
+            (f"{TEXTO_RESULTADO.get(gravada.resultado)} | {data}", FONTE_MENOR, BRANCO_CLARO, LARGURA + 55),
+            ("←/→: jogada | ↑/↓: partida | espaço: reproduzir | ESC: menu",
+             FONTE_MENOR, BRANCO_CLARO, LARGURA + 80)]
+
+def assistir_replays():
+    """Reproduz as partidas do diário, da mais recente para trás, com desenhar_tabuleiro."""
+    inicializar_interface()
+    if diario_jogo:
+        diario_jogo.descarregar()  # o que ainda está no buffer também aparece
+    try:
+        leitor = diario.LeitorDiario(ARQUIVO_DIARIO)
+    except (OSError, ValueError):
+        leitor = None
+    partida = len(leitor) - 1 if leitor else -1
+    gravada, jogada = None, 0
+    reproduzindo, proximo_passo = False, 0.0
+    render = criar_renderizador()
+    notificar_interface()  # garante o primeiro desenho
+    try:
+        while True:
+            if partida >= 0 and (gravada is None or gravada.numero != partida):
+                gravada = leitor.partida(partida)  # lê só os registros desta partida
+                jogada = len(gravada.jogadas)
+                reproduzindo = False
+            espera = ESPERA_EVENTOS_MS
+            if reproduzindo:
+                espera = max(1, int((proximo_passo - time.monotonic()) * 1000))
+            for event in aguardar_eventos(espera):
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    invalidar_tela(render)
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return
+                    if gravada is None:
+                        continue
+                    total = len(gravada.jogadas)
+                    if event.key == pygame.K_SPACE:
+                        reproduzindo = not reproduzindo
+                        if reproduzindo and jogada == total:
+                            jogada = 0
+                        proximo_passo = time.monotonic() + PASSO_REPLAY
+                        continue
+                    reproduzindo = False
+                    if event.key == pygame.K_LEFT:
+                        jogada = max(0, jogada - 1)
+                    elif event.key == pygame.K_RIGHT:
+                        jogada = min(total, jogada + 1)
+                    elif event.key == pygame.K_HOME:
+                        jogada = 0
+                    elif event.key == pygame.K_END:
+                        jogada = total
+                    elif event.key == pygame.K_UP:
+                        partida = max(0, partida - 1)
+                    elif event.key == pygame.K_DOWN:
+                        partida = min(len(leitor) - 1, partida + 1)
+            if reproduzindo and time.monotonic() >= proximo_passo:
+                jogada += 1
+                proximo_passo += PASSO_REPLAY
+                reproduzindo = jogada < len(gravada.jogadas)
+            if gravada is not None and gravada.numero != partida:
+                continue  # a partida mudou: lê a nova antes de desenhar
+            tabuleiro = gravada.tabuleiro(jogada) if gravada else TabuleiroBits(*variante_jogo)
+            atualizar_tela_jogo(render, tabuleiro, linhas_replay(leitor, gravada, jogada))
+    finally:
+        if leitor:
+            leitor.fechar()
+
 if __name__ == "__main__":
     while True:
         try:
             modo, protocolo, host, porta = main_menu()
-            jogo(modo, protocolo, host, porta)
+            if modo == 'replay':
+                assistir_replays()
+            else:
+                jogo(modo, protocolo, host, porta)
         except Exception as e:
             print(f"Erro crítico no jogo: {e}")
             pygame.quit()
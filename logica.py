@@ -0,0 +1,57 @@
+"""Lógica do Jogo da Velha, sem dependência de pygame (usada pela interface e pelo servidor).
+
+As funções aceitam tanto o tabuleiro em lista de listas quanto um
+bitboard.TabuleiroBits, que já sabe seu tamanho e a sequência de vitória e
+mantém o vencedor e as células vazias a cada jogada.
+"""
+from bitboard import TabuleiroBits
+
+TAMANHO_PADRAO = 3
+SEQUENCIA_PADRAO = 3
+
+
+def criar_tabuleiro(n=TAMANHO_PADRAO):
+    """Cria um tabuleiro NxN vazio."""
+    return [[' ' for _ in range(n)] for _ in range(n)]
+
+
+def fazer_jogada(tabuleiro, linha, coluna, jogador):
+    """Realiza uma jogada se for válida."""
+    n = len(tabuleiro)
+    if isinstance(tabuleiro, TabuleiroBits):
+        return 0 <= linha < n and 0 <= coluna < n and tabuleiro.jogar(linha * n + coluna, jogador)
+    if 0 <= linha < n and 0 <= coluna < n and tabuleiro[linha][coluna] == ' ':
+        tabuleiro[linha][coluna] = jogador
+        return True
+    return False
+
+
+def verificar_vencedor(tabuleiro, k=SEQUENCIA_PADRAO):
+    """Verifica se há um vencedor e retorna o símbolo ('X' ou 'O')."""
+    if not tabuleiro: return None
+    if isinstance(tabuleiro, TabuleiroBits):
+        return tabuleiro.vencedor()
+    if len(tabuleiro) != 3 or k != 3:
+        # de_lista recusa K maior que N; aqui, como sempre, K fica limitado ao tamanho
+        return TabuleiroBits.de_lista(tabuleiro, min(k, len(tabuleiro))).vencedor()
+    for i in range(3):
+        if tabuleiro[i][0] == tabuleiro[i][1] == tabuleiro[i][2] != ' ':
+            return tabuleiro[i][0]
+        if tabuleiro[0][i] == tabuleiro[1][i] == tabuleiro[2][i] != ' ':
+            return tabuleiro[0][i]
+    if tabuleiro[0][0] == tabuleiro[1][1] == tabuleiro[2][2] != ' ':
+        return tabuleiro[0][0]
+    if tabuleiro[0][2] == tabuleiro[1][1] == tabuleiro[2][0] != ' ':
+        return tabuleiro[0][2]
+    return None
+
+
+def verificar_empate(tabuleiro, k=SEQUENCIA_PADRAO):
+    """Verifica se o jogo terminou em empate."""
+    if not tabuleiro: return False
+    if isinstance(tabuleiro, TabuleiroBits):
+        return tabuleiro.empate()
+    for linha in tabuleiro:
+        if ' ' in linha:
+            return False
+    return verificar_vencedor(tabuleiro, k) is None
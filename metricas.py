@@ -0,0 +1,201 @@
+"""Métricas de desempenho do jogo e do servidor: contadores, histogramas e taxas.
+
+Não depende de pygame. A interface usa uma instância para o overlay (F3) e o
+servidor dedicado exporta a sua em JSON ou no formato texto do Prometheus.
+
+Contadores têm um rótulo opcional (ex.: o protocolo, 'tcp' ou 'udp').
+Histogramas usam faixas fixas em escala de 2 (1 µs a ~8 s), de modo que
+observar um valor é uma busca binária e um incremento, e instantâneos de
+vários processos podem ser somados faixa a faixa. Com `ativo=False` cada
+chamada retorna logo na primeira linha.
+"""
+import json
+import time
+from bisect import bisect_left
+from collections import deque
+
+LIMITES_PADRAO = tuple(1e-6 * 2 ** i for i in range(24))  # segundos
+
+
+class Histograma:
+    """Contagem de observações por faixa; contagens[-1] é a faixa acima do último limite."""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=LIMITES_PADRAO):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def instantaneo(self):
+        return {'limites': self.limites, 'contagens': list(self.contagens),
+                'soma': self.soma, 'total': self.total}
+
+
+def quantil(histograma, q):
+    """Estima o quantil q (0 a 1) de um instantâneo de histograma, interpolando na faixa."""
+    total = histograma['total']
+    if not total:
+        return 0.0
+    limites, alvo, acumulado = histograma['limites'], q * total, 0
+    for indice, contagem in enumerate(histograma['contagens']):
+        if acumulado + contagem >= alvo and contagem:
+            if indice == len(limites):
+                return limites[-1]  # acima da última faixa: só sabemos o limite inferior
+            inferior = limites[indice - 1] if indice else 0.0
+            return inferior + (limites[indice] - inferior) * (alvo - acumulado) / contagem
+        acumulado += contagem
+    return limites[-1]
+
+
+class Taxa:
+    """Eventos por segundo numa janela deslizante (ex.: quadros desenhados)."""
+
+    __slots__ = ('janela', 'instantes')
+
+    def __init__(self, janela=1.0):
+        self.janela = janela
+        self.instantes = deque()
+
+    def marcar(self, agora=None):
+        self.instantes.append(time.perf_counter() if agora is None else agora)
+
+    def por_segundo(self, agora=None):
+        limite = (time.perf_counter() if agora is None else agora) - self.janela
+        while self.instantes and self.instantes[0] < limite:
+            self.instantes.popleft()
+        return len(self.instantes) / self.janela
+
+
+class Metricas:
+    """Registro de contadores e histogramas de um processo."""
+
+    def __init__(self, ativo=True, limites=LIMITES_PADRAO):
+        self.ativo = ativo
+        self.limites = limites
+        self.contadores = {}    # (nome, rótulo) -> valor
+        self.histogramas = {}   # nome -> Histograma
+
+    def somar(self, nome, valor=1, rotulo=''):
+        if not self.ativo:
+            return
+        chave = (nome, rotulo)
+        self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor):
+        if not self.ativo:
+            return
+        histograma = self.histogramas.get(nome)
+        if histograma is None:
+            histograma = self.histogramas[nome] = Histograma(self.limites)
+        histograma.observar(valor)
+
+    def contador(self, nome, rotulo=''):
+        return self.contadores.get((nome, rotulo), 0)
+
+    def instantaneo(self):
+        """Cópia do estado atual, que pode ser somada (agregar) e exportada."""
+        return {'contadores': dict(self.contadores),
+                'histogramas': {nome: h.instantaneo() for nome, h in list(self.histogramas.items())}}
+
+
+DESLIGADAS = Metricas(ativo=False)  # padrão de quem não recebe uma instância
+
+
+class LockMedido:
+    """Envolve um threading.Lock e registra em `nome` quanto cada aquisição esperou."""
+
+    __slots__ = ('lock', 'metricas', 'nome')
+
+    def __init__(self, lock, metricas, nome):
+        self.lock = lock
+        self.metricas = metricas
+        self.nome = nome
+
+    def __enter__(self):
+        if not self.metricas.ativo:
+            self.lock.acquire()
+        elif self.lock.acquire(False):
+            self.metricas.observar(self.nome, 0.0)  # livre: nem mede o relógio
+        else:
+            inicio = time.perf_counter()
+            self.lock.acquire()
+            self.metricas.observar(self.nome, time.perf_counter() - inicio)
+            self.metricas.somar(self.nome + '_contencoes')
+        return self
+
+    def __exit__(self, *excecao):
+        self.lock.release()
+
+
+# --- Agregação e exportação ---
+def agregar(instantaneos):
+    """Soma instantâneos de vários processos (contadores e histogramas faixa a faixa)."""
+    total = {'contadores': {}, 'histogramas': {}}
+    for instantaneo in instantaneos:
+        for chave, valor in instantaneo['contadores'].items():
+            total['contadores'][chave] = total['contadores'].get(chave, 0) + valor
+        for nome, histograma in instantaneo['histogramas'].items():
+            soma = total['histogramas'].get(nome)
+            if soma is None:
+                total['histogramas'][nome] = dict(histograma, contagens=list(histograma['contagens']))
+                continue
+            soma['contagens'] = [a + b for a, b in zip(soma['contagens'], histograma['contagens'])]
+            soma['soma'] += histograma['soma']
+            soma['total'] += histograma['total']
+    return total
+
+
+def para_json(instantaneo, extras=None):
+    """Texto JSON do instantâneo: contadores por nome (e rótulo) e resumo dos histogramas."""
+    contadores = {}
+    for (nome, rotulo), valor in sorted(instantaneo['contadores'].items()):
+        if rotulo:
+            contadores.setdefault(nome, {})[rotulo] = valor
+        else:
+            contadores[nome] = valor
+    histogramas = {
+        nome: {'total': h['total'], 'soma': h['soma'], 'p50': quantil(h, 0.5), 'p99': quantil(h, 0.99),
+               'limites': list(h['limites']), 'contagens': h['contagens']}
+        for nome, h in sorted(instantaneo['histogramas'].items())}
+    documento = {'contadores': contadores, 'histogramas': histogramas}
+    if extras is not None:
+        documento['estatisticas'] = extras
+    return json.dumps(documento, ensure_ascii=False)
+
+
+def para_prometheus(instantaneo, prefixo='jogo', extras=None):
+    """Texto no formato de exposição do Prometheus.
+
+    `extras` é um dicionário de valores numéricos avulsos (ex.: as estatísticas
+    do servidor), exportados como gauges.
+    """
+    linhas = []
+    nomes_vistos = set()
+    for (nome, rotulo), valor in sorted(instantaneo['contadores'].items()):
+        metrica = f"{prefixo}_{nome}_total"
+        if metrica not in nomes_vistos:
+            nomes_vistos.add(metrica)
+            linhas.append(f"# TYPE {metrica} counter")
+        rotulos = f'{{protocolo="{rotulo}"}}' if rotulo else ''
+        linhas.append(f"{metrica}{rotulos} {valor}")
+    for nome, h in sorted(instantaneo['histogramas'].items()):
+        metrica = f"{prefixo}_{nome}"
+        linhas.append(f"# TYPE {metrica} histogram")
+        acumulado = 0
+        for limite, contagem in zip(h['limites'], h['contagens']):
+            acumulado += contagem
+            linhas.append(f'{metrica}_bucket{{le="{limite:.6g}"}} {acumulado}')
+        linhas.append(f'{metrica}_bucket{{le="+Inf"}} {h["total"]}')
+        linhas.append(f"{metrica}_sum {h['soma']:.9g}")
+        linhas.append(f"{metrica}_count {h['total']}")
+    for nome, valor in sorted((extras or {}).items()):
+        linhas.append(f"# TYPE {prefixo}_{nome} gauge")
+        linhas.append(f"{prefixo}_{nome} {valor}")
+    return '\n'.join(linhas) + '\n'
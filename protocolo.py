@@ -0,0 +1,349 @@
+"""Protocolo de camada de aplicação do Jogo da Velha em Rede.
+
+Cada mensagem é um quadro com cabeçalho binário de 4 bytes seguido do corpo:
+
+    versão (1 byte) | tipo (1 byte) | tamanho do corpo (2 bytes, big-endian)
+
+No TCP os quadros chegam como um fluxo contínuo e são remontados por
+LeitorQuadros; no UDP cada datagrama carrega exatamente um quadro.
+
+As mensagens são dicionários Python (como no protocolo JSON original). Os tipos
+conhecidos têm codificação binária compacta; qualquer outro dicionário, ou
+todos eles quando o formato JSON é negociado, vai como JSON dentro de um
+quadro TIPO_JSON.
+"""
+import json
+import struct
+
+VERSAO = 1
+
+TIPO_HELLO = 1
+TIPO_TABULEIRO = 2
+TIPO_JOGADA = 3
+TIPO_ESTADO = 4
+TIPO_RESYNC = 5
+TIPO_CONFIAVEL = 6  # envelope da camada UDP confiável: seq + quadro interno
+TIPO_ACK = 7
+TIPO_JOGADA_OK = 8  # confirmação de que a jogada chegou (mede a latência de ida e volta)
+TIPO_REVANCHE = 9   # pedido (ou aceite) da próxima partida da mesma sessão
+TIPO_BATIMENTO = 10  # keepalive: sem corpo, só mostra que o outro lado está vivo
+TIPO_JSON = 0x7F
+
+FORMATO_BINARIO = 'bin'
+FORMATO_JSON = 'json'
+
+CABECALHO = struct.Struct('!BBH')
+TAMANHO_MAXIMO = 0xFFFF
+TAMANHO_TABULEIRO_MAXIMO = 255  # N vai em 1 byte e o índice da célula em 2
+
+# Cada célula ocupa 2 bits no tabuleiro empacotado
+CODIGO_SIMBOLO = {' ': 0, 'X': 1, 'O': 2}
+SIMBOLO_CODIGO = {0: ' ', 1: 'X', 2: 'O'}
+JOGADOR_CODIGO = {1: 'X', 2: 'O'}  # jogador da jogada e turno do estado: nunca vazio
+
+_HELLO = struct.Struct('!B')
+_HELLO_VARIANTE = struct.Struct('!BBB')  # formato, tamanho do tabuleiro, sequência de vitória
+_HELLO_NIVEL = struct.Struct('!BBBH')    # ... e o nível de quem procura partida no saguão
+_CAMPOS_HELLO = {'msg', 'formato', 'tamanho', 'sequencia', 'nivel'}
+_JOGADA = struct.Struct('!IHB')   # seq, índice da célula, jogador
+_ESTADO = struct.Struct('!IB')    # seq, turno (seguido do tabuleiro empacotado)
+_RESYNC = struct.Struct('!I')     # última seq aplicada por quem pede
+_JOGADA_OK = struct.Struct('!I')  # seq da jogada recebida
+_REVANCHE = struct.Struct('!I')   # número da partida pedida (a primeira da sessão é a 1)
+_SEQ_ENVELOPE = struct.Struct('!I')
+
+
+class ErroProtocolo(ValueError):
+    """Quadro malformado, de versão desconhecida ou com corpo inválido."""
+
+
+def quem_comeca(partida):
+    """Símbolo que faz a primeira jogada da n-ésima partida da sessão (alterna a cada uma)."""
+    return 'X' if partida % 2 else 'O'
+
+
+# Tabelas de conversão entre um byte e as quatro células que ele guarda
+_CELULAS_DO_BYTE = [
+    tuple(SIMBOLO_CODIGO.get((byte >> (6 - 2 * k)) & 0b11) for k in range(4))
+    for byte in range(256)
+]
+_BYTE_DAS_CELULAS = {celulas: byte for byte, celulas in enumerate(_CELULAS_DO_BYTE)
+                     if None not in celulas}
+
+
+def empacotar_tabuleiro(tabuleiro):
+    """Empacota um tabuleiro N×N em 1 byte de tamanho + 2 bits por célula."""
+    n = len(tabuleiro)
+    celulas = [c for linha in tabuleiro for c in linha]
+    celulas += [' '] * (-len(celulas) % 4)
+    try:
+        return bytes([n]) + bytes(_BYTE_DAS_CELULAS[tuple(celulas[i:i + 4])]
+                                  for i in range(0, len(celulas), 4))
+    except KeyError:
+        raise ErroProtocolo("símbolo de célula inválido") from None
+
+
+def desempacotar_tabuleiro(corpo):
+    """Operação inversa de empacotar_tabuleiro."""
+    if not corpo:
+        raise ErroProtocolo("tabuleiro vazio")
+    n = corpo[0]
+    if n == 0 or len(corpo) != 1 + (n * n + 3) // 4:
+        raise ErroProtocolo("tamanho do tabuleiro inconsistente")
+    celulas = []
+    for byte in corpo[1:]:
+        celulas.extend(_CELULAS_DO_BYTE[byte])
+    if None in celulas:
+        raise ErroProtocolo("código de célula inválido")
+    return [celulas[i * n:(i + 1) * n] for i in range(n)]
+
+
+def quadro(tipo, corpo):
+    """Monta um quadro com cabeçalho para o corpo dado."""
+    if len(corpo) > TAMANHO_MAXIMO:
+        raise ErroProtocolo("mensagem grande demais")
+    return CABECALHO.pack(VERSAO, tipo, len(corpo)) + corpo
+
+
+def codificar(dados, formato=FORMATO_BINARIO):
+    """Serializa uma mensagem (dicionário) em um quadro."""
+    if dados.get('msg') == 'HELLO' and set(dados) <= _CAMPOS_HELLO:
+        # O HELLO é sempre binário: é ele que anuncia o formato preferido
+        formato_hello = 1 if dados.get('formato') == FORMATO_JSON else 0
+        if 'nivel' in dados:
+            corpo = _HELLO_NIVEL.pack(formato_hello, dados['tamanho'], dados['sequencia'], dados['nivel'])
+            return quadro(TIPO_HELLO, corpo)
+        if 'tamanho' in dados:
+            corpo = _HELLO_VARIANTE.pack(formato_hello, dados['tamanho'], dados['sequencia'])
+            return quadro(TIPO_HELLO, corpo)
+        return quadro(TIPO_HELLO, _HELLO.pack(formato_hello))
+    if formato == FORMATO_BINARIO:
+        if set(dados) == {'tabuleiro'}:
+            return quadro(TIPO_TABULEIRO, empacotar_tabuleiro(dados['tabuleiro']))
+        if set(dados) == {'jogada', 'jogador', 'seq'}:
+            corpo = _JOGADA.pack(dados['seq'], dados['jogada'], CODIGO_SIMBOLO[dados['jogador']])
+            return quadro(TIPO_JOGADA, corpo)
+        if set(dados) == {'tabuleiro', 'turno', 'seq'}:
+            corpo = _ESTADO.pack(dados['seq'], CODIGO_SIMBOLO[dados['turno']])
+            return quadro(TIPO_ESTADO, corpo + empacotar_tabuleiro(dados['tabuleiro']))
+        if set(dados) == {'msg', 'seq'} and dados['msg'] == 'RESYNC':
+            return quadro(TIPO_RESYNC, _RESYNC.pack(dados['seq']))
+        if set(dados) == {'msg', 'seq'} and dados['msg'] == 'JOGADA_OK':
+            return quadro(TIPO_JOGADA_OK, _JOGADA_OK.pack(dados['seq']))
+        if set(dados) == {'msg', 'partida'} and dados['msg'] == 'REVANCHE':
+            return quadro(TIPO_REVANCHE, _REVANCHE.pack(dados['partida']))
+        if dados == {'msg': 'BATIMENTO'}:
+            return quadro(TIPO_BATIMENTO, b'')
+    return quadro(TIPO_JSON, json.dumps(dados, separators=(',', ':')).encode('utf-8'))
+
+
+def decodificar(dados_quadro):
+    """Desserializa um quadro completo (cabeçalho + corpo) em uma mensagem."""
+    if len(dados_quadro) < CABECALHO.size:
+        raise ErroProtocolo("quadro truncado")
+    versao, tipo, tamanho = CABECALHO.unpack_from(dados_quadro)
+    if versao != VERSAO:
+        raise ErroProtocolo(f"versão de protocolo desconhecida: {versao}")
+    corpo = bytes(dados_quadro[CABECALHO.size:])
+    if len(corpo) != tamanho:
+        raise ErroProtocolo("tamanho do corpo não confere com o cabeçalho")
+
+    if tipo == TIPO_HELLO:
+        try:
+            nivel = None
+            if len(corpo) == _HELLO_NIVEL.size:
+                formato_hello, tamanho, sequencia, nivel = _HELLO_NIVEL.unpack(corpo)
+            elif len(corpo) == _HELLO_VARIANTE.size:
+                formato_hello, tamanho, sequencia = _HELLO_VARIANTE.unpack(corpo)
+            else:
+                (formato_hello,) = _HELLO.unpack(corpo)
+                tamanho = None
+        except struct.error:
+            raise ErroProtocolo("HELLO inválido") from None
+        if tamanho is not None and not variante_valida(tamanho, sequencia):
+            raise ErroProtocolo("HELLO com variante inválida")
+        hello = {'msg': 'HELLO', 'formato': FORMATO_JSON if formato_hello else FORMATO_BINARIO}
+        if tamanho is not None:
+            hello['tamanho'] = tamanho
+            hello['sequencia'] = sequencia
+        if nivel is not None:
+            hello['nivel'] = nivel
+        return hello
+    if tipo == TIPO_TABULEIRO:
+        return {'tabuleiro': desempacotar_tabuleiro(corpo)}
+    if tipo == TIPO_JOGADA:
+        try:
+            seq, indice, codigo = _JOGADA.unpack(corpo)
+            return {'jogada': indice, 'jogador': JOGADOR_CODIGO[codigo], 'seq': seq}
+        except (struct.error, KeyError):
+            raise ErroProtocolo("jogada inválida") from None
+    if tipo == TIPO_ESTADO:
+        try:
+            seq, codigo = _ESTADO.unpack_from(corpo)
+            turno = JOGADOR_CODIGO[codigo]
+        except (struct.error, KeyError):
+            raise ErroProtocolo("estado inválido") from None
+        return {'tabuleiro': desempacotar_tabuleiro(corpo[_ESTADO.size:]), 'turno': turno, 'seq': seq}
+    if tipo == TIPO_RESYNC:
+        try:
+            (seq,) = _RESYNC.unpack(corpo)
+        except struct.error:
+            raise ErroProtocolo("pedido de resync inválido") from None
+        return {'msg': 'RESYNC', 'seq': seq}
+    if tipo == TIPO_JOGADA_OK:
+        try:
+            (seq,) = _JOGADA_OK.unpack(corpo)
+        except struct.error:
+            raise ErroProtocolo("confirmação de jogada inválida") from None
+        return {'msg': 'JOGADA_OK', 'seq': seq}
+    if tipo == TIPO_REVANCHE:
+        try:
+            (partida,) = _REVANCHE.unpack(corpo)
+        except struct.error:
+            raise ErroProtocolo("pedido de revanche inválido") from None
+        return {'msg': 'REVANCHE', 'partida': partida}
+    if tipo == TIPO_BATIMENTO:
+        if corpo:
+            raise ErroProtocolo("batimento com corpo")
+        return {'msg': 'BATIMENTO'}
+    if tipo == TIPO_JSON:
+        try:
+            dados = json.loads(corpo.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ErroProtocolo("JSON inválido") from None
+        validar_mensagem(dados)
+        return dados
+    raise ErroProtocolo(f"tipo de mensagem desconhecido: {tipo}")
+
+
+# --- Validação das mensagens em JSON ---
+# Os tipos binários já saem de decodificar com os campos certos; as mensagens em
+# JSON passam por validar_mensagem, para quem as trata poder indexar os campos
+# que cada uma exige sem conferir.
+def _inteiro(valor):
+    return type(valor) is int and valor >= 0
+
+
+def _simbolo(valor):
+    return isinstance(valor, str) and valor in ('X', 'O')
+
+
+def _texto(valor):
+    return isinstance(valor, str)
+
+
+def _token(valor):
+    return valor is None or isinstance(valor, str)
+
+
+# msg -> ({campo obrigatório: validador}, {campo opcional: validador})
+_CAMPOS_MENSAGEM = {
+    'HELLO': ({'formato': _texto}, {'tamanho': _inteiro, 'sequencia': _inteiro, 'nivel': _inteiro}),
+    'RESYNC': ({'seq': _inteiro}, {}),
+    'JOGADA_OK': ({'seq': _inteiro}, {}),
+    'REVANCHE': ({'partida': _inteiro}, {}),
+    'RETOMADA': ({'partida': _inteiro}, {}),
+    'PARTIDA': ({'jogador': _simbolo}, {'tamanho': _inteiro, 'sequencia': _inteiro}),
+    'NIVEL': ({'nivel': _inteiro}, {}),
+    'SESSAO': ({}, {'sessao': _token}),
+    'RETOMAR': ({}, {'sessao': _token}),
+}
+
+
+def variante_valida(tamanho, sequencia):
+    """Tabuleiro NxN com K em linha, 1 <= K <= N <= TAMANHO_TABULEIRO_MAXIMO."""
+    return _inteiro(tamanho) and _inteiro(sequencia) and 1 <= sequencia <= tamanho <= TAMANHO_TABULEIRO_MAXIMO
+
+
+def _tabuleiro_valido(tabuleiro):
+    n = len(tabuleiro) if isinstance(tabuleiro, list) else 0
+    return (1 <= n <= TAMANHO_TABULEIRO_MAXIMO
+            and all(isinstance(linha, list) and len(linha) == n
+                    and all(isinstance(c, str) and c in CODIGO_SIMBOLO for c in linha)
+                    for linha in tabuleiro))
+
+
+def validar_mensagem(dados):
+    """Levanta ErroProtocolo se a mensagem não é um objeto ou falta (ou tem o tipo
+    errado) um campo que ela exige. Mensagens desconhecidas passam."""
+    if not isinstance(dados, dict):
+        raise ErroProtocolo("mensagem JSON não é um objeto")
+    if 'jogada' in dados and not (_inteiro(dados['jogada']) and _simbolo(dados.get('jogador'))
+                                  and _inteiro(dados.get('seq'))):
+        raise ErroProtocolo("jogada inválida")
+    if 'tabuleiro' in dados:
+        if not _tabuleiro_valido(dados['tabuleiro']):
+            raise ErroProtocolo("tabuleiro inválido")
+        if ('turno' in dados or 'seq' in dados) and not (_simbolo(dados.get('turno'))
+                                                        and _inteiro(dados.get('seq'))):
+            raise ErroProtocolo("estado inválido")
+    if 'msg' not in dados:
+        return
+    if not isinstance(dados['msg'], str):
+        raise ErroProtocolo("campo 'msg' inválido")
+    obrigatorios, opcionais = _CAMPOS_MENSAGEM.get(dados['msg'], ({}, {}))
+    for campo, valido in obrigatorios.items():
+        if campo not in dados or not valido(dados[campo]):
+            raise ErroProtocolo(f"{dados['msg']}: campo '{campo}' ausente ou inválido")
+    for campo, valido in opcionais.items():
+        if campo in dados and not valido(dados[campo]):
+            raise ErroProtocolo(f"{dados['msg']}: campo '{campo}' inválido")
+    if dados['msg'] in ('HELLO', 'PARTIDA') and ('tamanho' in dados or 'sequencia' in dados):
+        if not variante_valida(dados.get('tamanho'), dados.get('sequencia')):
+            raise ErroProtocolo(f"{dados['msg']}: variante inválida")
+
+
+def envelopar(seq, quadro_interno):
+    """Embrulha um quadro em um envelope numerado da camada UDP confiável."""
+    return quadro(TIPO_CONFIAVEL, _SEQ_ENVELOPE.pack(seq) + quadro_interno)
+
+
+def quadro_ack(seq):
+    """Monta a confirmação de recebimento de um envelope."""
+    return quadro(TIPO_ACK, _SEQ_ENVELOPE.pack(seq))
+
+
+def abrir_envelope(dados_quadro):
+    """Classifica um datagrama da camada confiável.
+
+    Retorna (TIPO_CONFIAVEL, seq, quadro_interno), (TIPO_ACK, seq, None) ou
+    (None, None, dados_quadro) para quadros comuns, que passam direto.
+    """
+    if len(dados_quadro) < CABECALHO.size + _SEQ_ENVELOPE.size:
+        return None, None, dados_quadro
+    versao, tipo, tamanho = CABECALHO.unpack_from(dados_quadro)
+    if versao != VERSAO or tipo not in (TIPO_CONFIAVEL, TIPO_ACK):
+        return None, None, dados_quadro
+    if tamanho != len(dados_quadro) - CABECALHO.size:
+        raise ErroProtocolo("tamanho do corpo não confere com o cabeçalho")
+    (seq,) = _SEQ_ENVELOPE.unpack_from(dados_quadro, CABECALHO.size)
+    if tipo == TIPO_ACK:
+        return TIPO_ACK, seq, None
+    return TIPO_CONFIAVEL, seq, bytes(dados_quadro[CABECALHO.size + _SEQ_ENVELOPE.size:])
+
+
+class LeitorQuadros:
+    """Remonta quadros a partir de um fluxo TCP, que pode juntar ou partir segmentos."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def alimentar(self, dados):
+        """Acrescenta bytes recebidos do socket ao buffer."""
+        self.buffer += dados
+
+    def proximo(self):
+        """Retorna o próximo quadro completo (bytes) ou None se ainda faltam bytes."""
+        if len(self.buffer) < CABECALHO.size:
+            return None
+        versao, _, tamanho = CABECALHO.unpack_from(self.buffer)
+        if versao != VERSAO:
+            # Fluxo corrompido: não há como ressincronizar com segurança
+            self.buffer.clear()
+            raise ErroProtocolo(f"versão de protocolo desconhecida: {versao}")
+        fim = CABECALHO.size + tamanho
+        if len(self.buffer) < fim:
+            return None
+        dados_quadro = bytes(self.buffer[:fim])
+        del self.buffer[:fim]
+        return dados_quadro
@@ -0,0 +1,658 @@
+"""Camada de rede do jogo sobre asyncio.
+
+Uma ConexaoJogo roda um loop asyncio em uma thread de fundo e atende os quatro
+modos (TCP/UDP, hospedar/conectar): streams no TCP, DatagramProtocol no UDP.
+Nada faz polling: o loop só acorda quando chegam dados, quando vence um prazo
+de retransmissão do UDP confiável ou do batimento, ou quando a interface pede
+um envio.
+
+A conexão dura a sessão inteira, não uma partida: as revanches trafegam pelo
+mesmo socket. Enquanto conectado, cada lado manda um BATIMENTO quando fica
+INTERVALO_BATIMENTO segundos sem enviar nada, e dá o oponente por perdido se
+passar TIMEOUT_BATIMENTO segundos sem receber nada dele.
+
+Quem hospeda entrega ao oponente um token de sessão ({'msg': 'SESSAO'}). Se a
+conexão cai (erro no TCP, silêncio além do TIMEOUT_BATIMENTO ou mensagens do
+UDP confiável sem confirmação), a sessão fica suspensa em vez de acabar: quem
+conectou volta com {'msg': 'RETOMAR', 'sessao': token} (nova conexão no TCP;
+no UDP, o mesmo socket, mesmo que um NAT tenha trocado sua porta), e quem
+hospeda, se o token for válido e a janela de retomada (sessoes.JANELA_RETOMADA)
+não tiver acabado, responde com a SESSAO de novo. A interface de quem hospeda
+então reenvia o estado da partida.
+
+Quem hospeda também aceita espectadores (transmissao.py): com a ConexaoJogo no
+modo 'e', o espectador manda {'msg': 'ASSISTIR'} no lugar do HELLO e passa a
+receber as jogadas dos dois jogadores, sem poder jogar. No TCP ele usa a mesma
+porta do oponente (quem hospeda decide pela primeira mensagem de cada conexão);
+no UDP, datagramas de qualquer endereço que não o do oponente são de
+espectadores.
+
+Com `nivel`, quem conecta a um servidor dedicado pede uma partida rápida: o
+HELLO leva a variante desejada e o nível, e o servidor pareia pelo saguão
+(saguao.py).
+
+A interface consome os eventos da fila `eventos` (thread-safe), como tuplas
+(tipo, conteúdo):
+
+    ('status', texto)       mensagem informativa (ex.: "Aguardando oponente...")
+    ('conectado', texto)    o oponente está conectado
+    ('variante', (n, k))    quem hospeda usa outro tamanho de tabuleiro / sequência
+    ('mensagem', dados)     mensagem do jogo recebida do oponente (dicionário)
+    ('suspensa', texto)     a conexão caiu; esperando a retomada da sessão
+    ('retomada', texto)     a sessão foi retomada
+    ('desconexao', texto)   a conexão caiu de vez (ou o oponente saiu)
+    ('erro', texto)         falha ao hospedar ou conectar
+
+Depois de cada evento, `ao_notificar` é chamado (na thread da rede) para
+acordar a interface.
+
+Com uma instância de metricas.Metricas, a conexão conta bytes e mensagens
+enviados e recebidos por protocolo, erros de envio e recepção, e mede a ida e
+volta de cada jogada (do envio até o JOGADA_OK que o outro lado devolve).
+"""
+import asyncio
+import queue
+import socket
+import threading
+
+import protocolo as proto
+import sessoes
+import transmissao
+import udp_confiavel
+from metricas import DESLIGADAS
+
+INTERVALO_HELLO_UDP = 0.5
+TIMEOUT_HELLO_UDP = 10
+INTERVALO_BATIMENTO = 2
+TIMEOUT_BATIMENTO = 10
+INTERVALO_RETOMADA = 0.5  # entre tentativas de voltar à sessão
+ESPERA_PRIMEIRA_MENSAGEM = 5  # TCP: prazo para uma conexão nova dizer se é jogador ou espectador
+TAM_LEITURA = 4096
+
+
+class EnvioUDP:
+    """Adapta um transporte asyncio à interface sendto() usada por CanalConfiavel.
+
+    O envio é sempre agendado no loop, então pode ser chamado de qualquer thread
+    (o SimuladorRede envia a partir de temporizadores).
+    """
+
+    def __init__(self, loop, transporte):
+        self.loop = loop
+        self.transporte = transporte
+
+    def sendto(self, dados, addr):
+        try:
+            self.loop.call_soon_threadsafe(self._enviar, dados, addr)
+        except RuntimeError:
+            pass  # loop já encerrado
+
+    def _enviar(self, dados, addr):
+        if not self.transporte.is_closing():  # temporizador do simulador após o fechamento
+            self.transporte.sendto(dados, addr)
+
+
+class EnvioContado:
+    """Repassa sendto() a outro transporte, somando os bytes de cada datagrama."""
+
+    def __init__(self, destino, metricas):
+        self.destino = destino
+        self.metricas = metricas
+
+    def sendto(self, dados, addr):
+        self.metricas.somar('bytes_enviados', len(dados), 'udp')
+        self.destino.sendto(dados, addr)
+
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def datagram_received(self, dados, addr):
+        self.conexao._datagrama(dados, addr)
+
+    def error_received(self, exc):
+        pass  # ICMP (ex.: porta inalcançável); a retransmissão trata a perda
+
+
+class ConexaoJogo:
+    """Conexão de rede de uma partida, atendida por um loop asyncio em segundo plano."""
+
+    def __init__(self, protocolo, modo, sock, addr, ao_notificar=None,
+                 formato=proto.FORMATO_BINARIO, confiavel=True, simulador=None, variante=None,
+                 metricas=None, nivel=None):
+        self.protocolo = protocolo
+        self.modo = modo
+        self.sock = sock
+        self.addr = addr
+        self.ao_notificar = ao_notificar
+        self.formato = formato  # passa a JSON se o oponente pedir no HELLO
+        self.confiavel = confiavel
+        self.simulador = simulador
+        self.variante = variante  # (tamanho, sequência); quem conecta adota a de quem hospeda
+        self.nivel = nivel        # partida rápida: vai no HELLO para o saguão do servidor dedicado
+        self.metricas = metricas or DESLIGADAS
+        self.eventos = queue.Queue()
+        self.conectado = False
+        self.oponente_addr = None
+        self.loop = None
+        self.thread = None
+        self.tarefa = None
+        self.escritor = None     # TCP: StreamWriter do oponente
+        self.transporte = None   # UDP: DatagramTransport
+        self.canal = None        # UDP: CanalConfiavel
+        self._hello_recebido = None
+        self._pendencias = None
+        self._jogadas_enviadas = {}  # seq -> instante do envio, até chegar o JOGADA_OK
+        self._antes_do_hello = []    # UDP: mensagens confiáveis que chegaram antes da resposta ao HELLO
+        self._ultimo_envio = 0.0     # instantes (relógio do loop) para o batimento
+        self._ultimo_recebimento = 0.0
+        self.sessao = None           # token da sessão, emitido por quem hospeda
+        self.suspensa = False
+        self._suspensa_desde = 0.0
+        self._encerrada = False
+        self.sessoes = sessoes.TabelaSessoes(capacidade=1)  # host: a sessão suspensa, com prazo
+        self.transmissao = None      # host: espectadores da partida
+
+    # --- API usada pela interface (qualquer thread) ---
+    def iniciar(self):
+        """Inicia a thread de rede e começa a hospedar ou conectar."""
+        self.loop = asyncio.new_event_loop()
+        self.tarefa = self.loop.create_task(self._principal())
+        self.thread = threading.Thread(target=self._rodar, daemon=True)
+        self.thread.start()
+
+    def enviar(self, dados):
+        """Agenda o envio de uma mensagem ao oponente."""
+        try:
+            self.loop.call_soon_threadsafe(self._enviar, dados)
+        except RuntimeError:
+            pass  # conexão já encerrada
+
+    def fechar(self, timeout=2):
+        """Encerra a conexão e espera a thread de rede terminar."""
+        if self.thread is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.tarefa.cancel)
+        except RuntimeError:
+            pass
+        self.thread.join(timeout=timeout)
+
+    # --- Internos (thread da rede) ---
+    def _rodar(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.tarefa)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self.escritor:
+                self.escritor.close()
+            if self.transporte:
+                self.transporte.close()
+            self.sock.close()
+            pendentes = asyncio.all_tasks(self.loop)
+            for tarefa in pendentes:
+                tarefa.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pendentes, return_exceptions=True))
+            self.loop.close()
+
+    def _emitir(self, tipo, conteudo=None):
+        self.eventos.put((tipo, conteudo))
+        if self.ao_notificar:
+            self.ao_notificar()
+
+    def _conectar(self, mensagem):
+        self.conectado = True
+        self._ultimo_recebimento = self.loop.time()
+        self.loop.create_task(self._batimentos())
+        self._emitir('conectado', mensagem)
+
+    def _desconectar(self, texto):
+        """Encerra a conexão de vez, avisando a interface uma única vez."""
+        if not self._encerrada:
+            self._encerrada = True
+            self.sessao = None
+            self._emitir('desconexao', texto)
+        self.tarefa.cancel()
+
+    def _conexao_perdida(self, texto):
+        """Sem sessão, a queda encerra a conexão; com sessão, suspende à espera da retomada."""
+        if self.sessao is None:
+            self._desconectar(texto)
+            return
+        if self.suspensa:
+            return
+        self.suspensa = True
+        self._suspensa_desde = self.loop.time()
+        if self.modo == 'h':
+            self.sessoes.suspender(self.sessao, self._suspensa_desde)
+            self.loop.call_later(self.sessoes.ttl + 0.05, self._expirar_sessao)
+            self._emitir('suspensa', "O oponente caiu; aguardando a reconexão...")
+        else:
+            self._emitir('suspensa', "Conexão perdida; reconectando...")
+            if self.protocolo == 'udp':
+                self.loop.create_task(self._retomar_udp())
+            # No TCP, _cliente_tcp abre a nova conexão quando a leitura termina
+
+    def _expirar_sessao(self):
+        if self.sessoes.expirar():
+            self._desconectar("O oponente não voltou a tempo.")
+
+    def _pedido_retomada(self, dados, addr=None):
+        """Host: o oponente voltou (no UDP, talvez de outro endereço) com o token da sessão."""
+        token = dados.get('sessao')
+        valido = token is not None and token == self.sessao
+        if valido and self.suspensa:
+            valido = self.sessoes.retomar(token) is not None
+        if not valido:
+            recusa = proto.codificar({'msg': 'SESSAO', 'sessao': None}, self.formato)
+            if self.protocolo == 'tcp':
+                self.escritor.write(recusa)
+                self.escritor.close()  # a sessão continua esperando o oponente certo
+            else:
+                self.canal.enviar_direto(recusa, addr)
+            return
+        if addr is not None and addr != self.oponente_addr:
+            # NAT trocou a porta do oponente: o token prova que é ele
+            self.oponente_addr = addr
+            self.canal.redirecionar(addr)
+        self.suspensa = False
+        self._ultimo_recebimento = self.loop.time()
+        self._enviar({'msg': 'SESSAO', 'sessao': token})
+        self._emitir('retomada', "O oponente voltou!")
+
+    def _sessao_recebida(self, dados):
+        """Quem conectou recebeu o token da sessão (ao conectar ou em resposta a um RETOMAR)."""
+        token = dados.get('sessao')
+        if token is None:
+            self._desconectar("A sessão expirou; não foi possível retomar a partida.")
+        elif self.suspensa:
+            if token == self.sessao:
+                self.suspensa = False
+                self._ultimo_recebimento = self.loop.time()
+                self._emitir('retomada', "Conexão retomada!")
+        else:
+            self.sessao = token
+
+    async def _batimentos(self):
+        """Mantém a sessão viva entre partidas e detecta oponentes que sumiram sem avisar."""
+        while True:
+            agora = self.loop.time()
+            if self.suspensa:
+                await asyncio.sleep(INTERVALO_BATIMENTO)
+                continue
+            if agora - self._ultimo_recebimento > TIMEOUT_BATIMENTO:
+                if self.protocolo == 'tcp' and self.escritor:
+                    self.escritor.close()  # a leitura termina; a nova conexão substitui esta
+                self._conexao_perdida("O oponente parou de responder.")
+                if self._encerrada:
+                    return
+                continue
+            if agora - self._ultimo_envio >= INTERVALO_BATIMENTO:
+                self._enviar({'msg': 'BATIMENTO'})
+            proximo = min(self._ultimo_envio + INTERVALO_BATIMENTO,
+                          self._ultimo_recebimento + TIMEOUT_BATIMENTO + 0.01)
+            await asyncio.sleep(max(0.0, proximo - self.loop.time()))
+
+    def _texto_conectado(self):
+        return "Assistindo à partida!" if self.modo == 'e' else "Conectado ao servidor!"
+
+    def _hello(self):
+        hello = {'msg': 'HELLO', 'formato': self.formato}
+        if self.variante:
+            hello['tamanho'], hello['sequencia'] = self.variante
+            if self.nivel is not None:
+                hello['nivel'] = self.nivel
+        return hello
+
+    def _negociar(self, dados):
+        if dados.get('formato') == proto.FORMATO_JSON:
+            self.formato = proto.FORMATO_JSON
+        if self.modo != 'h' and 'tamanho' in dados:
+            variante = (dados['tamanho'], dados['sequencia'])
+            if variante != self.variante:
+                self.variante = variante
+                self._emitir('variante', variante)
+
+    async def _principal(self):
+        self._hello_recebido = asyncio.Event()
+        self._pendencias = asyncio.Event()
+        if self.modo == 'h':
+            self.transmissao = transmissao.Transmissao(self.variante, self.metricas)
+        try:
+            if self.protocolo == 'tcp':
+                if self.modo == 'h':
+                    await self._servidor_tcp()
+                else:
+                    await self._cliente_tcp()
+            else:
+                if self.modo == 'h':
+                    await self._servidor_udp()
+                else:
+                    await self._cliente_udp()
+        except ConnectionRefusedError:
+            self._emitir('erro', "Conexão recusada pelo servidor.")
+        except OSError as e:
+            self._emitir('erro', f"Erro de rede: {e}")
+
+    def _enviar(self, dados):
+        try:
+            quadro = proto.codificar(dados, self.formato)
+            if self.protocolo == 'tcp':
+                if self.escritor and not self.escritor.is_closing():
+                    self.escritor.write(quadro)
+                    self.metricas.somar('bytes_enviados', len(quadro), 'tcp')
+            elif self.oponente_addr and self.canal:
+                # Confirmações de jogada e batimentos: perdidos, não fazem falta; o RETOMAR é
+                # repetido até a resposta chegar
+                if (self.confiavel and self.modo != 'e'
+                        and dados.get('msg') not in ('HELLO', 'JOGADA_OK', 'BATIMENTO', 'RETOMAR')):
+                    self.canal.enviar(quadro, self.oponente_addr)
+                    self._pendencias.set()
+                else:
+                    self.canal.enviar_direto(quadro, self.oponente_addr)
+            if self.transmissao is not None:
+                self.transmissao.observar('local', dados, quadro)
+            self._ultimo_envio = self.loop.time()
+            if self.metricas.ativo:
+                self.metricas.somar('mensagens_enviadas', 1, self.protocolo)
+                if 'jogada' in dados:
+                    self._jogadas_enviadas[dados['seq']] = self.loop.time()
+        except Exception:
+            self.metricas.somar('erros_envio', 1, self.protocolo)
+
+    def _receber(self, dados, quadro=None):
+        self.metricas.somar('mensagens_recebidas', 1, self.protocolo)
+        if self.suspensa and self.modo == 'h' and dados.get('msg') != 'RETOMAR':
+            pass  # conexão nova que ainda não provou ser do oponente: nem o HELLO vale
+        elif dados.get('msg') == 'HELLO':
+            self._negociar(dados)
+        elif dados.get('msg') == 'JOGADA_OK':
+            enviada_em = self._jogadas_enviadas.pop(dados['seq'], None)
+            if enviada_em is not None:
+                self.metricas.observar('rtt_jogada_segundos', self.loop.time() - enviada_em)
+        elif dados.get('msg') == 'DESCONEXAO':
+            self._desconectar("O oponente saiu da partida.")
+        elif dados.get('msg') == 'BATIMENTO':
+            pass  # só renova _ultimo_recebimento
+        elif dados.get('msg') == 'SESSAO':
+            if self.modo != 'h':
+                self._sessao_recebida(dados)
+        elif dados.get('msg') == 'RETOMAR':
+            if self.modo == 'h':
+                self._pedido_retomada(dados)
+        else:
+            if 'jogada' in dados and self.modo != 'e':
+                self._enviar({'msg': 'JOGADA_OK', 'seq': dados['seq']})
+            if self.transmissao is not None:
+                self.transmissao.observar('oponente', dados, quadro)
+            self._emitir('mensagem', dados)
+
+    # --- TCP ---
+    async def _servidor_tcp(self):
+        self._emitir('status', "Aguardando oponente...")
+        self.sock.bind(self.addr)
+        self.sock.listen(1)
+        self.sock.setblocking(False)
+
+        async def ao_conectar(leitor, escritor):
+            quadros = proto.LeitorQuadros()
+            try:
+                primeiro = await asyncio.wait_for(self._primeiro_quadro(leitor, quadros),
+                                                  ESPERA_PRIMEIRA_MENSAGEM)
+                dados = proto.decodificar(primeiro) if primeiro is not None else None
+                if dados is not None and dados.get('msg') == 'ASSISTIR':
+                    await self._espectador_tcp(leitor, escritor, quadros)
+                    return
+            except (asyncio.TimeoutError, ConnectionError, proto.ErroProtocolo):
+                dados = None
+            except asyncio.CancelledError:
+                return  # fechar() com espectadores ou conexões ainda sem a primeira mensagem
+            if dados is None or (self.escritor is not None and not self.suspensa):
+                escritor.close()  # só um oponente por vez; suspensa, vale quem tiver o token
+                return
+            try:
+                await self._sessao_tcp(leitor, escritor, "Oponente conectado!", quadros, primeiro)
+            except asyncio.CancelledError:
+                return  # fechar() durante a sessão; sem isso o asyncio 3.11 registra o cancelamento como erro
+            if escritor is self.escritor:
+                self._conexao_perdida("Conexão perdida com o oponente.")
+
+        # A escuta continua aberta durante a sessão: é por ela que o oponente volta
+        servidor = await asyncio.start_server(ao_conectar, sock=self.sock)
+        async with servidor:
+            await servidor.serve_forever()
+
+    async def _cliente_tcp(self):
+        self._emitir('status', f"Conectando a {self.addr[0]}:{self.addr[1]}...")
+        self.sock.setblocking(False)
+        await self.loop.sock_connect(self.sock, self.addr)
+        leitor, escritor = await asyncio.open_connection(sock=self.sock)
+        await self._sessao_tcp(leitor, escritor, self._texto_conectado())
+        while True:
+            self._conexao_perdida("Conexão perdida com o oponente.")
+            leitor, escritor = await self._reconectar_tcp()
+            if leitor is None:
+                self._desconectar("Não foi possível retomar a partida.")
+                return
+            await self._sessao_tcp(leitor, escritor)
+
+    async def _reconectar_tcp(self):
+        """Abre uma nova conexão com quem hospeda, até o fim da janela de retomada."""
+        limite = self._suspensa_desde + sessoes.JANELA_RETOMADA
+        while self.loop.time() < limite:
+            await asyncio.sleep(INTERVALO_RETOMADA)
+            sock = socket.socket(self.sock.family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(self.loop.sock_connect(sock, self.addr), INTERVALO_RETOMADA * 4)
+                return await asyncio.open_connection(sock=sock)
+            except (OSError, asyncio.TimeoutError):
+                sock.close()
+        return None, None
+
+    async def _sessao_tcp(self, leitor, escritor, mensagem=None, quadros=None, primeiro=None):
+        """Atende uma conexão até ela cair. Sem `mensagem`, é a retomada de uma sessão.
+
+        `quadros` e `primeiro` trazem o que quem hospeda já leu da conexão para
+        saber se era de um jogador.
+        """
+        if self.escritor:
+            self.escritor.close()
+        self.escritor = escritor
+        # Mensagens pequenas em sequência (JOGADA_OK e a jogada seguinte) não podem
+        # esperar pelo ACK atrasado do outro lado (algoritmo de Nagle)
+        escritor.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.modo == 'h':
+            if self.sessao is None:
+                self.sessao = sessoes.novo_token()
+                self._conectar(mensagem)
+            self._enviar(self._hello())
+            if not self.suspensa:
+                self._enviar({'msg': 'SESSAO', 'sessao': self.sessao})
+            # Suspensa: a conexão só assume a sessão quando chegar o RETOMAR com o token
+        else:
+            if self.suspensa:
+                # O RETOMAR vai antes do HELLO: o servidor dedicado decide pela primeira
+                # mensagem se a conexão é de um jogador novo ou de quem está voltando
+                self._enviar({'msg': 'RETOMAR', 'sessao': self.sessao})
+            else:
+                self._conectar(mensagem)
+            self._enviar(self._hello() if self.modo == 'c' else {'msg': 'ASSISTIR'})
+        quadros = quadros or proto.LeitorQuadros()
+        quadro = primeiro
+        try:
+            while True:
+                while quadro is not None:
+                    try:
+                        mensagem = proto.decodificar(quadro)
+                    except proto.ErroProtocolo:
+                        # O quadro veio inteiro, só o corpo é inválido: descarta ele e segue
+                        self.metricas.somar('erros_recepcao', 1, 'tcp')
+                    else:
+                        self._receber(mensagem, quadro)
+                    quadro = quadros.proximo()
+                dados = await leitor.read(TAM_LEITURA)
+                if not dados:
+                    break
+                self._ultimo_recebimento = self.loop.time()
+                self.metricas.somar('bytes_recebidos', len(dados), 'tcp')
+                quadros.alimentar(dados)
+                quadro = quadros.proximo()
+        except (ConnectionError, proto.ErroProtocolo):
+            self.metricas.somar('erros_recepcao', 1, 'tcp')
+
+    async def _primeiro_quadro(self, leitor, quadros):
+        """Lê até completar o primeiro quadro de uma conexão nova (None se ela fechar antes)."""
+        quadro = quadros.proximo()
+        while quadro is None:
+            dados = await leitor.read(TAM_LEITURA)
+            if not dados:
+                return None
+            self.metricas.somar('bytes_recebidos', len(dados), 'tcp')
+            quadros.alimentar(dados)
+            quadro = quadros.proximo()
+        return quadro
+
+    async def _espectador_tcp(self, leitor, escritor, quadros):
+        """Host: atende um espectador até ele sair. Dele, só interessa o RESYNC."""
+        escritor.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if not self.transmissao.assinar_tcp(escritor, proto.codificar(self._hello())):
+            escritor.close()
+            return
+        try:
+            while True:
+                quadro = quadros.proximo()
+                while quadro is not None:
+                    if proto.decodificar(quadro).get('msg') == 'RESYNC':
+                        self.transmissao.retrato_tcp(escritor)
+                    quadro = quadros.proximo()
+                dados = await leitor.read(TAM_LEITURA)
+                if not dados:
+                    break
+                quadros.alimentar(dados)
+        except (ConnectionError, proto.ErroProtocolo):
+            pass
+        finally:
+            self.transmissao.cancelar_tcp(escritor)
+            escritor.close()
+
+    # --- UDP ---
+    async def _abrir_udp(self):
+        self.transporte, _ = await self.loop.create_datagram_endpoint(
+            lambda: _ProtocoloUDP(self), sock=self.sock)
+        envio = EnvioUDP(self.loop, self.transporte)
+        if self.metricas.ativo:
+            envio = EnvioContado(envio, self.metricas)
+        self.canal = udp_confiavel.CanalConfiavel(envio, self.simulador)
+        if self.transmissao is not None:
+            self.transmissao.envio_udp = transmissao.EnvioEmLote(self.sock)
+
+    async def _servidor_udp(self):
+        self._emitir('status', "Aguardando oponente...")
+        self.sock.bind(self.addr)
+        await self._abrir_udp()
+        await self._retransmissoes()
+
+    async def _cliente_udp(self):
+        self._emitir('status', f"Conectando a {self.addr[0]}:{self.addr[1]}...")
+        await self._abrir_udp()
+        self.oponente_addr = self.addr
+        inicio = self.loop.time()
+        while not self.conectado:
+            if self.loop.time() - inicio >= TIMEOUT_HELLO_UDP:
+                self._emitir('erro', "Não foi possível conectar ao servidor UDP.")
+                return
+            self._enviar(self._hello() if self.modo == 'c' else {'msg': 'ASSISTIR'})
+            try:
+                await asyncio.wait_for(self._hello_recebido.wait(), INTERVALO_HELLO_UDP)
+            except asyncio.TimeoutError:
+                pass
+        await self._retransmissoes()
+
+    def _datagrama(self, dados, addr):
+        self.metricas.somar('bytes_recebidos', len(dados), 'udp')
+        try:
+            if self.modo == 'h' and addr != self.oponente_addr and proto.abrir_envelope(dados)[0]:
+                # Reenvio atrasado de um cliente anterior (o host reabre na mesma porta):
+                # confirmá-lo marcaria a seq como recebida e descartaria a do novo oponente
+                return
+            if self.modo != 'h' or addr == self.oponente_addr:
+                self._ultimo_recebimento = self.loop.time()
+            quadro = self.canal.processar(dados, addr)
+            if quadro is None:
+                return
+            mensagem = proto.decodificar(quadro)
+        except proto.ErroProtocolo:
+            self.metricas.somar('erros_recepcao', 1, 'udp')
+            return
+
+        if mensagem.get('msg') == 'RETOMAR':
+            self.metricas.somar('mensagens_recebidas', 1, 'udp')
+            if self.modo == 'h':
+                self._pedido_retomada(mensagem, addr)
+            return
+        if self.modo == 'h' and addr != self.oponente_addr and mensagem.get('msg') != 'HELLO':
+            # Só um RETOMAR com o token muda o endereço do oponente; o resto é de espectadores
+            self.transmissao.mensagem_udp(mensagem, addr, proto.codificar(self._hello()))
+            return
+        if mensagem.get('msg') == 'HELLO':
+            self.metricas.somar('mensagens_recebidas', 1, 'udp')
+            if self.modo == 'h':
+                if self.oponente_addr and addr != self.oponente_addr:
+                    return  # já há um oponente; sem resposta, o outro desiste por timeout
+                self._negociar(mensagem)
+                # Responde todo HELLO: a resposta anterior pode ter se perdido
+                self.oponente_addr = self.oponente_addr or addr
+                self.canal.enviar_direto(proto.codificar(self._hello()), addr)
+                self.metricas.somar('mensagens_enviadas', 1, 'udp')
+                if not self.conectado:
+                    self.sessao = sessoes.novo_token()
+                    self._conectar("Oponente conectado!")
+                    self._enviar({'msg': 'SESSAO', 'sessao': self.sessao})
+            else:
+                if not self.conectado:
+                    self._hello_recebido.set()
+                    self._conectar(self._texto_conectado())
+                self._negociar(mensagem)  # depois de 'conectado', como no TCP
+                antes, self._antes_do_hello = self._antes_do_hello, []
+                for anterior in antes:
+                    self._receber(anterior)
+            return
+        if not self.conectado:
+            # Se a resposta ao HELLO se perdeu, a primeira jogada (ou a PARTIDA do
+            # servidor) pode chegar antes dela; já foi confirmada, então não volta
+            if self.modo != 'h':
+                self._antes_do_hello.append(mensagem)
+            return
+        self._receber(mensagem, quadro)
+
+    async def _retransmissoes(self):
+        """Reenvia envelopes do UDP confiável quando os prazos vencem, sem polling."""
+        while True:
+            prazo = self.canal.proximo_prazo()
+            if prazo is None:
+                self._pendencias.clear()
+                await self._pendencias.wait()
+                continue
+            await asyncio.sleep(prazo)
+            if self.canal.retransmitir():
+                self._conexao_perdida("Oponente não confirmou mensagens; conexão perdida.")
+                if self._encerrada:
+                    return
+
+    async def _retomar_udp(self):
+        """Repete o RETOMAR até quem hospeda responder com a sessão ou a janela acabar.
+
+        Sai do mesmo socket: se um NAT trocou nossa porta, quem hospeda reconhece
+        o token e passa a usar o endereço novo.
+        """
+        limite = self._suspensa_desde + sessoes.JANELA_RETOMADA
+        while self.suspensa:
+            if self.loop.time() >= limite:
+                self._desconectar("Não foi possível retomar a partida.")
+                return
+            self._enviar({'msg': 'RETOMAR', 'sessao': self.sessao})
+            await asyncio.sleep(INTERVALO_RETOMADA)
@@ -0,0 +1,197 @@
+"""Saguão do servidor dedicado: filas de espera por variante, pareadas por nível.
+
+Cada variante (tamanho do tabuleiro, sequência de vitória e protocolo) tem a
+sua FilaNivelada, que separa os jogadores em faixas de LARGURA_FAIXA pontos de
+nível: um dicionário faixa -> OrderedDict dos jogadores da faixa, em ordem de
+chegada, mais a lista ordenada das faixas ocupadas. Quem chega acha com bisect
+a faixa ocupada mais próxima da sua, dentro da tolerância, e leva o mais
+antigo dela: O(log F) para F faixas ocupadas, sem percorrer quem espera.
+Entrar e sair da fila é O(1), mais a inserção na lista quando a faixa deixa de
+estar vazia (F nunca passa de NIVEL_MAXIMO // LARGURA_FAIXA).
+
+A tolerância começa em TOLERANCIA_INICIAL pontos e cresce ALARGAMENTO pontos
+por segundo de espera. A varredura periódica (Saguao.varrer) tenta de novo só
+o mais antigo de cada faixa, que é quem tem a maior tolerância dela.
+
+O nível é um Elo: o cliente informa o seu no HELLO (não há contas; o servidor
+confia nele) e recebe o novo ao fim de cada partida (novos_niveis).
+"""
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from metricas import DESLIGADAS
+
+NIVEL_INICIAL = 1200
+NIVEL_MAXIMO = 0xFFFF      # vai em 2 bytes no HELLO
+LARGURA_FAIXA = 50         # pontos de nível por faixa do índice
+TOLERANCIA_INICIAL = 100   # diferença de nível aceita logo ao chegar
+ALARGAMENTO = 50           # pontos a mais de tolerância por segundo de espera
+FATOR_ELO = 32
+
+
+def novos_niveis(nivel_a, nivel_b, pontos_a):
+    """Elo: os níveis de `a` e `b` depois de uma partida em que `a` fez `pontos_a` (1, 0,5 ou 0)."""
+    esperado = 1 / (1 + 10 ** ((nivel_b - nivel_a) / 400))
+    ajuste = round(FATOR_ELO * (pontos_a - esperado))
+    return (min(max(nivel_a + ajuste, 0), NIVEL_MAXIMO),
+            min(max(nivel_b - ajuste, 0), NIVEL_MAXIMO))
+
+
+class FilaNivelada:
+    """Jogadores à espera de uma variante, indexados por faixa de nível."""
+
+    __slots__ = ('largura', 'faixas', 'ocupadas', 'posicao')
+
+    def __init__(self, largura=LARGURA_FAIXA):
+        self.largura = largura
+        self.faixas = {}    # faixa -> OrderedDict(jogador -> (nível, chegada)), em ordem de chegada
+        self.ocupadas = []  # faixas não vazias, em ordem crescente
+        self.posicao = {}   # jogador -> faixa
+
+    def __len__(self):
+        return len(self.posicao)
+
+    def __contains__(self, jogador):
+        return jogador in self.posicao
+
+    def entrar(self, jogador, nivel, chegada):
+        faixa = nivel // self.largura
+        fila = self.faixas.get(faixa)
+        if fila is None:
+            fila = self.faixas[faixa] = OrderedDict()
+            insort(self.ocupadas, faixa)
+        fila[jogador] = (nivel, chegada)
+        self.posicao[jogador] = faixa
+
+    def sair(self, jogador):
+        """Tira o jogador da fila; retorna (nível, chegada), ou None se ele não estava nela."""
+        faixa = self.posicao.pop(jogador, None)
+        if faixa is None:
+            return None
+        fila = self.faixas[faixa]
+        dados = fila.pop(jogador)
+        if not fila:
+            del self.faixas[faixa]
+            del self.ocupadas[bisect_left(self.ocupadas, faixa)]
+        return dados
+
+    def procurar(self, nivel, tolerancia, ignorar=None):
+        """O mais antigo da faixa ocupada mais próxima de `nivel`, a até `tolerancia` pontos
+        (contados em faixas inteiras); None se não há ninguém. Não tira ninguém da fila."""
+        centro = nivel // self.largura
+        minima = (nivel - tolerancia) // self.largura
+        maxima = (nivel + tolerancia) // self.largura
+        ocupadas = self.ocupadas
+        direita = bisect_left(ocupadas, centro)
+        esquerda = direita - 1
+        while True:
+            acima = ocupadas[direita] if direita < len(ocupadas) and ocupadas[direita] <= maxima else None
+            abaixo = ocupadas[esquerda] if esquerda >= 0 and ocupadas[esquerda] >= minima else None
+            if acima is None and abaixo is None:
+                return None
+            if abaixo is None or (acima is not None and acima - centro <= centro - abaixo):
+                faixa, direita = acima, direita + 1
+            else:
+                faixa, esquerda = abaixo, esquerda - 1
+            for jogador in self.faixas[faixa]:
+                if jogador is not ignorar:
+                    return jogador
+
+    def mais_antigos(self):
+        """(jogador, nível, chegada) do primeiro de cada faixa, do que chegou antes ao último."""
+        primeiros = []
+        for fila in self.faixas.values():
+            jogador = next(iter(fila))
+            primeiros.append((jogador,) + fila[jogador])
+        primeiros.sort(key=lambda primeiro: primeiro[2])
+        return primeiros
+
+
+class Saguao:
+    """As filas de todas as variantes; pareia quem chega e, na varredura, quem espera há mais tempo.
+
+    Registra em `metricas` quanto cada jogador esperou até ser pareado
+    (espera_fila_segundos) e quanto cada chegada levou para ser atendida
+    (pareamento_segundos).
+    """
+
+    def __init__(self, metricas=None, largura=LARGURA_FAIXA, tolerancia=TOLERANCIA_INICIAL,
+                 alargamento=ALARGAMENTO):
+        self.metricas = metricas or DESLIGADAS
+        self.largura = largura
+        self.tolerancia_inicial = tolerancia
+        self.alargamento = alargamento
+        self.filas = {}  # variante -> FilaNivelada (continua lá vazia: a profundidade vai a 0)
+        self.onde = {}   # jogador -> variante
+
+    def __len__(self):
+        return len(self.onde)
+
+    def __contains__(self, jogador):
+        return jogador in self.onde
+
+    def chegada(self, jogador):
+        """Instante em que o jogador entrou na fila, ou None se ele não está esperando."""
+        variante = self.onde.get(jogador)
+        if variante is None:
+            return None
+        fila = self.filas[variante]
+        return fila.faixas[fila.posicao[jogador]][jogador][1]
+
+    def tolerancia(self, espera):
+        return self.tolerancia_inicial + self.alargamento * espera
+
+    def entrar(self, jogador, variante, nivel, agora=None):
+        """Pareia o jogador com alguém da fila da variante, ou o deixa esperando nela.
+
+        Retorna o oponente, já fora da fila, ou None.
+        """
+        inicio = time.perf_counter()
+        agora = time.monotonic() if agora is None else agora
+        fila = self.filas.get(variante)
+        if fila is None:
+            fila = self.filas[variante] = FilaNivelada(self.largura)
+        oponente = fila.procurar(nivel, self.tolerancia_inicial)
+        if oponente is None:
+            fila.entrar(jogador, nivel, agora)
+            self.onde[jogador] = variante
+        else:
+            self.sair(oponente, pareado=True, agora=agora)
+            self.metricas.observar('espera_fila_segundos', 0.0)
+        self.metricas.observar('pareamento_segundos', time.perf_counter() - inicio)
+        return oponente
+
+    def sair(self, jogador, pareado=False, agora=None):
+        """Tira o jogador da fila (`pareado`: foi para uma partida, e a espera dele é registrada).
+        Retorna False se ele não estava esperando."""
+        variante = self.onde.pop(jogador, None)
+        if variante is None:
+            return False
+        _, chegada = self.filas[variante].sair(jogador)
+        if pareado:
+            agora = time.monotonic() if agora is None else agora
+            self.metricas.observar('espera_fila_segundos', agora - chegada)
+        return True
+
+    def varrer(self, agora=None):
+        """Tenta de novo, com a tolerância já alargada pela espera, o mais antigo de cada faixa.
+
+        Retorna os pares (jogador, oponente) formados, já fora das filas.
+        """
+        agora = time.monotonic() if agora is None else agora
+        pares = []
+        for fila in self.filas.values():
+            for jogador, nivel, chegada in fila.mais_antigos():
+                if jogador not in fila:
+                    continue  # já foi pareado nesta varredura
+                oponente = fila.procurar(nivel, self.tolerancia(agora - chegada), ignorar=jogador)
+                if oponente is not None:
+                    self.sair(jogador, pareado=True, agora=agora)
+                    self.sair(oponente, pareado=True, agora=agora)
+                    pares.append((jogador, oponente))
+        return pares
+
+    def profundidades(self):
+        """Quantos esperam em cada variante."""
+        return {variante: len(fila) for variante, fila in self.filas.items()}
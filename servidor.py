@@ -0,0 +1,1174 @@
+"""Servidor dedicado do Jogo da Velha: hospeda muitas partidas, sem interface gráfica.
+
+Uso: python servidor.py [--host 0.0.0.0] [--porta 5555] [--processos N] [--relatorio SEGUNDOS]
+                        [--tamanho N --sequencia K] [--bot-apos SEGUNDOS]
+                        [--metricas-porta PORTA] [--sem-metricas]
+                        [--janela-retomada SEGUNDOS] [--max-suspensas N] [--diario ARQUIVO]
+                        [--variantes N,K ...]
+
+Atende TCP e UDP na mesma porta, com o protocolo de protocolo.py. Os jogadores
+usam o modo "Conectar" normal do jogo ou a "Partida rápida"; o servidor os
+coloca no saguão (saguao.py), numa fila por variante (tamanho do tabuleiro,
+sequência de vitória) e protocolo, e pareia quem tem nível próximo: a partida
+rápida manda no HELLO a variante que quer (uma das de --variantes) e o nível,
+e recebe {'msg': 'NIVEL', 'nivel': n} ao fim de cada partida; o "Conectar"
+entra na variante padrão (--tamanho, --sequencia) com o nível inicial. Cada
+um é avisado do seu símbolo e da variante com {'msg': 'PARTIDA', 'jogador':
+..., 'tamanho': n, 'sequencia': k}, e o servidor roda a lógica autoritativa
+da partida: cada jogada é validada antes de ser repassada ao oponente, e
+jogadas rejeitadas recebem de volta o estado oficial.
+Se um jogador sai no meio da partida, o outro recebe {'msg': 'DESCONEXAO'}.
+Terminada a partida, o par continua conectado: quando os dois pedem
+{'msg': 'REVANCHE', 'partida': n}, o servidor começa a partida n (quem faz a
+primeira jogada alterna) e responde o mesmo pedido aos dois. Os BATIMENTOs dos
+clientes voltam como eco; quem fica TEMPO_OCIOSO segundos sem mandar nada é
+desconectado, e o oponente avisado.
+Cada jogador recebe ao entrar um token de sessão ({'msg': 'SESSAO'}). Se a
+conexão dele cai no meio da sessão, o lugar fica guardado numa TabelaSessoes
+(sessoes.py) por --janela-retomada segundos e o oponente recebe
+{'msg': 'OPONENTE_CAIU'}; quem volta com {'msg': 'RETOMAR', 'sessao': token}
+(numa conexão TCP nova, ou no UDP de um endereço novo) recebe o número da
+partida e o estado atual, e o oponente {'msg': 'OPONENTE_VOLTOU'}. Sessões que
+vencem, ou que não cabem na tabela (--max-suspensas), contam como abandono.
+Com --bot-apos S, quem espera S segundos sem oponente joga contra o
+computador (ia.py).
+
+Com --processos N, N processos trabalhadores abrem a mesma porta com
+SO_REUSEPORT e o kernel distribui entre eles as conexões TCP e os endereços
+UDP (sempre o mesmo processo para o mesmo cliente). Cada processo pareia
+primeiro os seus clientes; quem espera ESPERA_ENTRE_PROCESSOS segundos é
+anunciado ao processo pai, que, além de somar as estatísticas dos
+trabalhadores, tem um saguão com os anunciados de todos e pareia entre
+processos (com pouca gente conectada, dois jogadores podem cair em processos
+diferentes). A partida roda no processo de um deles; o outro só repassa as
+mensagens do seu cliente (ClienteRemoto).
+
+As métricas (metricas.py: bytes e mensagens por protocolo, erros, ida e volta
+de cada jogada entre o servidor e cada jogador, espera na fila do saguão e
+tempo de cada pareamento; o tamanho de cada fila vai nas estatísticas, como
+fila_NxN_K_protocolo) ficam disponíveis por HTTP com
+--metricas-porta: /metrics no formato texto do Prometheus e /metricas.json em
+JSON, somadas entre todos os processos.
+
+Com --diario ARQUIVO, toda partida vai para um diário binário (diario.py):
+início, cada jogada validada e o resultado, em registros de 16 bytes gravados
+em lote e sincronizados com o disco a cada segundo. Com --processos N, cada
+trabalhador grava o próprio arquivo (ARQUIVO.0, ARQUIVO.1...).
+"""
+import argparse
+import asyncio
+import heapq
+import http.server
+import itertools
+import multiprocessing
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+
+import diario
+import ia
+import metricas
+import protocolo as proto
+import saguao
+import sessoes
+import udp_confiavel
+from bitboard import TabuleiroBits
+from rede import EnvioUDP, EnvioContado
+
+TAM_LEITURA = 4096
+TEMPO_OCIOSO = 15           # segundos sem tráfego (nem batimento) até descartar um cliente
+INTERVALO_VARREDURA = 5
+ESPERA_PRIMEIRA_MENSAGEM = 0.5  # TCP: quem não manda nada ao conectar entra na fila depois disso
+INTERVALO_ESTATISTICAS = 1  # segundos entre envios de estatísticas de um trabalhador ao pai
+INTERVALO_PAREAMENTO = 1   # segundos entre as varreduras do saguão (tolerância de nível alargada)
+ESPERA_ENTRE_PROCESSOS = 1  # --processos: segundos na fila do trabalhador até o pai procurar em todos
+QUADRO_BATIMENTO = proto.codificar({'msg': 'BATIMENTO'})
+
+
+class Partida:
+    """Estado autoritativo de uma partida, compacto para manter milhares por processo."""
+
+    __slots__ = ('id', 'x', 'o', 'tabuleiro', 'turno', 'seq', 'numero', 'encerrada', 'registro')
+
+    def __init__(self, id_partida, cliente_x, cliente_o, variante=(3, 3), numero=1, seq=0):
+        self.id = id_partida
+        self.x = cliente_x
+        self.o = cliente_o
+        self.tabuleiro = TabuleiroBits(*variante)
+        self.numero = numero  # n-ésima partida deste par; a seq continua da anterior
+        self.turno = proto.quem_comeca(numero)
+        self.seq = seq
+        self.encerrada = False
+        self.registro = None  # número da partida no diário, se o servidor grava um
+
+    def jogar(self, indice, simbolo):
+        return self.tabuleiro.jogar(indice, simbolo)
+
+    def terminou(self):
+        return self.tabuleiro.terminou()
+
+    def estado(self):
+        """Snapshot completo, no formato de mensagem de ressincronização."""
+        return {'tabuleiro': self.tabuleiro.para_lista(), 'turno': self.turno, 'seq': self.seq}
+
+    def jogadores(self):
+        return (('X', self.x), ('O', self.o))
+
+    def oponente(self, cliente):
+        return self.o if cliente is self.x else self.x
+
+
+class Cliente:
+    """Um jogador conectado. As subclasses sabem enviar quadros pelo seu protocolo."""
+
+    __slots__ = ('servidor', 'formato', 'partida', 'simbolo', 'jogada_repassada', 'revanche',
+                 'ultimo_contato', 'sessao', 'variante', 'nivel', 'ranqueado', 'anuncio', 'remoto')
+    protocolo = None
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.formato = proto.FORMATO_BINARIO
+        self.partida = None
+        self.simbolo = None
+        self.jogada_repassada = None  # (seq, instante) da última jogada repassada, até o JOGADA_OK
+        self.revanche = 0             # número da partida que este cliente pediu, até começar
+        self.ultimo_contato = time.monotonic()
+        self.sessao = None            # token da sessão; None até o cliente ser registrado
+        self.variante = servidor.variante  # (tamanho, sequência) da fila em que entra
+        self.nivel = saguao.NIVEL_INICIAL
+        self.ranqueado = False        # informou o nível no HELLO: recebe o novo a cada partida
+        self.anuncio = None           # --processos: id com que o pai conhece este cliente na fila
+        self.remoto = None            # --processos: trabalhador onde roda a partida dele, se não é este
+
+    def enviar(self, dados):
+        try:
+            self.enviar_quadro(proto.codificar(dados, self.formato))
+            self.servidor.metricas.somar('mensagens_enviadas', 1, self.protocolo)
+        except Exception:
+            self.servidor.metricas.somar('erros_envio', 1, self.protocolo)
+
+    def enviar_batimento(self):
+        self.enviar_quadro(QUADRO_BATIMENTO)
+
+    def hello(self):
+        tamanho, sequencia = self.servidor.variante
+        return {'msg': 'HELLO', 'formato': self.formato, 'tamanho': tamanho, 'sequencia': sequencia}
+
+    def negociar_formato(self, dados):
+        if dados.get('formato') == proto.FORMATO_JSON:
+            self.formato = proto.FORMATO_JSON
+
+
+class ClienteTCP(Cliente):
+    __slots__ = ('escritor',)
+    protocolo = 'tcp'
+
+    def __init__(self, servidor, escritor):
+        super().__init__(servidor)
+        self.escritor = escritor
+
+    def enviar_quadro(self, quadro):
+        if not self.escritor.is_closing():
+            self.escritor.write(quadro)
+            self.servidor.metricas.somar('bytes_enviados', len(quadro), 'tcp')
+
+    def fechar(self):
+        self.servidor.clientes_tcp.discard(self)
+        self.escritor.close()
+
+
+class ClienteUDP(Cliente):
+    __slots__ = ('addr', 'canal')
+    protocolo = 'udp'
+
+    def __init__(self, servidor, addr, canal):
+        super().__init__(servidor)
+        self.addr = addr
+        self.canal = canal
+
+    def enviar_quadro(self, quadro):
+        self.canal.enviar(quadro, self.addr)
+        self.servidor.aguardar_ack(self)
+
+    def enviar_batimento(self):
+        self.canal.enviar_direto(QUADRO_BATIMENTO, self.addr)  # perdido, não faz falta
+
+    def fechar(self):
+        self.servidor.clientes_udp.pop(self.addr, None)
+        self.servidor.pendentes_udp.pop(self, None)
+
+
+class ClienteBot(Cliente):
+    """Oponente controlado pelo servidor para quem esperou demais por um adversário."""
+
+    __slots__ = ('motor',)
+
+    def __init__(self, servidor, variante):
+        super().__init__(servidor)
+        self.variante = tamanho, sequencia = variante
+        if tamanho <= ia.TAMANHO_RESOLVIDO:
+            self.motor = ia.obter_motor(tamanho, sequencia)  # árvore resolvida, compartilhada
+        else:
+            self.motor = ia.MotorIA(tamanho, sequencia, servidor.orcamento_bot)
+
+    def enviar(self, dados):
+        # Sem conexão: o bot só reage ao início de cada partida e às jogadas do oponente
+        if dados.get('msg') in ('PARTIDA', 'REVANCHE') or 'jogada' in dados:
+            self.servidor.agendar_jogada_bot(self)
+
+    def fechar(self):
+        pass
+
+
+class ClienteRemoto(Cliente):
+    """Oponente atendido por outro processo trabalhador (--processos), pareado pelo pai.
+
+    A partida roda aqui; as mensagens para o jogador vão pela caixa do processo
+    dele, que as envia pela conexão, e as que ele manda chegam pelo caminho inverso.
+    """
+
+    __slots__ = ('processo', 'id_remoto', 'protocolo')
+
+    def __init__(self, servidor, processo, id_remoto, dados):
+        super().__init__(servidor)
+        self.processo = processo
+        self.id_remoto = id_remoto
+        self.protocolo = dados['protocolo']
+        self.variante = dados['variante']
+        self.nivel = dados['nivel']
+        self.ranqueado = dados['ranqueado']
+        self.sessao = dados['sessao']
+
+    def enviar(self, dados):
+        self.servidor.caixas[self.processo].put(('enviar', self.id_remoto, dados))
+
+    def enviar_batimento(self):
+        pass  # o processo do jogador é quem responde os batimentos dele
+
+    def fechar(self):
+        if self.servidor.remotos.pop((self.processo, self.id_remoto), None) is not None:
+            self.servidor.caixas[self.processo].put(('fechar', self.id_remoto))
+
+
+class _ProtocoloUDPServidor(asyncio.DatagramProtocol):
+    def __init__(self, servidor):
+        self.servidor = servidor
+
+    def datagram_received(self, dados, addr):
+        self.servidor.datagrama(dados, addr)
+
+    def error_received(self, exc):
+        self.servidor.metricas.somar('erros_envio', 1, 'udp')
+
+
+class ServidorJogo:
+    """Aceita clientes TCP e UDP, pareia-os em partidas e arbitra as jogadas."""
+
+    def __init__(self, host, porta, simulador=None, reutilizar_porta=False, variante=(3, 3),
+                 espera_bot=0, orcamento_bot=0.2, medir=True,
+                 janela_retomada=sessoes.JANELA_RETOMADA, max_suspensas=10000, diario=None,
+                 variantes=(), indice=None, fila_pai=None, caixas=None):
+        self.host = host
+        self.porta = porta
+        self.variante = variante  # (tamanho do tabuleiro, sequência de vitória) de quem não escolhe
+        self.variantes = {variante, *variantes}  # as que a partida rápida pode pedir no HELLO
+        self.espera_bot = espera_bot        # segundos sem oponente até jogar contra o bot (0 desliga)
+        self.orcamento_bot = orcamento_bot  # tempo de busca por jogada do bot nos tabuleiros grandes
+        self.simulador = simulador
+        self.reutilizar_porta = reutilizar_porta
+        self.metricas = metricas.Metricas(ativo=medir)
+        self.diario = diario      # diario.DiarioPartidas, ou None para não gravar as partidas
+        self.saguao = saguao.Saguao(self.metricas)  # clientes aguardando oponente, por variante
+        self.partidas = {}        # partidas em andamento, por id
+        self.clientes_udp = {}    # addr -> ClienteUDP
+        self.clientes_tcp = set()
+        self.pendentes_udp = {}   # ClienteUDP -> instante (time.monotonic) do próximo reenvio
+        self._prazos_udp = []     # heap de (instante, ordem, cliente); entradas vencidas são puladas
+        self._ordem_udp = itertools.count()
+        self.por_sessao = {}      # token -> cliente, de todos os registrados (inclusive suspensos)
+        self.suspensas = sessoes.TabelaSessoes(max_suspensas, janela_retomada)
+        self.ids = itertools.count(1)
+        # --processos: as caixas de entrada de todos os trabalhadores (a deste é caixas[indice])
+        # e a fila para o pai, que pareia entre processos quem esperou ESPERA_ENTRE_PROCESSOS
+        self.indice = indice
+        self.fila_pai = fila_pai
+        self.caixas = caixas
+        self.ids_anuncio = itertools.count(1)
+        self.anunciados = {}  # id -> cliente anunciado ao pai, ainda na fila daqui
+        self.reservados = {}  # id -> cliente tirado da fila, à espera do oponente de outro processo
+        self.cedidos = {}     # id -> cliente daqui cuja partida roda em outro processo
+        self.remotos = {}     # (processo, id lá) -> ClienteRemoto das partidas que rodam aqui
+        self.estatisticas = {'clientes': 0, 'partidas_iniciadas': 0, 'partidas_encerradas': 0,
+                             'partidas_abandonadas': 0, 'jogadas': 0, 'jogadas_rejeitadas': 0,
+                             'partidas_com_bot': 0, 'jogadas_bot': 0, 'nos_bot': 0, 'tempo_bot': 0.0,
+                             'revanches': 0, 'clientes_inativos': 0, 'partidas_ranqueadas': 0,
+                             'sessoes_suspensas': 0, 'sessoes_retomadas': 0, 'sessoes_expiradas': 0,
+                             'partidas_entre_processos': 0}
+        self.servidor_tcp = None
+        self.transporte_udp = None
+        self.envio_udp = None
+        self._tem_pendentes = None
+        self._tarefas = []
+        self._tarefas_bot = set()
+
+    # --- Ciclo de vida ---
+    async def iniciar(self):
+        loop = asyncio.get_running_loop()
+        self._tem_pendentes = asyncio.Event()
+        if self.espera_bot:
+            for tamanho, sequencia in self.variantes:
+                if tamanho <= ia.TAMANHO_RESOLVIDO:
+                    ia.obter_motor(tamanho, sequencia)  # resolve a árvore do jogo já na partida do servidor
+        self.servidor_tcp = await asyncio.start_server(
+            self._conexao_tcp, self.host, self.porta, reuse_address=True,
+            reuse_port=self.reutilizar_porta or None, backlog=4096)
+        self.transporte_udp, _ = await loop.create_datagram_endpoint(
+            lambda: _ProtocoloUDPServidor(self), local_addr=(self.host, self.porta),
+            reuse_port=self.reutilizar_porta or None)
+        if self.simulador:
+            self.envio_udp = EnvioUDP(loop, self.transporte_udp)
+        else:
+            self.envio_udp = self.transporte_udp
+        if self.metricas.ativo:
+            self.envio_udp = EnvioContado(self.envio_udp, self.metricas)
+        self._tarefas = [loop.create_task(self._retransmissoes()),
+                         loop.create_task(self._varredura()),
+                         loop.create_task(self._parear_saguao())]
+        if self.diario:
+            self._tarefas.append(loop.create_task(self._sincronizar_diario()))
+        if self.caixas is not None:
+            threading.Thread(target=self._ouvir_processos, args=(loop,), daemon=True).start()
+
+    def fechar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        if self.servidor_tcp:
+            self.servidor_tcp.close()
+        if self.transporte_udp:
+            self.transporte_udp.close()
+
+    def instantaneo(self):
+        """Estatísticas acumuladas mais o estado atual, para relatório ou agregação."""
+        instantaneo = dict(self.estatisticas, partidas_ativas=len(self.partidas),
+                           aguardando=len(self.saguao), suspensas=len(self.suspensas))
+        for (tamanho, sequencia, protocolo), profundidade in self.saguao.profundidades().items():
+            instantaneo[f'fila_{tamanho}x{tamanho}_{sequencia}_{protocolo}'] = profundidade
+        return instantaneo
+
+    # --- Pareamento e partidas ---
+    def registrar(self, cliente, hello=None):
+        """Cliente novo: recebe o token da sessão e entra na fila.
+
+        Um HELLO com nível é a partida rápida: o cliente entra na fila da variante
+        que pediu (se o servidor a oferece) e é pareado por nível.
+        """
+        if cliente.sessao is not None or (cliente.protocolo == 'tcp' and cliente not in self.clientes_tcp):
+            return  # já registrado, voltou a uma sessão ou já foi embora
+        if hello and hello.get('msg') == 'HELLO' and isinstance(hello.get('nivel'), int):
+            cliente.nivel = min(max(hello['nivel'], 0), saguao.NIVEL_MAXIMO)
+            cliente.ranqueado = True
+            variante = (hello.get('tamanho'), hello.get('sequencia'))
+            if variante in self.variantes:
+                cliente.variante = variante
+        cliente.sessao = sessoes.novo_token()
+        self.por_sessao[cliente.sessao] = cliente
+        cliente.enviar({'msg': 'SESSAO', 'sessao': cliente.sessao})
+        self.entrar(cliente)
+
+    def entrar(self, cliente):
+        """Coloca o cliente na fila da variante e do protocolo dele; se há alguém de nível
+        próximo esperando, inicia a partida."""
+        self.estatisticas['clientes'] += 1
+        self._esperar(cliente)
+
+    def _esperar(self, cliente):
+        oponente = self.saguao.entrar(cliente, (*cliente.variante, cliente.protocolo), cliente.nivel)
+        if oponente is not None:
+            self._iniciar_partida(oponente, cliente)
+            return
+        loop = asyncio.get_running_loop()
+        if self.espera_bot:
+            loop.call_later(self.espera_bot, self._parear_com_bot, cliente)
+        if self.caixas is not None:
+            loop.call_later(ESPERA_ENTRE_PROCESSOS, self._anunciar, cliente)
+
+    def _parear_com_bot(self, cliente):
+        if self.saguao.sair(cliente, pareado=True):
+            self.estatisticas['partidas_com_bot'] += 1
+            self._iniciar_partida(cliente, ClienteBot(self, cliente.variante))
+
+    def agendar_jogada_bot(self, bot):
+        tarefa = asyncio.get_running_loop().create_task(self._jogada_bot(bot))
+        self._tarefas_bot.add(tarefa)
+        tarefa.add_done_callback(self._tarefas_bot.discard)
+
+    async def _jogada_bot(self, bot):
+        partida = bot.partida
+        if partida is None or partida.encerrada or partida.turno != bot.simbolo:
+            return
+        if partida.tabuleiro.n <= ia.TAMANHO_RESOLVIDO:
+            indice = bot.motor.escolher_jogada(partida.tabuleiro, bot.simbolo)
+        else:
+            # Busca com orçamento de tempo: roda fora do loop para não atrasar as outras partidas
+            indice = await asyncio.get_running_loop().run_in_executor(
+                None, bot.motor.escolher_jogada, partida.tabuleiro, bot.simbolo)
+            if partida.encerrada:
+                return
+        busca = bot.motor.ultima_busca
+        self.estatisticas['jogadas_bot'] += 1
+        self.estatisticas['nos_bot'] += busca['nos']
+        self.estatisticas['tempo_bot'] += busca['tempo']
+        self.receber(bot, {'jogada': indice, 'jogador': bot.simbolo, 'seq': partida.seq + 1})
+
+    def _nova_partida(self, cliente_x, cliente_o, variante, numero=1, seq=0):
+        partida = Partida(next(self.ids), cliente_x, cliente_o, variante, numero, seq)
+        self.partidas[partida.id] = partida
+        if self.diario:
+            partida.registro = self.diario.iniciar(*variante, numero)
+        return partida
+
+    def _iniciar_partida(self, cliente_x, cliente_o):
+        tamanho, sequencia = cliente_x.variante
+        partida = self._nova_partida(cliente_x, cliente_o, cliente_x.variante)
+        self.estatisticas['partidas_iniciadas'] += 1
+        for simbolo, cliente in partida.jogadores():
+            self._retirar_anuncio(cliente)
+            cliente.partida = partida
+            cliente.simbolo = simbolo
+            cliente.enviar({'msg': 'PARTIDA', 'jogador': simbolo, 'tamanho': tamanho, 'sequencia': sequencia})
+
+    def _encerrar_partida(self, partida, abandonada=False):
+        partida.encerrada = True
+        self.partidas.pop(partida.id, None)
+        if partida.registro is not None:
+            self.diario.terminar(partida.registro, partida.tabuleiro.vencedor(), abandonada)
+
+    def _revanche(self, cliente, numero):
+        """Registra um pedido de revanche; no UDP ele pode chegar antes da última jogada."""
+        partida = cliente.partida
+        if partida is None or numero != partida.numero + 1:
+            return  # pedido repetido ou atrasado
+        cliente.revanche = numero
+        self._talvez_revanche(partida)
+
+    def _talvez_revanche(self, partida):
+        """Começa a próxima partida do par se a atual acabou e os dois pediram (o bot sempre aceita)."""
+        numero = partida.numero + 1
+        if not partida.encerrada:
+            return
+        for _, jogador in partida.jogadores():
+            if jogador.partida is not partida:
+                return  # alguém já saiu
+            if jogador.revanche != numero and not isinstance(jogador, ClienteBot):
+                return
+        variante = (partida.tabuleiro.n, partida.tabuleiro.k)
+        nova = self._nova_partida(partida.x, partida.o, variante, numero, partida.seq)
+        self.estatisticas['partidas_iniciadas'] += 1
+        self.estatisticas['revanches'] += 1
+        for _, jogador in nova.jogadores():
+            jogador.partida = nova
+            jogador.revanche = 0
+            jogador.enviar({'msg': 'REVANCHE', 'partida': numero})
+
+    def sair(self, cliente):
+        """Remove o cliente da fila ou da partida, avisando o oponente se preciso."""
+        self.saguao.sair(cliente)
+        self._retirar_anuncio(cliente)
+        if cliente.sessao is not None and self.por_sessao.get(cliente.sessao) is cliente:
+            del self.por_sessao[cliente.sessao]
+            self.suspensas.descartar(cliente.sessao)
+        partida = cliente.partida
+        if partida is None:
+            return
+        cliente.partida = None
+        oponente = partida.oponente(cliente)
+        if not partida.encerrada:
+            self._encerrar_partida(partida, abandonada=True)
+            self.estatisticas['partidas_abandonadas'] += 1
+        elif oponente.partida is not partida:
+            return  # a sessão já tinha acabado para o oponente
+        oponente.enviar({'msg': 'DESCONEXAO'})
+
+    # --- Sessões suspensas e retomada ---
+    def _em_sessao(self, cliente):
+        partida = cliente.partida
+        return partida is not None and partida.oponente(cliente).partida is partida
+
+    def queda(self, cliente):
+        """A conexão caiu sem DESCONEXAO. No meio de uma sessão, guarda o lugar do jogador
+        e retorna True; senão, ele sai de vez e retorna False."""
+        if cliente.remoto is not None:
+            # A partida roda em outro processo: quem decide é ele
+            self.caixas[cliente.remoto].put(('caiu', self.indice, cliente.anuncio))
+            return True
+        if cliente.sessao is None or not self._em_sessao(cliente):
+            self.sair(cliente)
+            return False
+        if cliente.sessao in self.suspensas:
+            return True
+        self.estatisticas['sessoes_suspensas'] += 1
+        for _, descartado in self.suspensas.suspender(cliente.sessao, cliente):
+            self._abandonar(descartado)  # tabela cheia: a suspensa mais antiga perde a vez
+        cliente.partida.oponente(cliente).enviar({'msg': 'OPONENTE_CAIU'})
+        return True
+
+    def _abandonar(self, cliente):
+        """O jogador não voltou a tempo: a sessão acaba como se ele tivesse saído."""
+        self.estatisticas['sessoes_expiradas'] += 1
+        self.sair(cliente)
+        cliente.fechar()
+
+    def _retomar(self, cliente, token):
+        """Devolve a `cliente` o lugar da sessão `token`, com o número da partida e o estado.
+
+        No TCP, `cliente` é a conexão nova (ainda sem sessão) e assume o lugar da
+        antiga; no UDP é o próprio cliente da sessão, já no endereço novo.
+        """
+        antigo = self.por_sessao.get(token)
+        if antigo is not None and antigo.remoto is not None and (cliente is antigo or cliente.sessao is None):
+            self._retomar_remoto(cliente, antigo, token)
+            return
+        suspensa = token in self.suspensas
+        if (antigo is None or not self._em_sessao(antigo)
+                or (cliente is not antigo and cliente.sessao is not None)
+                or (suspensa and self.suspensas.retomar(token) is None)):
+            cliente.enviar({'msg': 'SESSAO', 'sessao': None})
+            if cliente.sessao is None:
+                cliente.fechar()  # conexão nova que não tinha o que retomar
+            return
+        if cliente is not antigo:
+            partida = antigo.partida
+            cliente.partida, cliente.simbolo, cliente.revanche = partida, antigo.simbolo, antigo.revanche
+            cliente.variante, cliente.nivel, cliente.ranqueado = antigo.variante, antigo.nivel, antigo.ranqueado
+            if partida.x is antigo:
+                partida.x = cliente
+            else:
+                partida.o = cliente
+            cliente.sessao = token
+            self.por_sessao[token] = cliente
+            antigo.partida = None
+            antigo.fechar()  # se a conexão antiga ainda parecia aberta, agora não
+        self.estatisticas['sessoes_retomadas'] += 1
+        partida = cliente.partida
+        cliente.enviar({'msg': 'SESSAO', 'sessao': token})
+        cliente.enviar({'msg': 'RETOMADA', 'partida': partida.numero})
+        cliente.enviar(partida.estado())
+        if suspensa:
+            partida.oponente(cliente).enviar({'msg': 'OPONENTE_VOLTOU'})
+
+    def receber(self, cliente, dados):
+        """Trata uma mensagem de jogo recebida de um cliente."""
+        if dados.get('msg') == 'HELLO':
+            cliente.negociar_formato(dados)
+        elif cliente.remoto is not None and dados.get('msg') != 'BATIMENTO':
+            self.caixas[cliente.remoto].put(('mensagem', self.indice, cliente.anuncio, dados))
+        elif dados.get('msg') == 'RESYNC':
+            if cliente.partida:
+                cliente.enviar(cliente.partida.estado())
+        elif dados.get('msg') == 'JOGADA_OK':
+            repassada = cliente.jogada_repassada
+            if repassada and repassada[0] == dados['seq']:
+                cliente.jogada_repassada = None
+                self.metricas.observar('rtt_jogada_segundos', time.perf_counter() - repassada[1])
+        elif 'jogada' in dados:
+            cliente.enviar({'msg': 'JOGADA_OK', 'seq': dados['seq']})
+            self._jogada(cliente, dados)
+        elif dados.get('msg') == 'REVANCHE':
+            self._revanche(cliente, dados['partida'])
+        elif dados.get('msg') == 'BATIMENTO':
+            cliente.enviar_batimento()  # eco: o cliente sabe que o servidor está vivo
+            self.metricas.somar('mensagens_enviadas', 1, cliente.protocolo)
+        elif dados.get('msg') == 'DESCONEXAO':
+            self.sair(cliente)
+            if cliente.protocolo == 'udp':
+                cliente.fechar()  # o TCP fecha sozinho quando o cliente encerra a conexão
+        elif dados.get('msg') == 'RETOMAR':
+            self._retomar(cliente, dados.get('sessao'))
+
+    def _jogada(self, cliente, dados):
+        partida = cliente.partida
+        if partida is None or partida.encerrada or dados['seq'] <= partida.seq:
+            return  # sem partida, partida acabada ou jogada repetida
+        valida = (dados['seq'] == partida.seq + 1
+                  and dados['jogador'] == cliente.simbolo == partida.turno
+                  and partida.jogar(dados['jogada'], cliente.simbolo))
+        if not valida:
+            self.estatisticas['jogadas_rejeitadas'] += 1
+            cliente.enviar(partida.estado())
+            return
+        self.estatisticas['jogadas'] += 1
+        partida.seq = dados['seq']
+        if partida.registro is not None:
+            self.diario.jogada(partida.registro, dados['jogada'], cliente.simbolo, partida.seq)
+        partida.turno = 'O' if cliente.simbolo == 'X' else 'X'
+        oponente = partida.oponente(cliente)
+        oponente.enviar(dados)
+        if self.metricas.ativo:
+            oponente.jogada_repassada = (dados['seq'], time.perf_counter())
+        if partida.terminou():
+            self._encerrar_partida(partida)
+            self.estatisticas['partidas_encerradas'] += 1
+            self._atualizar_niveis(partida)
+            self._talvez_revanche(partida)
+
+    def _atualizar_niveis(self, partida):
+        """Elo do fim da partida, enviado a quem entrou com nível (contra o bot não conta)."""
+        x, o = partida.x, partida.o
+        if not (x.ranqueado or o.ranqueado) or isinstance(x, ClienteBot) or isinstance(o, ClienteBot):
+            return
+        self.estatisticas['partidas_ranqueadas'] += 1
+        vencedor = partida.tabuleiro.vencedor()
+        pontos_x = 0.5 if vencedor is None else 1.0 if vencedor == 'X' else 0.0
+        for jogador, nivel in zip((x, o), saguao.novos_niveis(x.nivel, o.nivel, pontos_x)):
+            jogador.nivel = nivel
+            if jogador.ranqueado:
+                jogador.enviar({'msg': 'NIVEL', 'nivel': nivel})
+
+    # --- Pareamento entre processos (--processos) ---
+    # Cada trabalhador pareia primeiro os seus clientes. Quem passa ESPERA_ENTRE_PROCESSOS
+    # na fila é anunciado ao pai, que tem um saguão com os anunciados de todos e manda
+    # ('parear', id, processo, id lá) ao trabalhador de um deles (A). A tira o seu da fila
+    # e pede o outro ao processo dele (B, 'ceder'); B responde 'cedido' com os dados do
+    # cliente, ou 'recusado' se ele já saiu da fila. A partida roda em A, com um
+    # ClienteRemoto no lugar do cliente de B, e B só repassa o que ele manda e recebe.
+    def _anunciar(self, cliente):
+        chegada = self.saguao.chegada(cliente)
+        if chegada is None or cliente.anuncio is not None:
+            return  # já pareado, foi embora ou já anunciado
+        cliente.anuncio = next(self.ids_anuncio)
+        self.anunciados[cliente.anuncio] = cliente
+        self.fila_pai.put(('anunciar', self.indice, cliente.anuncio, (*cliente.variante, cliente.protocolo),
+                           cliente.nivel, time.monotonic() - chegada))
+
+    def _retirar_anuncio(self, cliente):
+        if cliente.anuncio is not None and self.anunciados.pop(cliente.anuncio, None) is not None:
+            self.fila_pai.put(('retirar', self.indice, cliente.anuncio))
+
+    def _voltar_a_fila(self, cliente):
+        """O pareamento com o outro processo não deu certo: o cliente volta a esperar aqui."""
+        cliente.anuncio = cliente.remoto = None
+        if cliente.partida is None and self.por_sessao.get(cliente.sessao) is cliente:
+            self._esperar(cliente)
+
+    def _ouvir_processos(self, loop):
+        """Thread: entrega ao loop o que o pai e os outros trabalhadores mandam para este."""
+        caixa = self.caixas[self.indice]
+        while True:
+            mensagem = caixa.get()
+            try:
+                loop.call_soon_threadsafe(self._mensagem_de_processo, *mensagem)
+            except RuntimeError:
+                return  # loop encerrado
+
+    def _mensagem_de_processo(self, tipo, *campos):
+        if tipo == 'parear':
+            self._parear_entre_processos(*campos)
+        elif tipo == 'ceder':
+            self._ceder(*campos)
+        elif tipo == 'cedido':
+            self._cedido(*campos)
+        elif tipo == 'recusado':
+            self._recusado(*campos)
+        elif tipo == 'mensagem':
+            processo, id_remoto, dados = campos
+            remoto = self.remotos.get((processo, id_remoto))
+            if remoto is not None:
+                self.receber(remoto, dados)
+        elif tipo == 'caiu':
+            remoto = self.remotos.get(tuple(campos))
+            if remoto is not None and not self.queda(remoto):
+                remoto.fechar()
+        elif tipo == 'enviar':
+            id_local, dados = campos
+            cliente = self.cedidos.get(id_local)
+            if cliente is not None:
+                cliente.enviar(dados)
+        elif tipo == 'fechar':
+            cliente = self.cedidos.pop(campos[0], None)
+            if cliente is not None:
+                cliente.remoto = None
+                self.sair(cliente)
+                cliente.fechar()
+
+    def _parear_entre_processos(self, id_local, processo, id_remoto):
+        """Ordem do pai: o cliente `id_local` daqui enfrenta o `id_remoto` do `processo`."""
+        cliente = self.anunciados.pop(id_local, None)
+        if cliente is None or not self.saguao.sair(cliente, pareado=True):
+            self.caixas[processo].put(('recusado', id_remoto))
+            return
+        if processo == self.indice:
+            oponente = self.anunciados.pop(id_remoto, None)
+            if oponente is not None and self.saguao.sair(oponente, pareado=True):
+                self._iniciar_partida(cliente, oponente)
+            else:
+                self._voltar_a_fila(cliente)
+            return
+        self.reservados[id_local] = cliente
+        self.caixas[processo].put(('ceder', id_remoto, self.indice, id_local))
+
+    def _ceder(self, id_local, processo, id_remoto):
+        """O `processo` pede o cliente `id_local` daqui para a partida dele."""
+        cliente = self.anunciados.pop(id_local, None)
+        if cliente is None or not self.saguao.sair(cliente, pareado=True):
+            self.caixas[processo].put(('recusado', id_remoto))
+            return
+        cliente.remoto = processo
+        self.cedidos[id_local] = cliente
+        self.caixas[processo].put(('cedido', id_remoto, self.indice, id_local, {
+            'protocolo': cliente.protocolo, 'variante': cliente.variante, 'nivel': cliente.nivel,
+            'ranqueado': cliente.ranqueado, 'sessao': cliente.sessao}))
+
+    def _cedido(self, id_local, processo, id_remoto, dados):
+        cliente = self.reservados.pop(id_local, None)
+        if cliente is None or self.por_sessao.get(cliente.sessao) is not cliente:
+            self.caixas[processo].put(('recusado', id_remoto))  # o daqui foi embora nesse meio tempo
+            return
+        remoto = self.remotos[(processo, id_remoto)] = ClienteRemoto(self, processo, id_remoto, dados)
+        self.por_sessao[remoto.sessao] = remoto
+        self.estatisticas['partidas_entre_processos'] += 1
+        self._iniciar_partida(cliente, remoto)
+
+    def _recusado(self, id_local):
+        """O pareamento de `id_local` com outro processo não aconteceu."""
+        cliente = self.reservados.pop(id_local, None) or self.cedidos.pop(id_local, None)
+        if cliente is not None:
+            self._voltar_a_fila(cliente)
+            return
+        cliente = self.anunciados.pop(id_local, None)
+        if cliente is not None:
+            # Continua na fila daqui; o pai já o esqueceu, então é anunciado de novo
+            cliente.anuncio = None
+            self._anunciar(cliente)
+
+    def _retomar_remoto(self, cliente, antigo, token):
+        """RETOMAR de quem joga em outro processo: no TCP a conexão nova assume o lugar da
+        antiga aqui; o pedido segue para o processo da partida, que responde por ela."""
+        if cliente is not antigo:
+            cliente.sessao, cliente.anuncio, cliente.remoto = token, antigo.anuncio, antigo.remoto
+            self.por_sessao[token] = self.cedidos[antigo.anuncio] = cliente
+            antigo.remoto = None
+            antigo.fechar()
+        self.caixas[cliente.remoto].put(('mensagem', self.indice, cliente.anuncio,
+                                         {'msg': 'RETOMAR', 'sessao': token}))
+
+    # --- TCP ---
+    async def _conexao_tcp(self, leitor, escritor):
+        escritor.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        cliente = ClienteTCP(self, escritor)
+        self.clientes_tcp.add(cliente)
+        cliente.enviar(cliente.hello())
+        # Quem volta a uma sessão manda o RETOMAR antes de qualquer outra coisa; por
+        # isso o cliente só entra na fila na primeira mensagem que não seja um RETOMAR
+        # (ou depois de ESPERA_PRIMEIRA_MENSAGEM, se não mandar nada)
+        asyncio.get_running_loop().call_later(ESPERA_PRIMEIRA_MENSAGEM, self.registrar, cliente)
+        quadros = proto.LeitorQuadros()
+        try:
+            while True:
+                dados = await leitor.read(TAM_LEITURA)
+                if not dados:
+                    break
+                cliente.ultimo_contato = time.monotonic()
+                self.metricas.somar('bytes_recebidos', len(dados), 'tcp')
+                quadros.alimentar(dados)
+                quadro = quadros.proximo()
+                while quadro is not None:
+                    self.metricas.somar('mensagens_recebidas', 1, 'tcp')
+                    try:
+                        mensagem = proto.decodificar(quadro)
+                    except proto.ErroProtocolo:
+                        # O quadro veio inteiro, só o corpo é inválido: descarta ele e segue
+                        self.metricas.somar('erros_recepcao', 1, 'tcp')
+                        quadro = quadros.proximo()
+                        continue
+                    if cliente.sessao is None and mensagem.get('msg') != 'RETOMAR':
+                        self.registrar(cliente, mensagem)
+                    self.receber(cliente, mensagem)
+                    quadro = quadros.proximo()
+        except (ConnectionError, proto.ErroProtocolo):
+            self.metricas.somar('erros_recepcao', 1, 'tcp')
+        finally:
+            self.queda(cliente)
+            cliente.fechar()
+
+    # --- UDP ---
+    def datagrama(self, dados, addr):
+        self.metricas.somar('bytes_recebidos', len(dados), 'udp')
+        cliente = self.clientes_udp.get(addr)
+        try:
+            if cliente is None:
+                mensagem = proto.decodificar(dados)
+                if mensagem.get('msg') == 'RETOMAR':
+                    self.metricas.somar('mensagens_recebidas', 1, 'udp')
+                    self._retomar_udp(mensagem.get('sessao'), addr)
+                    return
+                if mensagem.get('msg') != 'HELLO':
+                    return
+                canal = udp_confiavel.CanalConfiavel(self.envio_udp, self.simulador)
+                cliente = ClienteUDP(self, addr, canal)
+                self.clientes_udp[addr] = cliente
+                cliente.negociar_formato(mensagem)
+                self.metricas.somar('mensagens_recebidas', 1, 'udp')
+                canal.enviar_direto(proto.codificar(cliente.hello()), addr)
+                self.metricas.somar('mensagens_enviadas', 1, 'udp')
+                self.registrar(cliente, mensagem)
+                return
+            cliente.ultimo_contato = time.monotonic()
+            quadro = cliente.canal.processar(dados, addr)
+            if quadro is None:
+                return
+            mensagem = proto.decodificar(quadro)
+        except proto.ErroProtocolo:
+            self.metricas.somar('erros_recepcao', 1, 'udp')
+            return
+        self.metricas.somar('mensagens_recebidas', 1, 'udp')
+        if mensagem.get('msg') == 'HELLO':
+            # A resposta anterior se perdeu e o cliente ainda está no handshake
+            cliente.canal.enviar_direto(proto.codificar(cliente.hello()), addr)
+            self.metricas.somar('mensagens_enviadas', 1, 'udp')
+        else:
+            self.receber(cliente, mensagem)
+
+    def _retomar_udp(self, token, addr):
+        """RETOMAR de um endereço desconhecido: o NAT trocou a porta de um jogador."""
+        cliente = self.por_sessao.get(token)
+        if not isinstance(cliente, ClienteUDP):
+            self.envio_udp.sendto(proto.codificar({'msg': 'SESSAO', 'sessao': None}), addr)
+            return
+        self.clientes_udp.pop(cliente.addr, None)
+        cliente.addr = addr
+        self.clientes_udp[addr] = cliente
+        cliente.canal.redirecionar(addr)
+        cliente.ultimo_contato = time.monotonic()
+        self._retomar(cliente, token)
+
+    def aguardar_ack(self, cliente):
+        """Agenda o próximo reenvio de `cliente` se o prazo dele é anterior ao já agendado."""
+        prazo = cliente.canal.proximo_prazo()
+        if prazo is None:
+            return
+        instante = time.monotonic() + prazo
+        if instante < self.pendentes_udp.get(cliente, float('inf')):
+            self.pendentes_udp[cliente] = instante
+            heapq.heappush(self._prazos_udp, (instante, next(self._ordem_udp), cliente))
+            if self._prazos_udp[0][0] == instante:
+                self._tem_pendentes.set()  # novo prazo mais cedo: acorda _retransmissoes
+
+    def _descartar_udp(self, cliente):
+        if not self.queda(cliente):
+            cliente.fechar()  # suspenso, continua em clientes_udp: pode voltar do mesmo endereço
+
+    async def _retransmissoes(self):
+        """Reenvia o UDP confiável no prazo de cada cliente, dormindo até o mais próximo."""
+        while True:
+            self._tem_pendentes.clear()
+            if not self._prazos_udp:
+                await self._tem_pendentes.wait()
+                continue
+            espera = self._prazos_udp[0][0] - time.monotonic()
+            if espera > 0:
+                try:
+                    await asyncio.wait_for(self._tem_pendentes.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            instante, _, cliente = heapq.heappop(self._prazos_udp)
+            if self.pendentes_udp.get(cliente) != instante:
+                continue  # reagendado mais cedo ou já fechado
+            del self.pendentes_udp[cliente]
+            if cliente.canal.retransmitir():
+                self._descartar_udp(cliente)
+            if self.clientes_udp.get(cliente.addr) is cliente:
+                self.aguardar_ack(cliente)  # suspenso também: segue até abandonar o resto
+
+    async def _varredura(self):
+        """Descarta clientes que pararam de mandar até os batimentos (sumiram sem avisar)
+        e encerra as sessões suspensas cujo prazo de retomada venceu."""
+        while True:
+            await asyncio.sleep(INTERVALO_VARREDURA)
+            for _, cliente in self.suspensas.expirar():
+                self._abandonar(cliente)
+            limite = time.monotonic() - TEMPO_OCIOSO
+            for cliente in [c for c in self.clientes_udp.values()
+                            if c.ultimo_contato < limite and c.sessao not in self.suspensas]:
+                self.estatisticas['clientes_inativos'] += 1
+                self._descartar_udp(cliente)
+            for cliente in [c for c in self.clientes_tcp if c.ultimo_contato < limite]:
+                self.estatisticas['clientes_inativos'] += 1
+                cliente.fechar()  # a leitura termina e _conexao_tcp chama queda()
+
+    async def _parear_saguao(self):
+        """Pareia quem esperou o bastante para a tolerância de nível alcançar alguém."""
+        while True:
+            await asyncio.sleep(INTERVALO_PAREAMENTO)
+            for jogador, oponente in self.saguao.varrer():
+                self._iniciar_partida(jogador, oponente)
+
+    async def _sincronizar_diario(self):
+        """Fsync periódico do diário, mesmo quando não há partidas gravando."""
+        while True:
+            await asyncio.sleep(self.diario.intervalo_fsync or diario.INTERVALO_FSYNC)
+            self.diario.manter()
+
+
+def formatar_relatorio(instantaneo, instantaneo_metricas=None):
+    relatorio = (f"partidas ativas: {instantaneo['partidas_ativas']} | aguardando: {instantaneo['aguardando']}"
+                 f" | jogadas: {instantaneo['jogadas']} (rejeitadas: {instantaneo['jogadas_rejeitadas']})"
+                 f" | partidas: {instantaneo['partidas_iniciadas']} iniciadas"
+                 f" ({instantaneo['revanches']} revanches),"
+                 f" {instantaneo['partidas_encerradas']} encerradas,"
+                 f" {instantaneo['partidas_abandonadas']} abandonadas | clientes: {instantaneo['clientes']}"
+                 f" | sessões suspensas: {instantaneo['suspensas']} ({instantaneo['sessoes_retomadas']} retomadas,"
+                 f" {instantaneo['sessoes_expiradas']} expiradas)")
+    if instantaneo['jogadas_bot']:
+        relatorio += (f" | bot: {instantaneo['partidas_com_bot']} partidas,"
+                      f" {instantaneo['nos_bot'] / instantaneo['jogadas_bot']:.0f} nós e"
+                      f" {instantaneo['tempo_bot'] / instantaneo['jogadas_bot'] * 1000:.2f} ms por jogada")
+    rtt = instantaneo_metricas and instantaneo_metricas['histogramas'].get('rtt_jogada_segundos')
+    if rtt:
+        relatorio += (f" | rtt jogada: p50 {metricas.quantil(rtt, 0.5) * 1000:.2f} ms,"
+                      f" p99 {metricas.quantil(rtt, 0.99) * 1000:.2f} ms")
+    return relatorio
+
+
+def agregar_estatisticas(instantaneos):
+    """Soma, campo a campo, os instantâneos de vários trabalhadores."""
+    total = {}
+    for instantaneo in instantaneos:
+        for chave, valor in instantaneo.items():
+            total[chave] = total.get(chave, 0) + valor
+    return total
+
+
+# --- Exportação das métricas por HTTP ---
+class _RequisicaoMetricas(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        estatisticas, instantaneo = self.server.coletar()
+        if self.path == '/metrics':
+            corpo = metricas.para_prometheus(instantaneo, 'jogo_servidor', estatisticas)
+            tipo = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path in ('/', '/metricas.json'):
+            corpo = metricas.para_json(instantaneo, estatisticas)
+            tipo = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        corpo = corpo.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_exportacao(host, porta, coletar):
+    """Atende /metrics e /metricas.json numa thread; `coletar()` retorna (estatísticas, métricas)."""
+    servidor_http = http.server.ThreadingHTTPServer((host, porta), _RequisicaoMetricas)
+    servidor_http.daemon_threads = True
+    servidor_http.coletar = coletar
+    threading.Thread(target=servidor_http.serve_forever, daemon=True).start()
+    return servidor_http
+
+
+async def _servir(args, indice=None, fila_pai=None, caixas=None):
+    diario_partidas = None
+    if args.diario:
+        diario_partidas = diario.DiarioPartidas(args.diario if indice is None else f"{args.diario}.{indice}")
+    servidor = ServidorJogo(args.host, args.porta,
+                            udp_confiavel.SimuladorRede.de_texto(args.simular_rede),
+                            reutilizar_porta=fila_pai is not None,
+                            variante=(args.tamanho, args.sequencia), espera_bot=args.bot_apos,
+                            medir=not args.sem_metricas, janela_retomada=args.janela_retomada,
+                            max_suspensas=args.max_suspensas, diario=diario_partidas,
+                            variantes=args.variantes, indice=indice, fila_pai=fila_pai, caixas=caixas)
+    await servidor.iniciar()
+    exportacao = None
+    if fila_pai is None:
+        print(f"Servidor ouvindo em {args.host}:{args.porta} (TCP e UDP)", flush=True)
+        if args.metricas_porta:
+            loop = asyncio.get_running_loop()
+
+            async def instantaneos():
+                return servidor.instantaneo(), servidor.metricas.instantaneo()
+
+            # O instantâneo é tirado na thread do loop, que é quem altera os contadores
+            exportacao = iniciar_exportacao(
+                args.host, args.metricas_porta,
+                lambda: asyncio.run_coroutine_threadsafe(instantaneos(), loop).result(timeout=5))
+    try:
+        while True:
+            if fila_pai is not None:
+                await asyncio.sleep(INTERVALO_ESTATISTICAS)
+                if not multiprocessing.parent_process().is_alive():
+                    break  # o pai morreu sem poder encerrar os trabalhadores
+                fila_pai.put(('estatisticas', indice, servidor.instantaneo(), servidor.metricas.instantaneo()))
+            else:
+                await asyncio.sleep(args.relatorio or 3600)
+                if args.relatorio:
+                    print(formatar_relatorio(servidor.instantaneo(), servidor.metricas.instantaneo()),
+                          flush=True)
+    finally:
+        if exportacao:
+            exportacao.shutdown()
+        servidor.fechar()
+        if diario_partidas:
+            diario_partidas.fechar()
+
+
+def _trabalhador(args, indice, fila_pai, caixas):
+    # O pai encerra os trabalhadores com SIGTERM: sair pelo finally de _servir grava o resto do diário
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(_servir(args, indice, fila_pai, caixas))
+    except KeyboardInterrupt:
+        pass
+
+
+class PareamentoEntreProcessos:
+    """No pai: um saguão com quem esperou demais no seu trabalhador, para parear entre processos.
+
+    Os jogadores são (trabalhador, id); ao formar um par, manda a ordem de
+    pareamento ao trabalhador do primeiro, que busca o outro (ServidorJogo._ceder).
+    """
+
+    def __init__(self, caixas):
+        self.caixas = caixas
+        self.saguao = saguao.Saguao()
+
+    def anunciar(self, processo, id_local, variante, nivel, espera):
+        jogador = (processo, id_local)
+        oponente = self.saguao.entrar(jogador, variante, nivel, time.monotonic() - espera)
+        if oponente is not None:
+            self._parear(oponente, jogador)
+
+    def retirar(self, processo, id_local):
+        self.saguao.sair((processo, id_local))
+
+    def varrer(self):
+        for jogador, oponente in self.saguao.varrer():
+            self._parear(jogador, oponente)
+
+    def _parear(self, jogador, oponente):
+        processo, id_local = jogador
+        self.caixas[processo].put(('parear', id_local, *oponente))
+
+
+def _servir_em_processos(args):
+    """Sobe os trabalhadores, agrega as estatísticas que eles enviam e pareia entre eles."""
+    fila_pai = multiprocessing.Queue()
+    caixas = [multiprocessing.Queue() for _ in range(args.processos)]
+    trabalhadores = [multiprocessing.Process(target=_trabalhador, args=(args, i, fila_pai, caixas),
+                                             daemon=True)
+                     for i in range(args.processos)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    # Só depois do fork: SIGTERM no pai também deve passar pelo finally que encerra os trabalhadores
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Servidor ouvindo em {args.host}:{args.porta} (TCP e UDP, {args.processos} processos)",
+          flush=True)
+    ultimos = {}           # índice do trabalhador -> último instantâneo de estatísticas
+    ultimas_metricas = {}  # índice do trabalhador -> último instantâneo de métricas
+
+    def coletar():
+        return (agregar_estatisticas(list(ultimos.values())),
+                metricas.agregar(list(ultimas_metricas.values())))
+
+    exportacao = None
+    if args.metricas_porta:
+        exportacao = iniciar_exportacao(args.host, args.metricas_porta, coletar)
+    pareamento = PareamentoEntreProcessos(caixas)
+    proximo_relatorio = time.monotonic() + args.relatorio
+    proxima_varredura = time.monotonic() + INTERVALO_PAREAMENTO
+    try:
+        while all(t.is_alive() for t in trabalhadores):
+            try:
+                tipo, *campos = fila_pai.get(timeout=INTERVALO_PAREAMENTO)
+            except queue.Empty:
+                tipo = None
+            if tipo == 'estatisticas':
+                indice, instantaneo, instantaneo_metricas = campos
+                ultimos[indice] = instantaneo
+                ultimas_metricas[indice] = instantaneo_metricas
+            elif tipo == 'anunciar':
+                pareamento.anunciar(*campos)
+            elif tipo == 'retirar':
+                pareamento.retirar(*campos)
+            if time.monotonic() >= proxima_varredura:
+                proxima_varredura += INTERVALO_PAREAMENTO
+                pareamento.varrer()
+            if args.relatorio and time.monotonic() >= proximo_relatorio:
+                proximo_relatorio += args.relatorio
+                total, total_metricas = coletar()
+                if total:
+                    por_processo = ' '.join(f"{i}:{ultimos[i]['partidas_ativas']}" for i in sorted(ultimos))
+                    print(f"{formatar_relatorio(total, total_metricas)} | partidas por processo: {por_processo}",
+                          flush=True)
+        print("Um processo trabalhador terminou; encerrando o servidor.")
+    finally:
+        if exportacao:
+            exportacao.shutdown()
+        for trabalhador in trabalhadores:
+            trabalhador.terminate()
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+
+
+def ler_variante(texto):
+    """'N,K' da linha de comando -> (N, K)."""
+    try:
+        tamanho, sequencia = (int(v) for v in texto.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"variante inválida: {texto!r} (use N,K)") from None
+    if not 1 <= sequencia <= tamanho <= proto.TAMANHO_TABULEIRO_MAXIMO:
+        raise argparse.ArgumentTypeError(f"use 1 <= K <= N <= {proto.TAMANHO_TABULEIRO_MAXIMO}")
+    return tamanho, sequencia
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor dedicado do Jogo da Velha em Rede")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta', type=int, default=5555)
+    parser.add_argument('--processos', type=int, default=1,
+                        help="número de processos trabalhadores compartilhando a porta (SO_REUSEPORT)")
+    parser.add_argument('--tamanho', type=int, default=3, help="tamanho N do tabuleiro NxN")
+    parser.add_argument('--sequencia', type=int, default=3, help="quantos em linha para vencer")
+    parser.add_argument('--variantes', type=ler_variante, nargs='*', default=[], metavar='N,K',
+                        help="outras variantes que a partida rápida pode pedir, ex.: 15,5 7,4")
+    parser.add_argument('--bot-apos', type=float, default=0,
+                        help="segundos sem oponente até o jogador enfrentar o computador (0 desliga)")
+    parser.add_argument('--relatorio', type=float, default=0,
+                        help="intervalo em segundos entre relatórios de estatísticas (0 desliga)")
+    parser.add_argument('--metricas-porta', type=int, default=0,
+                        help="porta HTTP para exportar métricas (/metrics e /metricas.json; 0 desliga)")
+    parser.add_argument('--sem-metricas', action='store_true',
+                        help="não coleta métricas de rede (bytes, mensagens, latência)")
+    parser.add_argument('--janela-retomada', type=float, default=sessoes.JANELA_RETOMADA,
+                        help="segundos que o lugar de quem caiu fica guardado para a retomada")
+    parser.add_argument('--max-suspensas', type=int, default=10000,
+                        help="máximo de sessões suspensas guardadas ao mesmo tempo (por processo)")
+    parser.add_argument('--diario', default='',
+                        help="arquivo onde gravar todas as partidas (diario.py); vazio não grava")
+    parser.add_argument('--simular-rede', default='',
+                        help="perda/atraso simulados no UDP, ex.: perda=0.1,atraso=0.05")
+    args = parser.parse_args()
+    if not 1 <= args.sequencia <= args.tamanho <= proto.TAMANHO_TABULEIRO_MAXIMO:
+        parser.error(f"use 1 <= sequencia <= tamanho <= {proto.TAMANHO_TABULEIRO_MAXIMO}")
+    if args.processos > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        print("SO_REUSEPORT não está disponível neste sistema; usando um único processo.")
+        args.processos = 1
+    try:
+        if args.processos > 1:
+            _servir_em_processos(args)
+        else:
+            asyncio.run(_servir(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Sessões de jogo suspensas, à espera de que o jogador volte.
+
+Ao conectar, quem hospeda (o host P2P ou o servidor dedicado) entrega ao
+oponente um token de sessão ({'msg': 'SESSAO', 'sessao': token}). Se a conexão
+cai, a sessão fica suspensa numa TabelaSessoes: quem voltar dentro da janela
+de retomada com {'msg': 'RETOMAR', 'sessao': token} recupera o lugar na
+partida e recebe o estado atual. A tabela tem tamanho limitado e as sessões
+expiram sozinhas, então partidas abandonadas não acumulam memória.
+"""
+import secrets
+import time
+from collections import OrderedDict
+
+JANELA_RETOMADA = 30  # segundos que uma sessão suspensa espera o jogador voltar
+
+
+def novo_token():
+    """Token opaco e imprevisível (64 bits em hexadecimal)."""
+    return secrets.token_hex(8)
+
+
+class TabelaSessoes:
+    """Sessões suspensas por token, com validade (TTL) e capacidade máximas.
+
+    Todas as sessões têm o mesmo TTL, então a ordem de inserção já é a ordem
+    de vencimento: expirar e descartar a mais antiga custam O(1) por sessão.
+    """
+
+    def __init__(self, capacidade=10000, ttl=JANELA_RETOMADA):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.sessoes = OrderedDict()  # token -> (prazo, valor)
+
+    def __len__(self):
+        return len(self.sessoes)
+
+    def __contains__(self, token):
+        return token in self.sessoes
+
+    def suspender(self, token, valor, agora=None):
+        """Guarda a sessão até o prazo. Retorna as (token, valor) descartadas por falta de espaço."""
+        agora = time.monotonic() if agora is None else agora
+        self.sessoes.pop(token, None)
+        self.sessoes[token] = (agora + self.ttl, valor)
+        descartadas = []
+        while len(self.sessoes) > self.capacidade:
+            token_antigo, (_, valor_antigo) = self.sessoes.popitem(last=False)
+            descartadas.append((token_antigo, valor_antigo))
+        return descartadas
+
+    def retomar(self, token, agora=None):
+        """Retira e retorna o valor da sessão, ou None se ela não existe ou já venceu."""
+        agora = time.monotonic() if agora is None else agora
+        item = self.sessoes.get(token)
+        if item is None or item[0] < agora:
+            return None  # vencida: fica para expirar() avisar quem precisa
+        del self.sessoes[token]
+        return item[1]
+
+    def descartar(self, token):
+        """Retira a sessão sem esperar o prazo (o jogador saiu de vez)."""
+        self.sessoes.pop(token, None)
+
+    def expirar(self, agora=None):
+        """Retira e retorna as (token, valor) cujo prazo já venceu."""
+        agora = time.monotonic() if agora is None else agora
+        vencidas = []
+        while self.sessoes:
+            token, (prazo, valor) = next(iter(self.sessoes.items()))
+            if prazo >= agora:
+                break
+            del self.sessoes[token]
+            vencidas.append((token, valor))
+        return vencidas
+
+    def proximo_prazo(self, agora=None):
+        """Segundos até a próxima sessão vencer, ou None se a tabela está vazia."""
+        if not self.sessoes:
+            return None
+        agora = time.monotonic() if agora is None else agora
+        prazo, _ = next(iter(self.sessoes.values()))
+        return max(0.0, prazo - agora)
@@ -0,0 +1,373 @@
+"""Transmissão de uma partida para espectadores.
+
+Quem hospeda (rede.ConexaoJogo no modo 'h') aceita, além do oponente,
+espectadores só de leitura: eles se inscrevem com {'msg': 'ASSISTIR'} e passam
+a receber as jogadas dos dois lados. O retrato completo da partida (um
+{'msg': 'RETOMADA'} com o número dela, seguido do snapshot) vai a quem entra, a
+todos quando começa uma partida nova, a quem pede RESYNC e, como quadro-chave,
+a cada INTERVALO_QUADRO_CHAVE segundos sem jogadas.
+
+Cada jogada é codificada uma vez só (a do oponente nem isso: segue com os
+bytes em que chegou) e o mesmo buffer vai para todos os espectadores:
+
+- TCP: uma escrita por espectador, sem esperar por nenhum. A fila de cada um é
+  o buffer de escrita do transporte, limitado a LIMITE_FILA bytes; quem passa
+  do limite deixa de receber jogadas e, quando a fila esvazia, recebe o
+  retrato da partida no lugar de tudo o que perdeu. Um espectador lento nunca
+  segura os jogadores.
+- UDP: no Linux, um sendmmsg manda o datagrama para até LOTE_UDP endereços numa
+  única chamada de sistema (todas as mensagens apontam para o mesmo buffer);
+  nos outros sistemas, um sendto por endereço. Não há retransmissão: quem perde
+  uma jogada vê a lacuna e pede RESYNC, e os quadros-chave cobrem o resto.
+  Qualquer mensagem renova a inscrição (o batimento basta); quem fica
+  TEMPO_ESPECTADOR_UDP segundos em silêncio sai.
+
+Para ter o retrato pronto sem consultar a interface, a Transmissao acompanha a
+partida pelas mensagens trocadas entre os jogadores: aplica as jogadas num
+TabuleiroBits, adota os snapshots e começa a partida seguinte quando os dois
+lados pediram a revanche.
+"""
+import asyncio
+import ctypes
+import errno
+import socket
+import struct
+import sys
+import time
+
+import protocolo as proto
+from bitboard import TabuleiroBits
+from metricas import DESLIGADAS
+
+LIMITE_FILA = 16 * 1024       # bytes por espectador TCP antes de passar a receber só o retrato
+LOTE_UDP = 1024               # máximo de mensagens por sendmmsg (UIO_MAXIOV)
+INTERVALO_QUADRO_CHAVE = 2    # segundos sem jogadas até o próximo retrato
+TEMPO_ESPECTADOR_UDP = 15     # silêncio que encerra a inscrição de um espectador UDP
+MAX_ESPECTADORES = 4096
+ENVIO_EM_LOTE = True          # False força um sendto por endereço (para comparar)
+
+
+# --- Envio em lote (UDP) ---
+class _Iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_Iovec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _Msghdr), ('msg_len', ctypes.c_uint)]
+
+
+_TAM_SOCKADDR = 28  # sockaddr_in6, o maior dos dois
+
+
+def _sockaddr(addr):
+    """struct sockaddr_in / sockaddr_in6 de um endereço numérico, como o recvfrom devolve."""
+    if len(addr) == 2:
+        return (struct.pack('=H', socket.AF_INET) + struct.pack('!H', addr[1])
+                + socket.inet_pton(socket.AF_INET, addr[0]) + bytes(8))
+    host, porta, fluxo, escopo = addr
+    return (struct.pack('=H', socket.AF_INET6) + struct.pack('!HI', porta, fluxo)
+            + socket.inet_pton(socket.AF_INET6, host.partition('%')[0]) + struct.pack('=I', escopo))
+
+
+def _carregar_sendmmsg():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        sendmmsg = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_Mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+class EnvioEmLote:
+    """Manda o mesmo datagrama a muitos endereços por um socket UDP não bloqueante.
+
+    Com sendmmsg, os cabeçalhos das mensagens (um por endereço) são montados só
+    quando a lista de endereços muda; a cada envio, basta apontar o único iovec
+    para os bytes do datagrama. Se o buffer do socket enche, o resto do lote é
+    descartado: espectadores se recuperam pelo RESYNC.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._sendmmsg = _carregar_sendmmsg() if ENVIO_EM_LOTE else None
+        self._iov = _Iovec()
+        self._enderecos = None  # lista para a qual as mensagens abaixo foram montadas
+        self._nomes = None
+        self._mensagens = None
+
+    @property
+    def em_lote(self):
+        return self._sendmmsg is not None
+
+    def enviar_um(self, dados, addr):
+        """Envia a um endereço só (respostas a um espectador), sem mexer no lote montado."""
+        try:
+            self.sock.sendto(dados, addr)
+            return True
+        except OSError:
+            return False  # buffer cheio ou ICMP de um espectador que já foi embora
+
+    def enviar(self, dados, enderecos):
+        """Envia `dados` a cada endereço. Retorna quantos datagramas saíram.
+
+        `enderecos` deve ser a mesma lista enquanto não mudar: é ela que decide
+        quando remontar os cabeçalhos.
+        """
+        if self._sendmmsg is None:
+            enviados = 0
+            for addr in enderecos:
+                try:
+                    self.sock.sendto(dados, addr)
+                    enviados += 1
+                except BlockingIOError:
+                    break
+                except OSError:
+                    continue
+            return enviados
+        if enderecos is not self._enderecos:
+            self._montar(enderecos)
+        buffer = ctypes.c_char_p(dados)  # aponta para os bytes, sem copiar
+        self._iov.iov_base = ctypes.cast(buffer, ctypes.c_void_p).value
+        self._iov.iov_len = len(dados)
+        fd = self.sock.fileno()
+        tamanho = ctypes.sizeof(_Mmsghdr)
+        inicio = enviados = 0
+        while inicio < len(enderecos):
+            quantos = min(LOTE_UDP, len(enderecos) - inicio)
+            primeira = ctypes.cast(ctypes.addressof(self._mensagens) + inicio * tamanho,
+                                   ctypes.POINTER(_Mmsghdr))
+            saiu = self._sendmmsg(fd, primeira, quantos, 0)
+            if saiu < 0:
+                if ctypes.get_errno() in (errno.EAGAIN, errno.ENOBUFS):
+                    break  # buffer do socket cheio
+                saiu = 1  # erro pendente de um envio anterior (ICMP): pula este endereço
+            else:
+                enviados += saiu
+            inicio += saiu
+        return enviados
+
+    def _montar(self, enderecos):
+        self._enderecos = enderecos
+        self._nomes = ctypes.create_string_buffer(_TAM_SOCKADDR * len(enderecos))
+        self._mensagens = (_Mmsghdr * len(enderecos))()
+        base = ctypes.addressof(self._nomes)
+        iov = ctypes.pointer(self._iov)
+        for i, addr in enumerate(enderecos):
+            nome = _sockaddr(addr)
+            ctypes.memmove(base + i * _TAM_SOCKADDR, nome, len(nome))
+            cabecalho = self._mensagens[i].msg_hdr
+            cabecalho.msg_name = base + i * _TAM_SOCKADDR
+            cabecalho.msg_namelen = len(nome)
+            cabecalho.msg_iov = iov
+            cabecalho.msg_iovlen = 1
+
+
+# --- Espectadores ---
+class _EspectadorTCP:
+    __slots__ = ('escritor', 'transporte', 'atrasado')
+
+    def __init__(self, escritor):
+        self.escritor = escritor
+        self.transporte = escritor.transport
+        self.atrasado = False  # fila cheia: espera esvaziar para receber o retrato
+
+
+class Transmissao:
+    """Espectadores de uma partida e o retrato dela. Roda no loop asyncio de quem hospeda."""
+
+    def __init__(self, variante=None, metricas=None):
+        n, k = variante or (3, 3)
+        self.tabuleiro = TabuleiroBits(n, k)
+        self.turno = 'X'
+        self.seq = 0
+        self.partida = 1
+        self.revanche = set()   # lados ('local', 'oponente') que já pediram a próxima partida
+        self.adiadas = []       # jogadas da próxima partida que chegaram antes da revanche
+        self.metricas = metricas or DESLIGADAS
+        self.tcp = {}           # transporte -> _EspectadorTCP
+        self.udp = {}           # endereço -> último contato (time.monotonic)
+        self.envio_udp = None   # EnvioEmLote, no host UDP
+        self._enderecos = []    # lista de self.udp, refeita só quando ela muda
+        self._retrato = None    # quadros (RETOMADA, snapshot), até a partida mudar
+        self._ultima_difusao = time.monotonic()
+        self._quadro_chave = None
+
+    def __len__(self):
+        return len(self.tcp) + len(self.udp)
+
+    # --- Acompanhamento da partida ---
+    def observar(self, lado, dados, quadro=None):
+        """Acompanha uma mensagem trocada entre os jogadores ('local' ou 'oponente')
+        e repassa aos espectadores o que muda a partida. `quadro` são os bytes já
+        codificados da mensagem, se houver."""
+        if 'jogada' in dados:
+            self._jogada(dados, quadro)
+        elif 'tabuleiro' in dados:
+            try:
+                self.tabuleiro = TabuleiroBits.de_lista(dados['tabuleiro'], self.tabuleiro.k, self.tabuleiro.n)
+            except ValueError:
+                return  # não cabe na variante da partida: não vai para os espectadores
+            self.turno = dados['turno']
+            self.seq = dados['seq']
+            self._retrato = None
+            self.difundir(quadro or proto.codificar(dados))
+        elif dados.get('msg') == 'REVANCHE' and dados['partida'] == self.partida + 1:
+            self.revanche.add(lado)
+            if len(self.revanche) == 2:
+                self._proxima_partida()
+
+    def _jogada(self, dados, quadro):
+        seq = dados['seq']
+        if seq <= self.seq:
+            return
+        if self.tabuleiro.terminou():
+            self.adiadas.append((dados, quadro))
+            return
+        if (seq != self.seq + 1 or dados['jogador'] != self.turno
+                or not self.tabuleiro.jogar(dados['jogada'], dados['jogador'])):
+            return  # os jogadores vão se ressincronizar; o snapshot que trocarem corrige o retrato
+        self.seq = seq
+        self.turno = 'O' if self.turno == 'X' else 'X'
+        self._retrato = None
+        self.difundir(quadro or proto.codificar(dados))
+
+    def _proxima_partida(self):
+        self.partida += 1
+        self.tabuleiro = TabuleiroBits(self.tabuleiro.n, self.tabuleiro.k)
+        self.turno = proto.quem_comeca(self.partida)
+        self.revanche.clear()
+        self._retrato = None
+        self.difundir(*self.retrato())
+        adiadas, self.adiadas = self.adiadas, []
+        for dados, quadro in adiadas:
+            self._jogada(dados, quadro)
+
+    def retrato(self):
+        """Quadros com o número da partida e o snapshot, codificados uma vez por mudança."""
+        if self._retrato is None:
+            estado = {'tabuleiro': self.tabuleiro.para_lista(), 'turno': self.turno, 'seq': self.seq}
+            self._retrato = (proto.codificar({'msg': 'RETOMADA', 'partida': self.partida}),
+                             proto.codificar(estado))
+        return self._retrato
+
+    # --- Difusão ---
+    def difundir(self, *quadros):
+        """Manda os mesmos bytes a todos os espectadores, sem esperar por nenhum."""
+        self._ultima_difusao = time.monotonic()
+        if not self.tcp and not self.udp:
+            return
+        inicio = time.perf_counter()
+        if self.tcp:
+            dados = quadros[0] if len(quadros) == 1 else b''.join(quadros)
+            for espectador in self.tcp.values():
+                transporte = espectador.transporte
+                if espectador.atrasado or transporte.is_closing():
+                    continue
+                if transporte.get_write_buffer_size() > LIMITE_FILA:
+                    self._atrasar(espectador)
+                    continue
+                transporte.write(dados)
+            self.metricas.somar('bytes_difundidos', len(dados) * len(self.tcp), 'tcp')
+        if self.udp:
+            for quadro in quadros:
+                enviados = self.envio_udp.enviar(quadro, self._enderecos)
+                self.metricas.somar('bytes_difundidos', len(quadro) * enviados, 'udp')
+                if enviados < len(self._enderecos):
+                    self.metricas.somar('descartes_difusao', len(self._enderecos) - enviados, 'udp')
+        if self.metricas.ativo:
+            self.metricas.observar('difusao_segundos', time.perf_counter() - inicio)
+
+    def _atrasar(self, espectador):
+        espectador.atrasado = True
+        self.metricas.somar('descartes_difusao', 1, 'tcp')
+        asyncio.get_running_loop().create_task(self._alcancar(espectador))
+
+    async def _alcancar(self, espectador):
+        """Espera a fila do espectador esvaziar e manda o retrato no lugar do que ele perdeu."""
+        try:
+            await espectador.escritor.drain()
+        except ConnectionError:
+            return
+        if self.tcp.get(espectador.transporte) is espectador and not espectador.transporte.is_closing():
+            espectador.transporte.write(b''.join(self.retrato()))
+            espectador.atrasado = False
+
+    # --- Inscrições ---
+    def assinar_tcp(self, escritor, hello):
+        """Inscreve um espectador TCP e manda a ele o HELLO e o retrato. False se está lotado."""
+        if len(self) >= MAX_ESPECTADORES:
+            return False
+        espectador = _EspectadorTCP(escritor)
+        # O buffer do kernel também: sem isso, o autoajuste do TCP deixaria a fila crescer a megabytes
+        escritor.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, LIMITE_FILA)
+        espectador.transporte.set_write_buffer_limits(high=LIMITE_FILA)
+        espectador.transporte.write(hello + b''.join(self.retrato()))
+        self.tcp[espectador.transporte] = espectador
+        self._agendar_quadro_chave()
+        return True
+
+    def cancelar_tcp(self, escritor):
+        self.tcp.pop(escritor.transport, None)
+
+    def retrato_tcp(self, escritor):
+        """RESYNC de um espectador TCP (quem está atrasado já vai recebê-lo ao alcançar)."""
+        espectador = self.tcp.get(escritor.transport)
+        if espectador is not None and not espectador.atrasado:
+            espectador.transporte.write(b''.join(self.retrato()))
+
+    def mensagem_udp(self, dados, addr, hello):
+        """Trata um datagrama de espectador: ASSISTIR inscreve, DESCONEXAO cancela,
+        RESYNC pede o retrato e qualquer outro só renova a inscrição."""
+        tipo = dados.get('msg')
+        if tipo == 'ASSISTIR' and addr not in self.udp:
+            if len(self) >= MAX_ESPECTADORES:
+                return
+            self.udp[addr] = time.monotonic()
+            self._enderecos = list(self.udp)
+            self.envio_udp.enviar_um(hello, addr)
+            tipo = 'RESYNC'
+            self._agendar_quadro_chave()
+        if addr not in self.udp:
+            return
+        if tipo == 'DESCONEXAO':
+            del self.udp[addr]
+            self._enderecos = list(self.udp)
+            return
+        self.udp[addr] = time.monotonic()
+        if tipo == 'RESYNC':
+            for quadro in self.retrato():
+                self.envio_udp.enviar_um(quadro, addr)
+
+    # --- Quadros-chave ---
+    def _agendar_quadro_chave(self):
+        if self._quadro_chave is None:
+            self._quadro_chave = asyncio.get_running_loop().call_later(
+                INTERVALO_QUADRO_CHAVE, self._manter)
+
+    def _manter(self):
+        """Expira espectadores UDP calados e, com a partida parada, manda o retrato a todos.
+
+        Só roda enquanto há espectadores; para eles, o retrato também serve de batimento.
+        """
+        self._quadro_chave = None
+        agora = time.monotonic()
+        calados = [addr for addr, visto in self.udp.items() if agora - visto > TEMPO_ESPECTADOR_UDP]
+        if calados:
+            for addr in calados:
+                del self.udp[addr]
+            self._enderecos = list(self.udp)
+        if not self.tcp and not self.udp:
+            return
+        if agora - self._ultima_difusao >= INTERVALO_QUADRO_CHAVE - 0.05:
+            self.difundir(*self.retrato())
+        self._agendar_quadro_chave()
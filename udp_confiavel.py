@@ -0,0 +1,188 @@
+"""Camada opcional de confiabilidade sobre o socket UDP do jogo.
+
+Cada mensagem enviada vai em um envelope numerado (protocolo.TIPO_CONFIAVEL) e
+fica pendente até o oponente devolver um ACK com a mesma seq. Envelopes sem ACK
+são reenviados quando o prazo (RTO) vence; o RTO se adapta ao RTT medido, como
+no TCP (RFC 6298), com backoff exponencial a cada nova tentativa. Do lado de
+quem recebe, envelopes repetidos são confirmados de novo mas entregues ao jogo
+uma única vez.
+
+SimuladorRede injeta perda, atraso e reordenação nos envios, o que permite
+exercitar tudo isso em loopback.
+"""
+import random
+import threading
+import time
+
+import protocolo as proto
+
+RTO_INICIAL = 0.25
+RTO_MINIMO = 0.05
+RTO_MAXIMO = 2.0
+MAX_TENTATIVAS = 8
+JANELA_DUPLICATAS = 1024
+
+
+class SimuladorRede:
+    """Envia datagramas com perda, atraso, variação e reordenação simulados."""
+
+    def __init__(self, perda=0.0, atraso=0.0, variacao=0.0, reordenar=0.0, semente=None):
+        self.perda = perda
+        self.atraso = atraso
+        self.variacao = variacao
+        self.reordenar = reordenar
+        self.aleatorio = random.Random(semente)
+        self.estatisticas = {'enviados': 0, 'descartados': 0, 'reordenados': 0}
+
+    @classmethod
+    def de_texto(cls, texto):
+        """Cria um simulador a partir de 'perda=0.1,atraso=0.05,...'; None se vazio."""
+        if not texto:
+            return None
+        parametros = {}
+        for item in texto.split(','):
+            nome, _, valor = item.partition('=')
+            parametros[nome.strip()] = int(valor) if nome.strip() == 'semente' else float(valor)
+        return cls(**parametros)
+
+    def enviar(self, sock, dados, addr):
+        """Envia (ou descarta) um datagrama de acordo com as probabilidades configuradas."""
+        if self.aleatorio.random() < self.perda:
+            self.estatisticas['descartados'] += 1
+            return
+        espera = self.atraso + self.aleatorio.uniform(0, self.variacao)
+        if self.reordenar and self.aleatorio.random() < self.reordenar:
+            # Segura o datagrama o bastante para que os seguintes o ultrapassem
+            espera += 2 * (self.atraso + self.variacao) + 0.005
+            self.estatisticas['reordenados'] += 1
+        self.estatisticas['enviados'] += 1
+        if espera <= 0:
+            self._enviar_agora(sock, dados, addr)
+        else:
+            temporizador = threading.Timer(espera, self._enviar_agora, (sock, dados, addr))
+            temporizador.daemon = True
+            temporizador.start()
+
+    @staticmethod
+    def _enviar_agora(sock, dados, addr):
+        try:
+            sock.sendto(dados, addr)
+        except OSError:
+            pass  # socket fechado enquanto o datagrama estava "em trânsito"
+
+
+class CanalConfiavel:
+    """Entrega confiável e sem duplicatas de quadros sobre um socket UDP."""
+
+    def __init__(self, sock, simulador=None):
+        self.sock = sock
+        self.simulador = simulador
+        self.lock = threading.Lock()
+        self.proxima_seq = 1
+        self.pendentes = {}
+        self.srtt = None
+        self.rttvar = None
+        self.rto = RTO_INICIAL
+        # Todas as seqs <= recebidos_ate já foram entregues; as acima, só as do conjunto
+        self.recebidos_ate = 0
+        self.recebidos_fora = set()
+        self.estatisticas = {'enviados': 0, 'retransmitidos': 0, 'duplicados': 0,
+                             'acks': 0, 'abandonados': 0}
+
+    def enviar_direto(self, dados, addr):
+        """Envia um datagrama sem envelope nem garantia de entrega."""
+        if self.simulador:
+            self.simulador.enviar(self.sock, dados, addr)
+        else:
+            self.sock.sendto(dados, addr)
+
+    def enviar(self, quadro_interno, addr):
+        """Envia um quadro com garantia de entrega e retorna a seq do envelope."""
+        with self.lock:
+            seq = self.proxima_seq
+            self.proxima_seq += 1
+            envelope = proto.envelopar(seq, quadro_interno)
+            agora = time.monotonic()
+            self.pendentes[seq] = {'envelope': envelope, 'addr': addr, 'enviado_em': agora,
+                                   'prazo': agora + self.rto, 'tentativas': 1}
+            self.estatisticas['enviados'] += 1
+        self.enviar_direto(envelope, addr)
+        return seq
+
+    def processar(self, datagrama, addr):
+        """Trata um datagrama recebido. Retorna o quadro a entregar ao jogo, ou None."""
+        tipo, seq, conteudo = proto.abrir_envelope(datagrama)
+        if tipo is None:
+            return conteudo
+        if tipo == proto.TIPO_ACK:
+            self._confirmar(seq)
+            return None
+        # Confirma sempre, mesmo repetidos: o ACK anterior pode ter se perdido
+        self.enviar_direto(proto.quadro_ack(seq), addr)
+        with self.lock:
+            if seq <= self.recebidos_ate or seq in self.recebidos_fora:
+                self.estatisticas['duplicados'] += 1
+                return None
+            self.recebidos_fora.add(seq)
+            if len(self.recebidos_fora) > JANELA_DUPLICATAS:
+                # Lacuna que nunca vai fechar (o remetente desistiu dela)
+                self.recebidos_ate = min(self.recebidos_fora) - 1
+            while self.recebidos_ate + 1 in self.recebidos_fora:
+                self.recebidos_ate += 1
+                self.recebidos_fora.discard(self.recebidos_ate)
+        return conteudo
+
+    def _confirmar(self, seq):
+        with self.lock:
+            pendente = self.pendentes.pop(seq, None)
+            if pendente is None:
+                return
+            self.estatisticas['acks'] += 1
+            if pendente['tentativas'] == 1:
+                # Algoritmo de Karn: só mede RTT de envelopes que não foram reenviados
+                self._atualizar_rtt(time.monotonic() - pendente['enviado_em'])
+
+    def _atualizar_rtt(self, amostra):
+        if self.srtt is None:
+            self.srtt = amostra
+            self.rttvar = amostra / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - amostra)
+            self.srtt = 0.875 * self.srtt + 0.125 * amostra
+        self.rto = min(max(self.srtt + 4 * self.rttvar, RTO_MINIMO), RTO_MAXIMO)
+
+    def retransmitir(self):
+        """Reenvia os envelopes com prazo vencido. Retorna quantos foram abandonados."""
+        agora = time.monotonic()
+        reenviar = []
+        abandonados = 0
+        with self.lock:
+            for seq, pendente in list(self.pendentes.items()):
+                if agora < pendente['prazo']:
+                    continue
+                if pendente['tentativas'] >= MAX_TENTATIVAS:
+                    del self.pendentes[seq]
+                    abandonados += 1
+                    continue
+                pendente['tentativas'] += 1
+                espera = min(self.rto * 2 ** (pendente['tentativas'] - 1), RTO_MAXIMO)
+                pendente['prazo'] = agora + espera
+                reenviar.append((pendente['envelope'], pendente['addr']))
+            self.estatisticas['retransmitidos'] += len(reenviar)
+            self.estatisticas['abandonados'] += abandonados
+        for envelope, addr in reenviar:
+            self.enviar_direto(envelope, addr)
+        return abandonados
+
+    def redirecionar(self, addr):
+        """Passa a reenviar os envelopes pendentes para `addr` (o oponente mudou de endereço)."""
+        with self.lock:
+            for pendente in self.pendentes.values():
+                pendente['addr'] = addr
+
+    def proximo_prazo(self):
+        """Segundos até o próximo reenvio pendente, ou None se não há nada pendente."""
+        with self.lock:
+            if not self.pendentes:
+                return None
+            return max(0.0, min(p['prazo'] for p in self.pendentes.values()) - time.monotonic())